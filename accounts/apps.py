@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        from sharelib import images
+        images.register(self.get_model('User'), 'avatar', 'avatar_variants')
+
+        from .stats import connect_signals
+        connect_signals()
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import User, UserStats
+from accounts.stats import COUNTER_FIELDS, invalidate, live_counters
+from ratings.models import Rating
+from ratings.utils import AGGREGATE_FIELDS as RATING_FIELDS, aggregate_values, rating_totals
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the materialized per-user stats (UserStats counters and the rating '
+        'aggregates on User) with the live aggregates. Use --fix to repair drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite rows that disagree with the live data.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        last_id = 0
+        checked = 0
+        mismatched = 0
+        while True:
+            with transaction.atomic():
+                users = User.objects.filter(pk__gt=last_id).order_by('pk').only('pk', *RATING_FIELDS)
+                if options['fix']:
+                    users = users.select_for_update()
+                users = list(users[:options['batch_size']])
+                if not users:
+                    break
+                last_id = users[-1].pk
+                checked += len(users)
+                mismatched += self.check_batch(users, options['fix'])
+
+        if mismatched and not options['fix']:
+            raise CommandError(f'{mismatched} of {checked} user(s) have stale stats; run with --fix to repair.')
+        verb = 'Repaired' if options['fix'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} user(s). {verb} {mismatched} mismatch(es).'))
+
+    def check_batch(self, users, fix):
+        user_ids = [user.pk for user in users]
+        counters = live_counters(user_ids)
+        stored = {row.pk: row for row in UserStats.objects.filter(pk__in=user_ids)}
+        totals = {row['to_user']: row for row in rating_totals(Rating.objects.filter(to_user__in=user_ids))}
+
+        stale_stats, stale_users = [], []
+        for user in users:
+            differences = []
+
+            row = stored.get(user.pk)
+            # Users without a row yet are built from live data on first read
+            if row is not None:
+                for field in COUNTER_FIELDS:
+                    expected = counters[user.pk][field]
+                    if getattr(row, field) != expected:
+                        differences.append(f'{field} {getattr(row, field)} != {expected}')
+                        setattr(row, field, expected)
+                if differences:
+                    stale_stats.append(row)
+
+            rating_differences = []
+            for field, expected in aggregate_values(totals.get(user.pk, {})).items():
+                if getattr(user, field) != expected:
+                    rating_differences.append(f'{field} {getattr(user, field)} != {expected}')
+                    setattr(user, field, expected)
+            if rating_differences:
+                stale_users.append(user)
+
+            differences += rating_differences
+            if differences:
+                self.stdout.write(f'user {user.pk}: ' + ', '.join(differences))
+
+        if fix:
+            UserStats.objects.bulk_update(stale_stats, COUNTER_FIELDS)
+            User.objects.bulk_update(stale_users, RATING_FIELDS)
+            invalidate(*({row.pk for row in stale_stats} | {user.pk for user in stale_users}))
+        return len({row.pk for row in stale_stats} | {user.pk for user in stale_users})
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+from ratings.utils import AGGREGATE_FIELDS, aggregate_values, rating_totals
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    # Shares the grouped query and averaging with recompute_rating_aggregates
+    User = apps.get_model('accounts', 'User')
+    Rating = apps.get_model('ratings', 'Rating')
+    users = [
+        User(pk=row['to_user'], **aggregate_values(row))
+        for row in rating_totals(Rating.objects.all())
+    ]
+    User.objects.bulk_update(users, AGGREGATE_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_unread_notification_count'),
+        ('ratings', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='borrower_rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='borrower_rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='lender_rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='lender_rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
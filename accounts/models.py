@@ -5,9 +5,28 @@ from django.db import models
 
 class User(AbstractUser):
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)  # Resized copies, see sharelib.images
     location = models.CharField(max_length=255, blank=True)
     bio = models.TextField(blank=True, max_length=500, help_text='User biography or description')
     lender_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     borrower_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
+    # Running totals behind lender_rating/borrower_rating, maintained by ratings.utils
+    lender_rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    lender_rating_count = models.PositiveIntegerField(default=0, editable=False)
+    borrower_rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    borrower_rating_count = models.PositiveIntegerField(default=0, editable=False)
     is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    # Denormalized count of unread notifications, maintained by notifications.utils
+    unread_notification_count = models.PositiveIntegerField(default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class UserStats(models.Model):
+    """
+    Materialized dashboard counters for /api/users/me/stats/, kept current by
+    the item and borrow write paths (see accounts/stats.py).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    items_lent = models.PositiveIntegerField(default=0)
+    items_borrowed = models.PositiveIntegerField(default=0)
+    active_loans = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -1,22 +1,36 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from .models import User
+from sharelib.images import build_variant_urls, variant_urls
+from sharelib.serializers import FlexFieldsMixin
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()  # Resized copies keyed by size
     
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'full_name',
-                  'avatar', 'location', 'bio', 'lender_rating', 'borrower_rating', 'rating', 'date_joined']
-        read_only_fields = ['lender_rating', 'borrower_rating', 'date_joined', 'full_name', 'rating']
+                  'avatar', 'avatar_variants', 'location', 'bio', 'lender_rating', 'borrower_rating', 'rating', 'date_joined']
+        read_only_fields = ['lender_rating', 'borrower_rating', 'date_joined', 'full_name', 'rating', 'avatar_variants']
+    
+    # Columns the method fields are computed from on compact list pages (see sharelib/compact.py)
+    compact_fields = {
+        'full_name': ('first_name', 'last_name', 'username'),
+        'avatar_variants': ('avatar', 'avatar_variants'),
+        'rating': ('borrower_rating', 'lender_rating'),
+    }
     
     def get_full_name(self, obj):
         """Return full name or fallback to username if name is not available."""
         full_name = obj.get_full_name()
         return full_name if full_name else obj.username
     
+    def get_avatar_variants(self, obj):
+        """Return resized avatar URLs keyed by size (original URL until generated)."""
+        return variant_urls(obj.avatar, obj.avatar_variants, self.context.get('request'))
+    
     def get_rating(self, obj):
         """
         Return appropriate rating based on context.
@@ -33,6 +47,16 @@ class UserSerializer(serializers.ModelSerializer):
         else:
             # When viewing lender's profile, show their lender_rating
             return float(obj.lender_rating) if obj.lender_rating else 0.0
+    
+    def compact_full_name(self, media, first_name, last_name, username):
+        return f'{first_name} {last_name}'.strip() or username
+    
+    def compact_avatar_variants(self, media, avatar, variants):
+        return build_variant_urls(avatar, variants, media.url) if avatar else {}
+    
+    def compact_rating(self, media, borrower_rating, lender_rating):
+        rating = borrower_rating if self.context.get('rating_context', 'borrower') == 'borrower' else lender_rating
+        return float(rating) if rating else 0.0
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -0,0 +1,187 @@
+"""
+Materialized per-user dashboard stats for /api/users/me/stats/.
+
+Counters live in one UserStats row per user. The item and borrow write paths
+apply deltas through ``adjust_stats()`` (hooked up by ``connect_signals()``),
+which also drops the cached copy once the change commits. ``get_stats()``
+serves reads from the cache, falling back to a single primary-key read.
+Rating aggregates are already kept on the user row (see ratings/utils.py).
+
+Rows are created lazily on first read, so writes for users without a row
+are simply skipped. To keep those skipped writes from being lost, the row is
+inserted before the live aggregates are counted (see ``create_stats()``). ``manage.py check_user_stats``
+compares everything against the live aggregates and can repair drift.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .models import UserStats
+
+COUNTER_FIELDS = ('items_lent', 'items_borrowed', 'active_loans')
+
+# BorrowRecord statuses counted by items_borrowed / active_loans
+BORROWED_STATUSES = ('borrowed', 'returned')
+ACTIVE_STATUSES = ('borrowed',)
+
+
+def cache_key(user_id):
+    return f'user-stats:{user_id}'
+
+
+def get_cache_timeout():
+    return getattr(settings, 'USER_STATS_CACHE_TIMEOUT', 300)
+
+
+def live_counters(user_ids):
+    """Counters computed from the source tables, as {user_id: {field: value}}."""
+    from borrows.models import BorrowRecord
+    from items.models import Item
+
+    counters = {user_id: dict.fromkeys(COUNTER_FIELDS, 0) for user_id in user_ids}
+    items = (
+        Item.objects.filter(owner__in=user_ids)
+        .order_by().values('owner').annotate(count=Count('pk'))
+    )
+    for row in items:
+        counters[row['owner']]['items_lent'] = row['count']
+    records = (
+        BorrowRecord.objects.filter(borrower__in=user_ids)
+        .order_by().values('borrower')
+        .annotate(
+            borrowed=Count('pk', filter=Q(status__in=BORROWED_STATUSES)),
+            active=Count('pk', filter=Q(status__in=ACTIVE_STATUSES)),
+        )
+    )
+    for row in records:
+        counters[row['borrower']]['items_borrowed'] = row['borrowed']
+        counters[row['borrower']]['active_loans'] = row['active']
+    return counters
+
+
+def invalidate(*user_ids):
+    """Drop the cached stats now and again after commit, so readers can't re-cache pre-commit values."""
+    keys = [cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_stats(user_id):
+    """Counters for one user: cache, then the UserStats row, then built from live data."""
+    key = cache_key(user_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = UserStats.objects.filter(pk=user_id).values(*COUNTER_FIELDS).first()
+        if stats is None:
+            stats = create_stats(user_id)
+        cache.set(key, stats, get_cache_timeout())
+    return stats
+
+
+def create_stats(user_id):
+    """
+    Create a user's row and fill it from the live aggregates.
+
+    The empty row is inserted first and the counters are recounted under its
+    row lock. Writes that commit before the recount are included in it, and
+    writes that come later find the row and apply their deltas, so a write
+    landing between counting and inserting can't be lost.
+    """
+    with transaction.atomic():
+        UserStats.objects.get_or_create(user_id=user_id)
+    with transaction.atomic():
+        UserStats.objects.select_for_update().filter(pk=user_id).first()
+        counters = live_counters([user_id])[user_id]
+        UserStats.objects.filter(pk=user_id).update(updated_at=timezone.now(), **counters)
+    return counters
+
+
+def adjust_stats(user_id, **deltas):
+    """Apply counter deltas (e.g. ``items_lent=1``) to a user's stats row, if it exists yet."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not user_id or not deltas:
+        return
+    UserStats.objects.filter(pk=user_id).update(
+        updated_at=timezone.now(),
+        **{field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()},
+    )
+    invalidate(user_id)
+
+
+def adjust_stats_many(deltas):
+    """
+    Apply counter deltas for many users (``{user_id: {field: delta}}``), with
+    one UPDATE per distinct set of deltas rather than one per user.
+    """
+    users_by_deltas = defaultdict(list)
+    for user_id, changes in deltas.items():
+        changes = tuple(sorted((field, delta) for field, delta in changes.items() if delta))
+        if user_id and changes:
+            users_by_deltas[changes].append(user_id)
+    for changes, user_ids in users_by_deltas.items():
+        UserStats.objects.filter(pk__in=user_ids).update(
+            updated_at=timezone.now(),
+            **{field: Greatest(F(field) + delta, 0) for field, delta in changes},
+        )
+        invalidate(*user_ids)
+
+
+def record_counters(status):
+    """What one borrow record with ``status`` contributes to its borrower's counters."""
+    return {
+        'items_borrowed': int(status in BORROWED_STATUSES),
+        'active_loans': int(status in ACTIVE_STATUSES),
+    }
+
+
+# Signal receivers for the item and borrow write paths
+
+def item_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_stats(instance.owner_id, items_lent=1)
+
+
+def item_deleted(sender, instance, **kwargs):
+    adjust_stats(instance.owner_id, items_lent=-1)
+
+
+def record_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._stats_previous_status = None
+    if raw or instance._state.adding or (update_fields is not None and 'status' not in update_fields):
+        return
+    instance._stats_previous_status = (
+        sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    )
+
+
+def record_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = record_counters(getattr(instance, '_stats_previous_status', None))
+    current = record_counters(instance.status)
+    deltas = {field: current[field] - previous[field] for field in current}
+    if any(deltas.values()):
+        adjust_stats(instance.borrower_id, **deltas)
+
+
+def record_deleted(sender, instance, **kwargs):
+    deltas = {field: -value for field, value in record_counters(instance.status).items()}
+    if any(deltas.values()):
+        adjust_stats(instance.borrower_id, **deltas)
+
+
+def connect_signals():
+    from borrows.models import BorrowRecord
+    from items.models import Item
+
+    post_save.connect(item_saved, sender=Item, dispatch_uid='user_stats_item_saved')
+    post_delete.connect(item_deleted, sender=Item, dispatch_uid='user_stats_item_deleted')
+    pre_save.connect(record_pre_save, sender=BorrowRecord, dispatch_uid='user_stats_record_pre_save')
+    post_save.connect(record_saved, sender=BorrowRecord, dispatch_uid='user_stats_record_saved')
+    post_delete.connect(record_deleted, sender=BorrowRecord, dispatch_uid='user_stats_record_deleted')
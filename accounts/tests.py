@@ -1,3 +1,78 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from borrows.models import BorrowRecord, BorrowRequest
+from items.models import Item
+from . import stats
+from .models import User, UserStats
+
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.owner = User.objects.create(username='owner')
+        self.borrower = User.objects.create(username='borrower')
+
+    def create_item(self, title='Drill'):
+        return Item.objects.create(owner=self.owner, title=title, description='desc')
+
+    def create_record(self, status='borrowed'):
+        item = self.create_item()
+        request = BorrowRequest.objects.create(
+            item=item, borrower=self.borrower, start_date='2026-01-01', end_date='2026-01-05', status='approved'
+        )
+        now = timezone.now()
+        return BorrowRecord.objects.create(request=request, start_date=now, due_date=now, status=status)
+
+    def test_first_read_builds_the_row_from_live_data(self):
+        self.create_item()
+        self.create_record()
+        self.create_record(status='returned')
+        self.assertFalse(UserStats.objects.exists())
+        self.assertEqual(stats.get_stats(self.owner.pk), {'items_lent': 3, 'items_borrowed': 0, 'active_loans': 0})
+        self.assertEqual(stats.get_stats(self.borrower.pk), {'items_lent': 0, 'items_borrowed': 2, 'active_loans': 1})
+        row = UserStats.objects.get(pk=self.borrower.pk)
+        self.assertEqual((row.items_borrowed, row.active_loans), (2, 1))
+
+    def test_write_before_the_row_exists_is_not_lost(self):
+        # Deltas are skipped while the user has no row; the live count must come after the insert
+        get_or_create = UserStats.objects.get_or_create
+
+        def write_then_insert(**kwargs):
+            self.create_item('Added meanwhile')
+            return get_or_create(**kwargs)
+
+        with mock.patch.object(UserStats.objects, 'get_or_create', side_effect=write_then_insert):
+            self.assertEqual(stats.get_stats(self.owner.pk)['items_lent'], 1)
+        self.assertEqual(UserStats.objects.get(pk=self.owner.pk).items_lent, 1)
+
+    def test_write_after_the_row_exists_is_counted_once(self):
+        live_counters = stats.live_counters
+
+        def write_then_count(user_ids):
+            self.create_item('Added meanwhile')
+            return live_counters(user_ids)
+
+        with mock.patch('accounts.stats.live_counters', side_effect=write_then_count):
+            self.assertEqual(stats.get_stats(self.owner.pk)['items_lent'], 1)
+        self.assertEqual(UserStats.objects.get(pk=self.owner.pk).items_lent, 1)
+
+    def test_existing_row_is_not_recounted(self):
+        stats.get_stats(self.owner.pk)
+        cache.clear()
+        with mock.patch('accounts.stats.live_counters') as live_counters:
+            self.assertEqual(stats.get_stats(self.owner.pk)['items_lent'], 0)
+        live_counters.assert_not_called()
 
-# Create your tests here.
+    def test_writes_apply_deltas_and_invalidate_the_cache(self):
+        self.assertEqual(stats.get_stats(self.owner.pk)['items_lent'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            item = self.create_item()
+        self.assertEqual(stats.get_stats(self.owner.pk)['items_lent'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(stats.get_stats(self.owner.pk)['items_lent'], 0)
@@ -3,12 +3,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from django.db.models import Avg
+from items.caching import namespace_validators, user_namespace
+from sharelib.conditional import ConditionalGetMixin
 from .models import User
 from .serializers import UserSerializer, RegisterSerializer, EmailLoginSerializer
-from items.models import Item
-from borrows.models import BorrowRecord
-from ratings.models import Rating
+from .stats import get_stats
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -58,19 +57,26 @@ class EmailLoginView(generics.GenericAPIView):
             'refresh': str(refresh)
         }, status=status.HTTP_200_OK)
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
     
     def get_object(self):
         return self.request.user
+    
+    def get_validators(self, request, *args, **kwargs):
+        # Every write to a rendered user field bumps this namespace (see items/caching.py)
+        return namespace_validators(user_namespace(request.user.pk))
 
-class UserDetailView(generics.RetrieveAPIView):
+class UserDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [AllowAny]  # Public user profiles
     queryset = User.objects.all()
     lookup_field = 'id'
     lookup_url_kwarg = 'id'
+    
+    def get_validators(self, request, *args, **kwargs):
+        return namespace_validators(user_namespace(kwargs['id']))
 
 class UserStatsView(generics.RetrieveAPIView):
     """
@@ -82,38 +88,25 @@ class UserStatsView(generics.RetrieveAPIView):
     def get(self, request, *args, **kwargs):
         user = request.user
         
-        # Calculate items lent (total items owned by user)
-        items_lent = Item.objects.filter(owner=user).count()
-        
-        # Calculate items borrowed (count of borrow records where user is borrower)
-        # This includes both active and completed borrows
-        items_borrowed = BorrowRecord.objects.filter(
-            request__borrower=user,
-            status__in=['borrowed', 'returned']
-        ).count()
+        # Counters come from the materialized UserStats row (cached; see accounts/stats.py)
+        stats = get_stats(user.pk)
+        items_lent = stats['items_lent']
+        items_borrowed = stats['items_borrowed']
+        active_loans = stats['active_loans']
         
-        # Calculate active loans (currently borrowed items)
-        active_loans = BorrowRecord.objects.filter(
-            request__borrower=user,
-            status='borrowed'
-        ).count()
-        
-        # Calculate average lender rating
+        # Average lender/borrower ratings come from the running totals kept on
+        # the user row (see ratings.utils), so no aggregate query is needed.
         # Lender rating: ratings where the user (to_user) owns the item
-        lender_ratings_avg = Rating.objects.filter(
-            to_user=user,
-            item__owner=user
-        ).aggregate(avg_rating=Avg('stars'))['avg_rating']
-        
-        average_lender_rating = f"{lender_ratings_avg:.2f}" if lender_ratings_avg else "0.00"
+        average_lender_rating = (
+            f"{user.lender_rating_sum / user.lender_rating_count:.2f}"
+            if user.lender_rating_count else "0.00"
+        )
         
-        # Calculate average borrower rating
         # Borrower rating: ratings where the user (to_user) borrowed the item (doesn't own it)
-        borrower_ratings_avg = Rating.objects.filter(
-            to_user=user
-        ).exclude(item__owner=user).aggregate(avg_rating=Avg('stars'))['avg_rating']
-        
-        average_borrower_rating = f"{borrower_ratings_avg:.2f}" if borrower_ratings_avg else "0.00"
+        average_borrower_rating = (
+            f"{user.borrower_rating_sum / user.borrower_rating_count:.2f}"
+            if user.borrower_rating_count else "0.00"
+        )
         
         return Response({
             'items_lent': items_lent,
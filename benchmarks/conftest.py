@@ -0,0 +1,139 @@
+"""
+Fixtures for the endpoint benchmark suite (benchmarks/test_endpoints.py).
+
+Run with ``pytest -m benchmark``. Dataset size, iteration count and where
+results go are read from the environment:
+
+- BENCHMARK_USERS, BENCHMARK_ITEMS, BENCHMARK_NOTIFICATIONS_PER_USER: seeded volume
+- BENCHMARK_ITERATIONS: timed requests per endpoint (after one warm-up)
+- BENCHMARK_BUDGETS: budgets file (default benchmarks/budgets.json)
+- BENCHMARK_LATENCY_FACTOR: multiplies every latency budget, for slower machines
+- BENCHMARK_RESULTS: results file (default benchmark-results/<time>-<commit>.json)
+"""
+import io
+import json
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts.models import User
+from borrows.models import BorrowRequest
+from items.models import Item
+from notifications.models import Notification
+from ratings.models import Rating
+
+from .factories import (
+    PASSWORD, BorrowRecordFactory, BorrowRequestFactory, ItemFactory, NotificationFactory, RatingFactory,
+    UserFactory,
+)
+from .seeding import PREFIX, seed_marketplace
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+
+# Set once results are saved, for the terminal summary
+written = []
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_dataset():
+    """Seed bulk volume, then the known objects each endpoint is driven against; returns their ids."""
+    log = io.StringIO()
+    seed_marketplace(
+        log,
+        users=env_int('BENCHMARK_USERS', 300),
+        items=env_int('BENCHMARK_ITEMS', 3000),
+        notifications_per_user=env_int('BENCHMARK_NOTIFICATIONS_PER_USER', 30),
+    )
+    # The busiest seeded user, so lists page over a realistic history
+    actor = User.objects.get(username=f'{PREFIX}0')
+    actor.set_password(PASSWORD)
+    actor.save(update_fields=['password'])
+    other = UserFactory(username='bench-other')
+
+    item = ItemFactory(owner=actor)
+    other_item = ItemFactory(owner=other)
+    pending = BorrowRequestFactory(item=item, borrower=other)
+    record = BorrowRecordFactory(request__item=other_item, request__borrower=actor)
+    rating = RatingFactory(from_user=actor, item=other_item)
+    notification = NotificationFactory(user=actor, related_item=item, related_request=pending)
+    call_command('reconcile_unread_counts', stdout=log)
+    call_command('rebuild_item_bookings', stdout=log)
+
+    return {
+        'actor': actor.pk,
+        'other': other.pk,
+        'category': item.category_id,
+        'item': item.pk,
+        'other_item': other_item.pk,
+        'request': pending.pk,
+        'record': record.pk,
+        'rating': rating.pk,
+        'notification': notification.pk,
+        'counts': {
+            model.__name__: model.objects.count()
+            for model in (User, Item, BorrowRequest, Rating, Notification)
+        },
+    }
+
+
+@pytest.fixture(scope='module')
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        for alias in caches:
+            caches[alias].clear()
+        yield build_dataset()
+        # Leave the test database empty for whatever runs next
+        call_command('flush', interactive=False, verbosity=0)
+
+
+@pytest.fixture(scope='session')
+def budgets():
+    path = os.environ.get('BENCHMARK_BUDGETS', BENCHMARKS_DIR / 'budgets.json')
+    with open(path) as budgets_file:
+        return json.load(budgets_file)
+
+
+@pytest.fixture(scope='session')
+def benchmark_results():
+    """Per-endpoint results, written to a JSON file when the session ends."""
+    results = {'dataset': {}, 'endpoints': {}}
+    yield results
+    if not results['endpoints']:
+        return
+    commit = current_commit()
+    started = timezone.now()
+    path = Path(os.environ.get(
+        'BENCHMARK_RESULTS',
+        BENCHMARKS_DIR.parent / 'benchmark-results' / f"{started:%Y%m%d-%H%M%S}-{commit or 'unknown'}.json",
+    ))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        'commit': commit,
+        'created_at': started.isoformat(),
+        'iterations': env_int('BENCHMARK_ITERATIONS', 20),
+        'dataset': results['dataset'],
+        'endpoints': dict(sorted(results['endpoints'].items())),
+    }, indent=2))
+    written.append(path)
+
+
+def pytest_terminal_summary(terminalreporter):
+    for path in written:
+        terminalreporter.write_line(f'Benchmark results written to {path}')
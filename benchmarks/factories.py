@@ -0,0 +1,92 @@
+"""
+factory_boy factories for the benchmark suite (and any test that wants them).
+
+Bulk volume comes from ``benchmarks.seeding``; these build the handful of
+objects a benchmark needs to know by id, through the models' normal save
+paths (denormalized parties, bookings, counters).
+"""
+from datetime import timedelta
+
+import factory
+from django.utils import timezone
+
+from accounts.models import User
+from borrows.models import BorrowRecord, BorrowRequest
+from items.models import Category, Item
+from notifications.models import Notification
+from ratings.models import Rating
+
+PASSWORD = 'bench-password'
+
+
+class UserFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = User
+        django_get_or_create = ('username',)
+        skip_postgeneration_save = True
+
+    username = factory.Sequence(lambda n: f'factory-user-{n}')
+    email = factory.LazyAttribute(lambda user: f'{user.username}@example.com')
+    first_name = factory.Faker('first_name')
+    last_name = factory.Faker('last_name')
+    location = factory.Faker('city')
+    password = factory.django.Password(PASSWORD)
+
+
+class CategoryFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Category
+        django_get_or_create = ('name',)
+
+    name = factory.Sequence(lambda n: f'Factory category {n}')
+
+
+class ItemFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Item
+
+    owner = factory.SubFactory(UserFactory)
+    category = factory.SubFactory(CategoryFactory)
+    title = factory.Faker('sentence', nb_words=3)
+    description = factory.Faker('paragraph')
+
+
+class BorrowRequestFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = BorrowRequest
+
+    item = factory.SubFactory(ItemFactory)
+    borrower = factory.SubFactory(UserFactory)
+    message = factory.Faker('sentence')
+    start_date = factory.LazyFunction(timezone.now)
+    end_date = factory.LazyAttribute(lambda request: request.start_date + timedelta(days=7))
+
+
+class BorrowRecordFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = BorrowRecord
+
+    request = factory.SubFactory(BorrowRequestFactory, status='approved')
+    start_date = factory.LazyFunction(timezone.now)
+    due_date = factory.LazyAttribute(lambda record: record.start_date + timedelta(days=14))
+
+
+class RatingFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Rating
+
+    from_user = factory.SubFactory(UserFactory)
+    item = factory.SubFactory(ItemFactory)
+    to_user = factory.SelfAttribute('item.owner')
+    stars = factory.Faker('random_int', min=1, max=5)
+    message = factory.Faker('sentence')
+
+
+class NotificationFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Notification
+
+    user = factory.SubFactory(UserFactory)
+    type = 'request'
+    title = factory.Faker('sentence', nb_words=4)
+    message = factory.Faker('sentence')
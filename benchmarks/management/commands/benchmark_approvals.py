@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Q
+
+from accounts.models import User
+from borrows.models import BorrowRecord, BorrowRequest
+from borrows.services import TransitionConflict, approve_request
+from items.models import Item
+from notifications.models import NotificationOutbox
+
+PREFIX = 'approval-bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Approve competing borrow requests from many threads at once, report '
+        'throughput and check that every item was lent exactly once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=200)
+        parser.add_argument('--requests-per-item', type=int, default=10)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        item_ids = self.seed(options)
+        requests = list(BorrowRequest.objects.filter(item__in=item_ids).select_related('lender'))
+        # Interleave so threads keep colliding on the same items
+        random.Random(options['seed']).shuffle(requests)
+        queue = iter(requests)
+        queue_lock = threading.Lock()
+        outcomes = Counter()
+        outcomes_lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'])
+
+        def worker():
+            local = Counter()
+            barrier.wait()
+            try:
+                while True:
+                    with queue_lock:
+                        borrow_request = next(queue, None)
+                    if borrow_request is None:
+                        break
+                    while True:
+                        try:
+                            approve_request(borrow_request, borrow_request.lender)
+                            local['approved'] += 1
+                        except TransitionConflict:
+                            local['conflict'] += 1
+                        except DatabaseError:
+                            # Backends without row locks (SQLite) fail the concurrent writer instead
+                            local['retried'] += 1
+                            time.sleep(0.001)
+                            continue
+                        break
+            finally:
+                connection.close()
+                with outcomes_lock:
+                    outcomes.update(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        attempts = outcomes['approved'] + outcomes['conflict']
+        self.stdout.write(
+            f"{attempts} approvals attempted by {options['threads']} threads in {elapsed:.2f}s "
+            f"({attempts / elapsed:.0f}/s): {outcomes['approved']} approved, "
+            f"{outcomes['conflict']} conflicts, {outcomes['retried']} lock retries"
+        )
+        self.check_invariants(item_ids, options['requests_per_item'])
+
+    def check_invariants(self, item_ids, requests_per_item):
+        per_item = Item.objects.filter(pk__in=item_ids).annotate(
+            approved=Count('borrow_requests', filter=Q(borrow_requests__status='approved')),
+            rejected=Count('borrow_requests', filter=Q(borrow_requests__status='rejected')),
+        )
+        for item in per_item:
+            if item.status != 'borrowed' or item.approved != 1 or item.rejected != requests_per_item - 1:
+                raise CommandError(
+                    f'Item {item.pk}: status={item.status}, {item.approved} approved, {item.rejected} rejected'
+                )
+        records = BorrowRecord.objects.filter(request__item__in=item_ids).count()
+        if records != len(item_ids):
+            raise CommandError(f'{records} borrow records for {len(item_ids)} items')
+        self.stdout.write('Every item was lent exactly once and all competing requests were rejected.')
+
+    def seed(self, options):
+        """Create the benchmark data once; later invocations reset it to all-pending."""
+        items = Item.objects.filter(owner__username__startswith=PREFIX)
+        if items.exists():
+            with transaction.atomic():
+                requests = BorrowRequest.objects.filter(item__in=items)
+                NotificationOutbox.objects.filter(related_request__in=requests).delete()
+                BorrowRecord.objects.filter(request__in=requests).delete()
+                requests.update(status='pending')
+                items.update(status='available')
+            return list(items.values_list('pk', flat=True))
+
+        self.stdout.write('Seeding approval benchmark data...')
+        per_item = options['requests_per_item']
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'{PREFIX}{index}', email=f'{PREFIX}{index}@example.com')
+                for index in range(per_item + 1)
+            ])
+            lender, borrowers = users[0], users[1:]
+            items = Item.objects.bulk_create([
+                Item(owner=lender, title=f'Contended item {index}', description='benchmark')
+                for index in range(options['items'])
+            ])
+            BorrowRequest.objects.bulk_create([
+                BorrowRequest(item=item, lender=lender, borrower=borrower)
+                for item in items
+                for borrower in borrowers
+            ])
+        return [item.pk for item in items]
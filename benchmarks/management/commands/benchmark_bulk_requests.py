@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from borrows.models import BorrowRecord, BorrowRequest
+from items.models import Item
+from notifications.models import NotificationOutbox
+
+PREFIX = 'bulk-bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Approve/reject the same set of borrow requests once with sequential '
+        'PATCH /api/borrows/requests/{id}/ calls and once with a single '
+        'POST /api/borrows/requests/bulk/, and compare the timings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--reject-every', type=int, default=4, help='Reject every Nth request, approve the rest.')
+
+    def handle(self, *args, **options):
+        lender, request_ids = self.seed(options['requests'])
+        changes = [
+            (pk, 'rejected' if index % options['reject_every'] == 0 else 'approved')
+            for index, pk in enumerate(request_ids)
+        ]
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(lender)
+
+        self.reset(request_ids)
+        started = time.perf_counter()
+        for pk, status in changes:
+            response = client.patch(f'/api/borrows/requests/{pk}/', {'status': status}, format='json')
+            if response.status_code != 200:
+                raise CommandError(f'PATCH {pk} failed: {response.status_code} {response.content[:200]}')
+        sequential = time.perf_counter() - started
+        expected = self.outcome(request_ids)
+
+        self.reset(request_ids)
+        started = time.perf_counter()
+        response = client.post(
+            '/api/borrows/requests/bulk/',
+            {'updates': [{'id': pk, 'status': status} for pk, status in changes]},
+            format='json',
+        )
+        bulk = time.perf_counter() - started
+        if response.status_code != 200 or response.data['updated_count'] != len(changes):
+            raise CommandError(f'Bulk update failed: {response.status_code} {response.content[:200]}')
+        if self.outcome(request_ids) != expected:
+            raise CommandError('The bulk endpoint left different statuses, records or notifications behind.')
+
+        self.stdout.write(f'{len(changes)} sequential PATCHes: {sequential * 1000:.0f}ms')
+        self.stdout.write(f'1 bulk POST:            {bulk * 1000:.0f}ms ({sequential / bulk:.1f}x faster)')
+
+    def outcome(self, request_ids):
+        return (
+            sorted(BorrowRequest.objects.filter(pk__in=request_ids).values_list('pk', 'status')),
+            sorted(BorrowRecord.objects.filter(request__in=request_ids).values_list('request_id', 'borrower_id')),
+            sorted(NotificationOutbox.objects.filter(related_request__in=request_ids).values_list('related_request_id', 'type')),
+        )
+
+    def reset(self, request_ids):
+        with transaction.atomic():
+            NotificationOutbox.objects.filter(related_request__in=request_ids).delete()
+            BorrowRecord.objects.filter(request__in=request_ids).delete()
+            BorrowRequest.objects.filter(pk__in=request_ids).update(status='pending')
+            Item.objects.filter(borrow_requests__in=request_ids).update(status='available')
+
+    def seed(self, count):
+        """One lender with ``count`` items, each with one pending request; created once."""
+        lender = User.objects.filter(username=f'{PREFIX}lender').first()
+        if lender is None:
+            self.stdout.write('Seeding bulk benchmark data...')
+            with transaction.atomic():
+                lender = User.objects.create(username=f'{PREFIX}lender', email=f'{PREFIX}lender@example.com')
+                borrowers = User.objects.bulk_create([
+                    User(username=f'{PREFIX}{index}', email=f'{PREFIX}{index}@example.com') for index in range(50)
+                ])
+                items = Item.objects.bulk_create([
+                    Item(owner=lender, title=f'Bulk item {index}', description='benchmark') for index in range(count)
+                ])
+                BorrowRequest.objects.bulk_create([
+                    BorrowRequest(item=item, lender=lender, borrower=borrowers[index % len(borrowers)])
+                    for index, item in enumerate(items)
+                ])
+        request_ids = list(
+            BorrowRequest.objects.filter(lender=lender).order_by('pk').values_list('pk', flat=True)[:count]
+        )
+        return lender, request_ids
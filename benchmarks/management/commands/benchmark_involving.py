@@ -0,0 +1,86 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from benchmarks.seeding import PREFIX, seed_marketplace
+from borrows.models import BorrowRecord, BorrowRequest
+from ratings.models import Rating
+
+
+def legacy_requests(user):
+    return BorrowRequest.objects.filter(borrower=user) | BorrowRequest.objects.filter(item__owner=user)
+
+
+def legacy_records(user):
+    return (
+        BorrowRecord.objects.filter(request__borrower=user)
+        | BorrowRecord.objects.filter(request__item__owner=user)
+    )
+
+
+def legacy_ratings(user):
+    return Rating.objects.filter(from_user=user) | Rating.objects.filter(to_user=user)
+
+
+# (label, ordering, previous OR-across-join queryset, involving() queryset)
+CASES = [
+    ('borrow requests', ('-request_date', '-id'), legacy_requests, BorrowRequest.objects.involving),
+    ('borrow records', ('-created_at', '-id'), legacy_records, BorrowRecord.objects.involving),
+    ('ratings', ('-created_at', '-id'), legacy_ratings, Rating.objects.involving),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the "everything I am involved in" list queries: the previous OR across '
+        'a join against involving() on the denormalized lender/borrower columns.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2_000)
+        parser.add_argument('--items', type=int, default=50_000)
+        parser.add_argument('--requests-per-item', type=float, default=2.0)
+        parser.add_argument('--sample', type=int, default=20, help='Users to run the queries for.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--plans', action='store_true', help='Print EXPLAIN output for the first user.')
+
+    def handle(self, *args, **options):
+        seed_marketplace(
+            self.stdout, users=options['users'], items=options['items'],
+            requests_per_item=options['requests_per_item'], notifications_per_user=0,
+            seed=options['seed'],
+        )
+        users = list(User.objects.filter(username__startswith=PREFIX).order_by('pk')[:options['sample']])
+        if not users:
+            raise CommandError('No benchmark users found.')
+
+        self.stdout.write(f"{'list':<18}{'OR+join ms':>12}{'involving ms':>14}{'speedup':>10}")
+        for label, ordering, legacy, involving in CASES:
+            before, after = [], []
+            for user in users:
+                old = legacy(user).order_by(*ordering)
+                new = involving(user).order_by(*ordering)
+                if list(old.values_list('pk', flat=True)) != list(new.values_list('pk', flat=True)):
+                    raise CommandError(f'{label}: involving() disagrees with the previous query for user {user.pk}')
+                before.append(self.time_page(old, options['repeat']))
+                after.append(self.time_page(new, options['repeat']))
+
+            before_ms, after_ms = statistics.median(before), statistics.median(after)
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            self.stdout.write(f'{label:<18}{before_ms:>12.2f}{after_ms:>14.2f}{speedup:>9.1f}x')
+            if options['plans']:
+                self.stdout.write(f'  OR+join:\n{legacy(users[0]).order_by(*ordering)[:20].explain()}')
+                self.stdout.write(f'  involving:\n{involving(users[0]).order_by(*ordering)[:20].explain()}\n')
+
+    def time_page(self, queryset, repeat):
+        """Median time for what a paginated list does: the first page plus a COUNT."""
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset[:20])
+            queryset.count()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
@@ -0,0 +1,104 @@
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import User
+from benchmarks.seeding import PREFIX, seed_marketplace
+from borrows.models import BorrowRequest
+from borrows.serializers import BorrowRequestSerializer
+from items.models import Item
+from items.serializers import ItemSerializer
+from notifications.models import Notification
+from notifications.views import NotificationSerializer
+from sharelib import renderers
+from sharelib.renderers import FastJSONParser, FastJSONRenderer
+
+
+def notification_page(user, size):
+    return NotificationSerializer, (
+        Notification.objects.filter(user=user)
+        .select_related(*NotificationSerializer.related_paths())
+        .order_by('-created_at')[:size]
+    )
+
+
+def request_page(user, size):
+    return BorrowRequestSerializer, (
+        BorrowRequest.objects.involving(user)
+        .select_related(*BorrowRequestSerializer.related_paths())
+        .order_by('-request_date')[:size]
+    )
+
+
+def item_page(user, size):
+    return ItemSerializer, Item.objects.select_related(*ItemSerializer.related_paths()).order_by('-created_at')[:size]
+
+
+# (label, page builder): the payloads the list endpoints render
+CASES = [
+    ('notifications', notification_page),
+    ('borrow requests', request_page),
+    ('items', item_page),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time DRF's JSONRenderer/JSONParser against the orjson-backed FastJSONRenderer/"
+        'FastJSONParser on real serializer output, and check the bytes are identical.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--items', type=int, default=5_000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    # Time what production runs: with DEBUG on, FastJSONRenderer also walks responses for NaN/Infinity
+    @override_settings(DEBUG=False)
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError('orjson is not installed; FastJSONRenderer would just use JSONRenderer.')
+        seed_marketplace(
+            self.stdout, users=options['users'], items=options['items'], notifications_per_user=200,
+            seed=options['seed'],
+        )
+        user = User.objects.get(username=f'{PREFIX}0')
+        request = Request(APIRequestFactory().get('/api/'))
+        request.user = user
+
+        self.stdout.write(
+            f"{'payload':<18}{'KB':>8}{'render ms':>11}{'fast ms':>9}{'speedup':>9}"
+            f"{'parse ms':>10}{'fast ms':>9}{'speedup':>9}"
+        )
+        for label, build in CASES:
+            serializer_class, queryset = build(user, options['page_size'])
+            data = serializer_class(queryset, many=True, context={'request': request}).data
+            content = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != content:
+                raise CommandError(f'{label}: FastJSONRenderer output differs from JSONRenderer')
+
+            render = self.time(lambda: JSONRenderer().render(data), options['repeat'])
+            fast_render = self.time(lambda: FastJSONRenderer().render(data), options['repeat'])
+            parse = self.time(lambda: JSONParser().parse(io.BytesIO(content)), options['repeat'])
+            fast_parse = self.time(lambda: FastJSONParser().parse(io.BytesIO(content)), options['repeat'])
+            self.stdout.write(
+                f'{label:<18}{len(content) / 1024:>8.1f}{render:>11.3f}{fast_render:>9.3f}{render / fast_render:>8.1f}x'
+                f'{parse:>10.3f}{fast_parse:>9.3f}{parse / fast_parse:>8.1f}x'
+            )
+
+    def time(self, func, repeat):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
@@ -0,0 +1,86 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from borrows import scheduler
+from borrows.models import BorrowRecord, BorrowRequest
+from items.models import Item
+from notifications.models import NotificationOutbox
+
+PREFIX = 'sched-bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Time one borrow scheduler run over many overdue and due-soon records, '
+        'then check that a second run does nothing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overdue', type=int, default=100_000)
+        parser.add_argument('--due-soon', type=int, default=10_000)
+        parser.add_argument('--users', type=int, default=5_000)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        records = self.seed(options, now)
+        self.stdout.write(f'{records.count()} active benchmark records')
+
+        started = time.perf_counter()
+        result = scheduler.run(now=now, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"First run: {result['overdue']} overdue, {result['reminded']} reminded in {elapsed:.2f}s "
+            f"({NotificationOutbox.objects.count()} notifications queued)"
+        )
+
+        started = time.perf_counter()
+        rerun = scheduler.run(now=now, batch_size=options['batch_size'])
+        self.stdout.write(f'Second run: {rerun} in {time.perf_counter() - started:.2f}s')
+        if any(rerun.values()):
+            raise CommandError('The scheduler is not idempotent: the second run did work.')
+
+    def seed(self, options, now):
+        """Create the benchmark records once; later invocations reset them to active."""
+        records = BorrowRecord.objects.filter(borrower__username__startswith=PREFIX)
+        if records.exists():
+            with transaction.atomic():
+                NotificationOutbox.objects.filter(related_request__borrow_record__in=records).delete()
+                records.update(status='borrowed', overdue_at=None, reminded_at=None)
+            return records
+
+        self.stdout.write('Seeding scheduler benchmark records...')
+        total = options['overdue'] + options['due_soon']
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'{PREFIX}{index}', email=f'{PREFIX}{index}@example.com')
+                for index in range(options['users'])
+            ], batch_size=5_000)
+            items = Item.objects.bulk_create([
+                Item(owner=users[index % len(users)], title=f'Scheduled item {index}', description='benchmark')
+                for index in range(total)
+            ], batch_size=5_000)
+            requests = BorrowRequest.objects.bulk_create([
+                BorrowRequest(
+                    item=item, lender_id=item.owner_id, borrower=users[(index + 1) % len(users)], status='approved'
+                )
+                for index, item in enumerate(items)
+            ], batch_size=5_000)
+            BorrowRecord.objects.bulk_create([
+                BorrowRecord(
+                    request=request, lender_id=request.lender_id, borrower_id=request.borrower_id,
+                    start_date=now - timedelta(days=14),
+                    # The first --overdue records are past due, the rest due within the reminder window
+                    due_date=(
+                        now - timedelta(minutes=1 + index % 10_000) if index < options['overdue']
+                        else now + timedelta(minutes=1 + index % 600)
+                    ),
+                )
+                for index, request in enumerate(requests)
+            ], batch_size=5_000)
+        return records
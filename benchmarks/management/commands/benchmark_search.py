@@ -0,0 +1,94 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import User
+from items.models import Item
+from items.search import ItemSearchFilter, get_search_backend
+
+WORDS = [
+    'drill', 'ladder', 'tent', 'camera', 'projector', 'bike', 'kayak', 'guitar',
+    'sewing', 'machine', 'mixer', 'blender', 'saw', 'hammer', 'speaker', 'lens',
+    'tripod', 'board', 'game', 'book', 'novel', 'telescope', 'stroller', 'cooler',
+    'cordless', 'electric', 'portable', 'vintage', 'compact', 'heavy', 'duty',
+    'waterproof', 'wireless', 'acoustic', 'digital', 'folding', 'garden', 'power',
+]
+SYLLABLES = ['ka', 'lo', 'mi', 'ven', 'tor', 'ish', 'ra', 'bel', 'dun', 'sa', 'qu', 'fen', 'ox', 'pil', 'zo']
+
+
+def build_vocabulary(rng, size=20_000):
+    """Real item words plus a long tail of synthetic ones, so terms have realistic selectivity."""
+    tail = {''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size)}
+    return WORDS + sorted(tail - set(WORDS))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark indexed item search against the icontains SearchFilter.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1_000_000,
+                            help='Number of items to benchmark against (seeded if missing).')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Search query to run (repeatable).')
+
+    def handle(self, *args, **options):
+        self.seed_items(options['items'], options['batch_size'], options['seed'])
+
+        queries = options['queries'] or ['drill', 'cordless drill', 'vintage camera lens', 'kay', 'nomatch']
+        view = type('ItemSearchView', (), {'search_fields': ['title', 'description']})()
+        backend = get_search_backend()
+        self.stdout.write(f'Backend: {type(backend).__name__} ({connection.vendor}), '
+                          f'{Item.objects.count()} items\n')
+        self.stdout.write(f"{'query':<24}{'icontains ms':>14}{'indexed ms':>14}{'speedup':>10}{'hits':>10}")
+
+        for query in queries:
+            request = Request(APIRequestFactory().get('/api/items/', {'search': query}))
+            baseline = self.time_filter(filters.SearchFilter(), request, view, options['repeat'])
+            indexed = self.time_filter(ItemSearchFilter(), request, view, options['repeat'])
+            hits = ItemSearchFilter().filter_queryset(request, Item.objects.all(), view).count()
+            speedup = baseline / indexed if indexed else float('inf')
+            self.stdout.write(f'{query:<24}{baseline:>14.2f}{indexed:>14.2f}{speedup:>9.1f}x{hits:>10}')
+
+    def time_filter(self, backend, request, view, repeat):
+        """Median time for one search page: the first 20 rows plus the COUNT."""
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset = backend.filter_queryset(request, Item.objects.all(), view)
+            list(queryset[:20])
+            queryset.count()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def seed_items(self, target, batch_size, seed):
+        existing = Item.objects.count()
+        if existing >= target:
+            return
+
+        owner, _ = User.objects.get_or_create(username='benchmark', defaults={'email': 'benchmark@example.com'})
+        rng = random.Random(seed + existing)
+        vocabulary = build_vocabulary(random.Random(seed))
+        # Zipf-like weights: a handful of very common words, a long rare tail
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        remaining = target - existing
+        self.stdout.write(f'Seeding {remaining} items...')
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            Item.objects.bulk_create([
+                Item(
+                    owner=owner,
+                    title=' '.join(rng.choices(vocabulary, weights, k=3)).title(),
+                    description=' '.join(rng.choices(vocabulary, weights, k=rng.randint(10, 40))),
+                )
+                for _ in range(size)
+            ], batch_size=size)
+            remaining -= size
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare two endpoint benchmark result files (pytest -m benchmark) and flag '
+        'endpoints whose p95 latency or query count regressed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help='Results JSON from the earlier commit.')
+        parser.add_argument('candidate', help='Results JSON from the later commit.')
+        parser.add_argument('--threshold', type=float, default=1.2,
+                            help='p95 ratio (candidate / baseline) above which latency counts as regressed.')
+
+    def load(self, path):
+        try:
+            with open(path) as results_file:
+                return json.load(results_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+    def handle(self, *args, **options):
+        baseline, candidate = self.load(options['baseline']), self.load(options['candidate'])
+        self.stdout.write(f"{baseline.get('commit')} -> {candidate.get('commit')}\n")
+        self.stdout.write(f"{'endpoint':<30}{'p95 ms':>18}{'ratio':>8}{'queries':>12}")
+
+        regressions = 0
+        for name, after in candidate['endpoints'].items():
+            before = baseline['endpoints'].get(name)
+            if before is None:
+                self.stdout.write(f"{name:<30}{after['p95_ms']:>18.2f}{'new':>8}{after['queries']:>12}")
+                continue
+            ratio = after['p95_ms'] / before['p95_ms'] if before['p95_ms'] else float('inf')
+            regressed = ratio > options['threshold'] or after['queries'] > before['queries']
+            regressions += regressed
+            line = (f"{name:<30}{before['p95_ms']:>8.2f} -> {after['p95_ms']:>6.2f}{ratio:>7.2f}x"
+                    f"{before['queries']:>5} -> {after['queries']:<4}")
+            self.stdout.write(self.style.WARNING(line) if regressed else line)
+
+        summary = f'{regressions} regressed endpoint(s)'
+        self.stdout.write(self.style.WARNING(summary) if regressions else self.style.SUCCESS(summary))
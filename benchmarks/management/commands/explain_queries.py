@@ -0,0 +1,147 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import User
+from benchmarks.seeding import PREFIX, seed_marketplace
+from borrows.models import BorrowRecord, BorrowRequest
+from borrows.views import BorrowRecordViewSet, BorrowRequestViewSet
+from items.models import Category, Item
+from items.views import ItemViewSet
+from notifications.models import Notification
+from notifications.views import NotificationViewSet
+from ratings.models import Rating
+from ratings.views import RatingViewSet
+
+# The filter-path indexes under test (dropped for the "before" measurements)
+INDEX_SUITE = {
+    Item: ['item_status_cat_created_idx', 'item_owner_created_idx', 'item_available_cat_idx'],
+    BorrowRequest: [
+        'borrowreq_item_status_idx', 'borrowreq_borrower_date_idx', 'borrowreq_pending_item_idx',
+        'borrowreq_lender_date_idx',
+    ],
+    BorrowRecord: [
+        'borrowrec_status_due_idx', 'borrowrec_active_due_idx',
+        'borrowrec_borrower_created_idx', 'borrowrec_lender_created_idx',
+    ],
+    Notification: ['notif_user_created_idx', 'notif_user_read_created_idx'],
+    Rating: ['rating_item_created_idx', 'rating_to_user_created_idx'],
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def viewset_queryset(viewset_class, user, params=None):
+    """The queryset a viewset's list action would paginate for ``user`` and ``params``."""
+    request = Request(APIRequestFactory().get('/', params or {}))
+    request.user = user
+    view = viewset_class(request=request, format_kwarg=None, args=(), kwargs={}, action='list')
+    return view.filter_queryset(view.get_queryset())
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large dataset and print EXPLAIN plans and timings for the hot list/filter '
+        'queries with and without the filter-path index suite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2_000)
+        parser.add_argument('--items', type=int, default=50_000)
+        parser.add_argument('--requests-per-item', type=float, default=2.0)
+        parser.add_argument('--notifications-per-user', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--no-plans', action='store_true', help='Only print timings.')
+
+    def handle(self, *args, **options):
+        if not connection.features.can_rollback_ddl:
+            raise CommandError(f'{connection.vendor} cannot roll back DROP INDEX; use SQLite or PostgreSQL.')
+
+        seed_marketplace(
+            self.stdout, users=options['users'], items=options['items'],
+            requests_per_item=options['requests_per_item'],
+            notifications_per_user=options['notifications_per_user'],
+            batch_size=options['batch_size'], seed=options['seed'],
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        cases = self.build_cases()
+        before = self.without_suite(lambda: self.measure(cases, options['repeat']))
+        after = self.measure(cases, options['repeat'])
+
+        self.stdout.write(f'\n{connection.vendor}: {Item.objects.count()} items, '
+                          f'{BorrowRequest.objects.count()} requests, {Notification.objects.count()} notifications\n')
+        self.stdout.write(f"{'query':<44}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for label, _ in cases:
+            (before_ms, before_plan), (after_ms, after_plan) = before[label], after[label]
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            self.stdout.write(f'{label:<44}{before_ms:>12.2f}{after_ms:>12.2f}{speedup:>9.1f}x')
+            if not options['no_plans']:
+                self.stdout.write(f'  before:\n{self.indent(before_plan)}\n  after:\n{self.indent(after_plan)}\n')
+
+    def build_cases(self):
+        user = User.objects.get(username=f'{PREFIX}0')
+        category = Category.objects.filter(name__startswith='Benchmark').order_by('pk').first()
+        item = (
+            Rating.objects.filter(item__owner__username__startswith=PREFIX)
+            .values_list('item', flat=True).order_by('pk').first()
+        )
+        now = timezone.now()
+        return [
+            ('items ?status=available&category=', viewset_queryset(
+                ItemViewSet, user, {'status': 'available', 'category': category.pk, 'ordering': '-created_at'})),
+            ('items ?owner=', viewset_queryset(ItemViewSet, user, {'owner': user.pk, 'ordering': '-created_at'})),
+            ('borrow requests ?borrower=me', viewset_queryset(BorrowRequestViewSet, user, {'borrower': 'me'})),
+            ('borrow requests pending for item', BorrowRequest.objects.filter(item=item, status='pending')),
+            ('borrow requests pending for item, newest', BorrowRequest.objects.filter(
+                item=item, status='pending').order_by('-request_date')),
+            ('borrow records ?borrower=me', viewset_queryset(BorrowRecordViewSet, user, {'borrower': 'me'})),
+            ('borrow records overdue scan', BorrowRecord.objects.filter(
+                status='borrowed', due_date__lt=now).order_by('due_date')),
+            ('notifications', viewset_queryset(NotificationViewSet, user)),
+            ('notifications ?filter=unread', viewset_queryset(NotificationViewSet, user, {'filter': 'unread'})),
+            ('ratings', viewset_queryset(RatingViewSet, user).order_by('-created_at')),
+            ('ratings by item', Rating.objects.filter(item=item).order_by('-created_at')),
+        ]
+
+    def measure(self, cases, repeat):
+        """{label: (median ms for the first page, EXPLAIN output)}"""
+        results = {}
+        for label, queryset in cases:
+            page = queryset[:20]
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(page.all())
+                samples.append((time.perf_counter() - start) * 1000)
+            results[label] = (statistics.median(samples), page.explain())
+        return results
+
+    def without_suite(self, measure):
+        """Run ``measure`` with the index suite dropped inside a transaction that is rolled back."""
+        results = None
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for names in INDEX_SUITE.values():
+                        for name in names:
+                            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+                    cursor.execute('ANALYZE')
+                results = measure()
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def indent(self, plan):
+        return '\n'.join(f'    {line}' for line in plan.splitlines())
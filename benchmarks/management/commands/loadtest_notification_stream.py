@@ -0,0 +1,157 @@
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+
+
+async def read_headers(reader):
+    status_line = await reader.readline()
+    while (await reader.readline()) not in (b'\r\n', b''):
+        pass
+    return int(status_line.split()[1]) if status_line else 0
+
+
+async def read_chunked_lines(reader):
+    """Yield decoded lines from a chunked (or plain) streaming response body."""
+    buffer = b''
+    while True:
+        size_line = await reader.readline()
+        if not size_line:
+            return
+        try:
+            size = int(size_line.strip(), 16)
+        except ValueError:
+            # Not chunked: treat the line as body content
+            buffer += size_line
+        else:
+            if size == 0:
+                return
+            buffer += await reader.readexactly(size)
+            await reader.readline()  # trailing CRLF
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line.decode()
+
+
+class StreamClient:
+    def __init__(self, host, port, token):
+        self.host, self.port, self.token = host, port, token
+        self.received = {}
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f'GET /api/notifications/stream/ HTTP/1.1\r\n'
+            f'Host: {self.host}\r\nAuthorization: Bearer {self.token}\r\n'
+            f'Accept: text/event-stream\r\n\r\n'.encode()
+        )
+        await self.writer.drain()
+        status = await read_headers(self.reader)
+        if status != 200:
+            raise CommandError(f'Stream connection failed with HTTP {status}')
+
+    async def listen(self):
+        async for line in read_chunked_lines(self.reader):
+            if line.startswith('data: '):
+                payload = json.loads(line[6:])
+                self.received[payload['title']] = time.perf_counter()
+
+    def close(self):
+        self.writer.close()
+
+
+async def post_notification(host, port, token, title):
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps({'type': 'message', 'title': title, 'message': 'load test'}).encode()
+    writer.write(
+        f'POST /api/notifications/ HTTP/1.1\r\nHost: {host}\r\n'
+        f'Authorization: Bearer {token}\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+    )
+    await writer.drain()
+    status = await read_headers(reader)
+    writer.close()
+    return status
+
+
+class Command(BaseCommand):
+    help = (
+        'Open many idle SSE notification streams against a running ASGI server '
+        '(e.g. uvicorn sharelib.asgi:application) and measure push latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--clients', type=int, default=1000, help='Concurrent stream connections.')
+        parser.add_argument('--users', type=int, default=10, help='Distinct users the clients are spread over.')
+        parser.add_argument('--events', type=int, default=20, help='Notifications published per user.')
+        parser.add_argument('--idle', type=float, default=5.0, help='Seconds to hold connections idle first.')
+        parser.add_argument('--connect-concurrency', type=int, default=200)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        tokens = []
+        for index in range(options['users']):
+            user, _ = User.objects.get_or_create(
+                username=f'loadtest{index}', defaults={'email': f'loadtest{index}@example.com'}
+            )
+            tokens.append(str(RefreshToken.for_user(user).access_token))
+        asyncio.run(self.run(url.hostname, url.port or 80, tokens, options))
+
+    async def run(self, host, port, tokens, options):
+        clients = [StreamClient(host, port, tokens[i % len(tokens)]) for i in range(options['clients'])]
+
+        gate = asyncio.Semaphore(options['connect_concurrency'])
+
+        async def connect(client):
+            async with gate:
+                await client.connect()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect(client) for client in clients))
+        self.stdout.write(f"Connected {len(clients)} streams in {time.perf_counter() - started:.2f}s")
+        listeners = [asyncio.ensure_future(client.listen()) for client in clients]
+
+        await asyncio.sleep(options['idle'])
+
+        sent = {}
+        for _ in range(options['events']):
+            for user_index, token in enumerate(tokens):
+                title = f'loadtest-{uuid.uuid4().hex[:12]}'
+                sent[title] = (user_index, time.perf_counter())
+                status = await post_notification(host, port, token, title)
+                if status != 201:
+                    raise CommandError(f'Publishing failed with HTTP {status}')
+
+        await asyncio.sleep(2)  # let the last deliveries land
+        for listener in listeners:
+            listener.cancel()
+        for client in clients:
+            client.close()
+
+        latencies, missed = [], 0
+        for index, client in enumerate(clients):
+            user_index = index % len(tokens)
+            for title, (sent_user, sent_at) in sent.items():
+                if sent_user != user_index:
+                    continue
+                if title in client.received:
+                    latencies.append((client.received[title] - sent_at) * 1000)
+                else:
+                    missed += 1
+
+        if not latencies:
+            raise CommandError('No notifications were delivered.')
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(
+            f'Deliveries: {len(latencies)} (missed {missed})\n'
+            f'Latency ms: p50={statistics.median(latencies):.1f} p95={p95:.1f} max={latencies[-1]:.1f}'
+        )
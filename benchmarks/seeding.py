@@ -0,0 +1,292 @@
+"""
+Helpers for seeding large synthetic datasets in benchmark commands.
+
+Rows are generated in fixed-size chunks, each from its own RNG seeded with
+(seed, model, chunk), and inserted with ``bulk_create``. Users, items and
+borrow requests get explicit primary keys, so any row's foreign keys follow
+from its index alone (the owner of item ``i`` is ``owner_index(i)``) and
+chunks can be generated in any order or in parallel worker processes while
+the dataset stays identical for a given seed.
+
+Distributions aim at what production looks like: a few users own most
+items (user 0 the most) and popular items get most requests, borrow
+histories span three years with their records, returns and ratings, and
+all but the latest notifications have been read.
+"""
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from multiprocessing import get_context
+
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from accounts.models import User
+from borrows.models import BorrowRecord, BorrowRequest
+from items.models import Category, Item
+from notifications.models import Notification
+from ratings.models import Rating
+
+# Usernames of seeded users start with this; seeding is skipped when they exist
+PREFIX = 'bench-'
+
+ITEM_STATUSES = (['available', 'requested', 'borrowed', 'under_review'], [70, 10, 15, 5])
+# Requests older than RECENT_DAYS have been decided; recent ones are often still pending
+SETTLED_REQUEST_STATUSES = (['approved', 'rejected', 'cancelled'], [55, 30, 15])
+RECENT_REQUEST_STATUSES = (['pending', 'approved', 'rejected'], [50, 35, 15])
+NOTIFICATION_TYPES = [choice for choice, _ in Notification.TYPE_CHOICES]
+
+HISTORY_DAYS = 3 * 365
+RECENT_DAYS = 30
+# Exponents for owner/item popularity: index = int(n * random() ** SKEW), so
+# with 3 the top 1% of users own about a fifth of the items
+OWNER_SKEW = 3
+ITEM_POPULARITY_SKEW = 2
+ACTIVITY_SKEW = 2
+
+WORDS = [
+    'drill', 'ladder', 'tent', 'camera', 'projector', 'bike', 'kayak', 'guitar', 'mixer', 'saw',
+    'hammer', 'speaker', 'lens', 'tripod', 'board game', 'novel', 'telescope', 'stroller', 'cooler',
+]
+ADJECTIVES = ['cordless', 'electric', 'portable', 'vintage', 'compact', 'heavy duty', 'folding', 'wireless']
+
+SPLITMIX_MASK = (1 << 64) - 1
+STREAMS = {'owner': 1}
+
+
+def unit(seed, stream, index):
+    """Deterministic float in [0, 1) for (seed, stream, index), via splitmix64."""
+    x = (seed * 0x9E3779B97F4A7C15 + (STREAMS[stream] << 48) + index) & SPLITMIX_MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & SPLITMIX_MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & SPLITMIX_MASK
+    return (x ^ (x >> 31)) / 2 ** 64
+
+
+def skewed(rng_value, count, skew):
+    return min(int(count * rng_value ** skew), count - 1)
+
+
+def owner_index(plan, item_index):
+    return skewed(unit(plan['seed'], 'owner', item_index), plan['users'], OWNER_SKEW)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Make bulk_create keep the ``auto_now_add`` values we set (created_at,
+    request_date, ...) so seeded rows are spread over time like real data.
+    """
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def build_users(plan, rng, start, stop):
+    now = plan['now']
+    return {User: [
+        User(
+            pk=plan['user_base'] + index,
+            username=f'{PREFIX}{index}', email=f'{PREFIX}{index}@example.com',
+            password='!',  # Unusable
+            date_joined=now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400)),
+        )
+        for index in range(start, stop)
+    ]}
+
+
+def build_items(plan, rng, start, stop):
+    now = plan['now']
+    return {Item: [
+        Item(
+            pk=plan['item_base'] + index,
+            owner_id=plan['user_base'] + owner_index(plan, index),
+            title=f'{rng.choice(ADJECTIVES)} {rng.choice(WORDS)} {index}'.capitalize(),
+            description='Seeded for benchmarks',
+            category_id=rng.choice(plan['category_ids']),
+            condition=rng.choice(['new', 'good', 'good', 'used']),
+            status=rng.choices(*ITEM_STATUSES)[0],
+            created_at=now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400)),
+        )
+        for index in range(start, stop)
+    ]}
+
+
+def build_borrows(plan, rng, start, stop):
+    """Borrow requests with the records, and ratings, their outcomes imply."""
+    now = plan['now']
+    requests, records, ratings = [], [], []
+    for index in range(start, stop):
+        item = skewed(rng.random(), plan['items'], ITEM_POPULARITY_SKEW)
+        lender = owner_index(plan, item)
+        borrower = rng.randrange(plan['users'])
+        if borrower == lender:
+            borrower = (borrower + 1) % plan['users']
+        requested = now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400))
+        recent = now - requested < timedelta(days=RECENT_DAYS)
+        status = rng.choices(*(RECENT_REQUEST_STATUSES if recent else SETTLED_REQUEST_STATUSES))[0]
+        # bulk_create bypasses save(), so the denormalized parties are set here
+        request = BorrowRequest(
+            pk=plan['request_base'] + index,
+            item_id=plan['item_base'] + item,
+            borrower_id=plan['user_base'] + borrower,
+            lender_id=plan['user_base'] + lender,
+            status=status, request_date=requested,
+            start_date=requested + timedelta(days=1), end_date=requested + timedelta(days=8),
+        )
+        requests.append(request)
+        if status != 'approved':
+            continue
+
+        start_date = requested + timedelta(days=1)
+        due = start_date + timedelta(days=rng.randint(3, 30))
+        if due < now:
+            record_status = rng.choices(['returned', 'late', 'overdue'], [88, 8, 4])[0]
+        else:
+            record_status = 'borrowed'
+        returned = record_status in ('returned', 'late')
+        return_date = None
+        if record_status == 'returned':
+            return_date = due - timedelta(days=rng.randint(0, 2))
+        elif record_status == 'late':
+            return_date = due + timedelta(days=rng.randint(1, 10))
+        records.append(BorrowRecord(
+            request_id=request.pk, lender_id=request.lender_id, borrower_id=request.borrower_id,
+            start_date=start_date, due_date=due, return_date=return_date,
+            status=record_status, created_at=start_date,
+        ))
+        if returned and rng.random() < 0.5:
+            ratings.append(Rating(
+                from_user_id=request.borrower_id, to_user_id=request.lender_id, item_id=request.item_id,
+                stars=rng.choices([1, 2, 3, 4, 5], [3, 5, 12, 35, 45])[0], created_at=return_date + timedelta(days=1),
+            ))
+        if returned and rng.random() < 0.3:
+            ratings.append(Rating(
+                from_user_id=request.lender_id, to_user_id=request.borrower_id, item_id=request.item_id,
+                stars=rng.choices([1, 2, 3, 4, 5], [2, 4, 10, 34, 50])[0], created_at=return_date + timedelta(days=1),
+            ))
+    return {BorrowRequest: requests, BorrowRecord: records, Rating: ratings}
+
+
+def build_notifications(plan, rng, start, stop):
+    now = plan['now']
+    notifications = []
+    for _ in range(start, stop):
+        created = now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400))
+        fresh = now - created < timedelta(days=7)
+        notifications.append(Notification(
+            user_id=plan['user_base'] + skewed(rng.random(), plan['users'], ACTIVITY_SKEW),
+            type=rng.choice(NOTIFICATION_TYPES), title='Seeded',
+            message='Seeded for benchmarks', read=rng.random() < (0.4 if fresh else 0.97), created_at=created,
+        ))
+    return {Notification: notifications}
+
+
+# Stages in insertion order: (name, row builder, plan key holding the row count)
+STAGES = [
+    ('users', build_users, 'users'),
+    ('items', build_items, 'items'),
+    ('borrows', build_borrows, 'requests'),
+    ('notifications', build_notifications, 'notifications'),
+]
+BUILDERS = {name: builder for name, builder, _ in STAGES}
+
+
+def seed_chunk(task):
+    """Generate and insert one chunk of a stage; returns {model name: rows inserted}."""
+    stage, chunk, start, stop, plan = task
+    rng = random.Random(f"{plan['seed']}:{stage}:{chunk}")
+    rows = BUILDERS[stage](plan, rng, start, stop)
+    with explicit_timestamps(Item, BorrowRequest, BorrowRecord, Notification, Rating), transaction.atomic():
+        for model, objects in rows.items():
+            # A borrower may return the same item twice; the second rating is dropped
+            model.objects.bulk_create(objects, batch_size=plan['batch_size'], ignore_conflicts=model is Rating)
+    return {model.__name__: len(objects) for model, objects in rows.items()}
+
+
+def close_connections():
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+
+
+def next_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def seed_marketplace(stdout, users=2_000, items=50_000, requests_per_item=2.0,
+                     notifications_per_user=50, batch_size=5_000, seed=42, workers=1):
+    """
+    Seed users, items, borrow requests/records, ratings and notifications
+    with chunked bulk inserts (in ``workers`` processes), then rebuild the
+    denormalized counters the write paths would normally maintain. Does
+    nothing if already seeded. Returns {model name: rows inserted}.
+    """
+    if User.objects.filter(username=f'{PREFIX}0').exists():
+        return {}
+    if workers > 1 and connection.vendor == 'sqlite':
+        stdout.write('SQLite allows a single writer; seeding in one process.')
+        workers = 1
+
+    categories = [Category.objects.get_or_create(name=f'Benchmark {index}')[0] for index in range(12)]
+    plan = {
+        'seed': seed,
+        'now': timezone.now(),
+        'users': users,
+        'items': items,
+        'requests': int(items * requests_per_item),
+        'notifications': users * notifications_per_user,
+        'category_ids': [category.pk for category in categories],
+        'user_base': next_pk(User),
+        'item_base': next_pk(Item),
+        'request_base': next_pk(BorrowRequest),
+        'batch_size': batch_size,
+    }
+
+    totals = {}
+    pool = None
+    if workers > 1:
+        close_connections()
+        pool = get_context('fork').Pool(workers, initializer=close_connections)
+    try:
+        for stage, _, count_key in STAGES:
+            count = plan[count_key]
+            tasks = [
+                (stage, chunk, start, min(start + batch_size, count), plan)
+                for chunk, start in enumerate(range(0, count, batch_size))
+            ]
+            stdout.write(f'Seeding {stage} ({count} rows in {len(tasks)} chunks)...')
+            results = pool.imap_unordered(seed_chunk, tasks) if pool else map(seed_chunk, tasks)
+            for inserted in results:
+                for model_name, rows in inserted.items():
+                    totals[model_name] = totals.get(model_name, 0) + rows
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    # Explicit primary keys leave sequences behind on PostgreSQL
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [User, Item, BorrowRequest]):
+            cursor.execute(sql)
+
+    # bulk_create skips the write paths, so rebuild the denormalized counters
+    call_command('reconcile_unread_counts', stdout=stdout)
+    # Rating aggregates and UserStats counters; only its summary line is worth showing
+    report = io.StringIO()
+    call_command('check_user_stats', fix=True, stdout=report)
+    stdout.write(report.getvalue().splitlines()[-1])
+    call_command('rebuild_item_bookings', stdout=stdout)
+    return totals
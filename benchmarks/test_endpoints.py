@@ -0,0 +1,196 @@
+"""
+Endpoint benchmarks: every route in sharelib/urls.py, driven through the
+test client against a seeded dataset, with p50/p95 latency and query count
+checked against benchmarks/budgets.json.
+
+    pytest -m benchmark benchmarks/
+
+Each request runs in a savepoint that is rolled back, so writes (approvals,
+registrations, deletes) measure the same work on every iteration.
+test_every_route_is_benchmarked runs with the regular suite and fails when
+a new route has neither an endpoint here nor an entry in SKIPPED.
+"""
+import os
+import time
+from collections import namedtuple
+from statistics import median
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+
+from .factories import PASSWORD
+
+# ``path`` and ``data`` are formatted with the dataset ids (see conftest.build_dataset);
+# ``auth`` sends the actor's JWT; ``headers`` are extra request headers
+Endpoint = namedtuple('Endpoint', 'name method path data auth headers', defaults=(None, True, None))
+
+STRONG_PASSWORD = 'Correct-Horse-Battery-9'
+
+# Configured for the benchmark run: /metrics is only served with a token outside DEBUG
+METRICS_TOKEN = 'bench-metrics'
+
+ENDPOINTS = [
+    # Accounts
+    Endpoint('register', 'post', '/api/auth/register/', {
+        'username': 'bench-new', 'email': 'bench-new@example.com',
+        'password': STRONG_PASSWORD, 'password2': STRONG_PASSWORD,
+    }, auth=False),
+    Endpoint('login-email', 'post', '/api/auth/login/email/', {'email': 'bench-0@example.com', 'password': PASSWORD}, auth=False),
+    Endpoint('login-token', 'post', '/api/auth/login/', {'username': 'bench-0', 'password': PASSWORD}, auth=False),
+    Endpoint('token-refresh', 'post', '/api/auth/refresh/', {'refresh': '{refresh}'}, auth=False),
+    Endpoint('profile', 'get', '/api/auth/register/profile/'),
+    Endpoint('profile-update', 'patch', '/api/auth/register/profile/', {'bio': 'Benchmarking'}),
+    Endpoint('user-detail', 'get', '/api/users/{other}/', auth=False),
+    Endpoint('user-stats', 'get', '/api/users/me/stats/'),
+    # Items
+    Endpoint('category-list', 'get', '/api/items/categories/'),
+    Endpoint('category-detail', 'get', '/api/items/categories/{category}/'),
+    Endpoint('item-list', 'get', '/api/items/'),
+    Endpoint('item-list-anonymous', 'get', '/api/items/', auth=False),
+    Endpoint('item-list-filtered', 'get', '/api/items/?status=available&category={category}&ordering=-created_at'),
+    Endpoint('item-search', 'get', '/api/items/?search=item'),
+    Endpoint('item-list-cursor', 'get', '/api/items/?pagination=cursor'),
+    Endpoint('item-list-sparse', 'get', '/api/items/?fields=title,status,owner&expand='),
+    Endpoint('item-facets', 'get', '/api/items/facets/'),
+    Endpoint('item-detail', 'get', '/api/items/{item}/'),
+    Endpoint('item-create', 'post', '/api/items/', {
+        'title': 'Benchmark drill', 'description': 'desc', 'category_id': '{category}', 'condition': 'good',
+    }),
+    Endpoint('item-update', 'patch', '/api/items/{item}/', {'title': 'Renamed'}),
+    Endpoint('item-delete', 'delete', '/api/items/{item}/'),
+    # Borrows
+    Endpoint('borrows-root', 'get', '/api/borrows/'),
+    Endpoint('request-list', 'get', '/api/borrows/requests/'),
+    Endpoint('request-list-lender', 'get', '/api/borrows/requests/?lender=me'),
+    Endpoint('request-detail', 'get', '/api/borrows/requests/{request}/'),
+    Endpoint('request-create', 'post', '/api/borrows/requests/', {'item_id': '{other_item}', 'message': 'Please'}),
+    Endpoint('request-approve', 'patch', '/api/borrows/requests/{request}/', {'status': 'approved'}),
+    Endpoint('request-bulk', 'post', '/api/borrows/requests/bulk/', {'updates': [{'id': '{request}', 'status': 'rejected'}]}),
+    Endpoint('record-list', 'get', '/api/borrows/records/'),
+    Endpoint('record-detail', 'get', '/api/borrows/records/{record}/'),
+    Endpoint('record-export', 'get', '/api/borrows/records/export/?export_format=ndjson'),
+    # Notifications
+    Endpoint('notification-list', 'get', '/api/notifications/'),
+    Endpoint('notification-detail', 'get', '/api/notifications/{notification}/'),
+    Endpoint('notification-unread-count', 'get', '/api/notifications/unread-count/'),
+    Endpoint('notification-read', 'patch', '/api/notifications/{notification}/read/'),
+    Endpoint('notification-mark-all-read', 'post', '/api/notifications/mark-all-read/'),
+    Endpoint('notification-stream-ticket', 'post', '/api/notifications/stream-ticket/'),
+    # Ratings
+    Endpoint('rating-list', 'get', '/api/ratings/'),
+    Endpoint('rating-detail', 'get', '/api/ratings/{rating}/'),
+    Endpoint('rating-update', 'patch', '/api/ratings/{rating}/', {'stars': 4}),
+    Endpoint('rating-by-item', 'get', '/api/ratings/item/{item}/', auth=False),
+    # Project-level
+    Endpoint('schema', 'get', '/api/schema/', auth=False),
+    Endpoint('swagger-ui', 'get', '/api/docs/', auth=False),
+    Endpoint('redoc', 'get', '/api/redoc/', auth=False),
+    Endpoint('metrics', 'get', '/metrics', auth=False, headers={'Authorization': f'Bearer {METRICS_TOKEN}'}),
+]
+
+# URL names deliberately not benchmarked, with the reason
+SKIPPED = {
+    'notification-stream': 'long-lived SSE stream; see manage.py loadtest_notification_stream',
+}
+SKIPPED_NAMESPACES = {'admin'}
+
+
+def route_names(patterns, namespace=None):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace not in SKIPPED_NAMESPACES:
+                yield from route_names(pattern.url_patterns, pattern.namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}:{pattern.name}' if namespace else pattern.name
+
+
+def fill(value, ids):
+    """Substitute dataset ids into a path or request body."""
+    if isinstance(value, str):
+        filled = value.format(**ids)
+        return int(filled) if value.startswith('{') and filled.isdigit() else filled
+    if isinstance(value, dict):
+        return {key: fill(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, ids) for item in value]
+    return value
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[max(0, round(fraction * len(ordered)) - 1)]
+
+
+def server_timing(response):
+    """{'db': ms, 'serialize': ms, ...} from the Server-Timing header (sharelib.instrumentation)."""
+    timings = {}
+    for entry in filter(None, response.get('Server-Timing', '').split(', ')):
+        name, _, rest = entry.partition(';dur=')
+        timings[name] = float(rest.split(';')[0])
+    return timings
+
+
+def test_every_route_is_benchmarked():
+    ids = {'actor': 1, 'other': 1, 'category': 1, 'item': 1, 'other_item': 1, 'request': 1, 'record': 1,
+           'rating': 1, 'notification': 1}
+    covered = {resolve(fill(endpoint.path, ids).split('?')[0]).view_name for endpoint in ENDPOINTS}
+    missing = set(route_names(get_resolver().url_patterns)) - covered - set(SKIPPED)
+    assert not missing, f'Routes without a benchmark (add to ENDPOINTS or SKIPPED): {sorted(missing)}'
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('endpoint', ENDPOINTS, ids=[endpoint.name for endpoint in ENDPOINTS])
+def test_endpoint_within_budget(endpoint, dataset, budgets, benchmark_results, settings):
+    settings.INSTRUMENTATION = {**settings.INSTRUMENTATION, 'METRICS_TOKEN': METRICS_TOKEN}
+    refresh = RefreshToken.for_user(User.objects.get(pk=dataset['actor']))
+    ids = {**dataset, 'refresh': str(refresh)}
+    client = APIClient()
+    if endpoint.auth:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    path, data = fill(endpoint.path, ids), fill(endpoint.data, ids)
+    iterations = int(os.environ.get('BENCHMARK_ITERATIONS', 20))
+
+    durations, timings = [], []
+    for iteration in range(iterations + 1):
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, endpoint.method)(path, data, format='json', headers=endpoint.headers)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+        assert response.status_code < 400, f'{endpoint.name}: {response.status_code} {response.content[:500]!r}'
+        if iteration:  # The first request warms caches and connections
+            durations.append(elapsed)
+            timings.append(server_timing(response))
+
+    result = {
+        'method': endpoint.method.upper(),
+        'path': path,
+        'status': response.status_code,
+        'p50_ms': round(median(durations), 2),
+        'p95_ms': round(percentile(durations, 0.95), 2),
+        'max_ms': round(max(durations), 2),
+        'queries': len(queries),
+        'db_ms': round(median(timing.get('db', 0) for timing in timings), 2),
+        'serialize_ms': round(median(timing.get('serialize', 0) for timing in timings), 2),
+    }
+    benchmark_results['dataset'] = dataset['counts']
+    benchmark_results['endpoints'][endpoint.name] = result
+
+    budget = {**budgets['default'], **budgets['endpoints'].get(endpoint.name, {})}
+    latency_budget = budget['p95_ms'] * float(os.environ.get('BENCHMARK_LATENCY_FACTOR', 1))
+    assert result['queries'] <= budget['queries'], (
+        f"{endpoint.name}: {result['queries']} queries, budget {budget['queries']}"
+    )
+    assert result['p95_ms'] <= latency_budget, (
+        f"{endpoint.name}: p95 {result['p95_ms']} ms, budget {latency_budget:g} ms"
+    )
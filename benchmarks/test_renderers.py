@@ -0,0 +1,70 @@
+"""
+Renderer benchmark: FastJSONRenderer against DRF's JSONRenderer on a list
+page like the ones the API renders, full of nulls and of Decimals, which
+orjson hands to the renderer's encoder.
+
+    pytest -m benchmark benchmarks/test_renderers.py
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from statistics import median
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from sharelib import renderers
+from sharelib.renderers import FastJSONRenderer
+
+ITERATIONS = 50
+
+
+def page(size=100):
+    created = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return {
+        'count': size,
+        'next': None,
+        'previous': None,
+        'results': [
+            {
+                'id': index,
+                'title': f'Item {index}',
+                'status': 'available',
+                'category': None if index % 3 else {'id': index % 7, 'name': 'Tools'},
+                'owner': {
+                    'id': index % 50,
+                    'username': f'user{index % 50}',
+                    'avatar': None,
+                    'lender_rating': Decimal('4.50'),
+                    'borrower_rating': Decimal('0.00'),
+                    'rating': 4.5,
+                },
+                'deposit': None if index % 2 else Decimal('25.00'),
+                'photos': None,
+                'metadata': {'tags': ['a', None], 'stars': 3.5},
+                'created_at': created + timedelta(minutes=index),
+            }
+            for index in range(size)
+        ],
+    }
+
+
+def time_render(renderer, data):
+    samples = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        renderer.render(data)
+        samples.append(time.perf_counter() - start)
+    return median(samples)
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(renderers.orjson is None, reason='orjson is not installed')
+def test_fast_renderer_beats_json_renderer_on_nulls_and_decimals():
+    data = page()
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    stdlib = time_render(JSONRenderer(), data)
+    fast = time_render(FastJSONRenderer(), data)
+    print(f'\nJSONRenderer {stdlib * 1000:.3f} ms, FastJSONRenderer {fast * 1000:.3f} ms ({stdlib / fast:.1f}x)')
+    assert fast < stdlib
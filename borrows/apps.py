@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class BorrowsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'borrows'
+
+    def ready(self):
+        from sharelib import images
+        images.register(self.get_model('DamageReport'), 'photo', 'photo_variants')
+
+        from .availability import connect_signals
+        connect_signals()
+
+        # Start the due-date scheduler in processes that serve requests
+        from django.core.signals import request_started
+        from . import scheduler
+        if scheduler.get_config()['IN_PROCESS']:
+            request_started.connect(scheduler.runner.start, dispatch_uid='borrow_scheduler_start')
@@ -0,0 +1,145 @@
+"""
+Item availability calendar.
+
+Every active BorrowRecord (``borrowed`` or ``overdue``) has one ItemBooking
+row holding the interval the item is out: ``[start_date, due_date)`` while
+borrowed, open-ended once overdue. Records saved through the ORM are synced
+by the signal receiver below; the set-based write paths (bulk approvals,
+the overdue scheduler) update bookings alongside their own statements, and
+``manage.py rebuild_item_bookings`` rebuilds the table from scratch.
+Cached item responses depend on the bookings, so every booking write calls
+``bookings_changed()`` for the items it touches.
+
+``available_between()`` keeps the items with no booking overlapping a time
+range, as a NOT EXISTS probe on the (item, starts_at, ends_at) index, and
+``ItemAvailabilityFilter`` exposes it as
+``/api/items/?available_from=&available_to=``.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_save
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+from items.caching import items_changed
+
+from .models import BorrowRecord, ItemBooking
+
+# Record statuses during which the item is out
+ACTIVE_STATUSES = ('borrowed', 'overdue')
+
+
+def booking_interval(status, start_date, due_date):
+    """(starts_at, ends_at) for an active record; overdue loans stay booked until returned."""
+    return start_date, None if status == 'overdue' else due_date
+
+
+def overlapping(start, end):
+    """Bookings overlapping ``[start, end)``; either bound may be None (unbounded)."""
+    bookings = ItemBooking.objects.all()
+    if end is not None:
+        bookings = bookings.filter(starts_at__lt=end)
+    if start is not None:
+        bookings = bookings.filter(Q(ends_at__gt=start) | Q(ends_at__isnull=True))
+    return bookings
+
+
+def available_between(queryset, start, end):
+    """Items in ``queryset`` that are not booked at any point in ``[start, end)``."""
+    return queryset.filter(~Exists(overlapping(start, end).filter(item=OuterRef('pk'))))
+
+
+def bookings_changed(*item_ids):
+    """Invalidate cached item data (availability-filtered lists, facets, the items) after booking writes."""
+    items_changed(*item_ids)
+
+
+def sync_booking(record):
+    """Create, update or remove the booking of one record to match its status and dates."""
+    if record.status not in ACTIVE_STATUSES:
+        if ItemBooking.objects.filter(record=record).delete()[0]:
+            bookings_changed(record.request.item_id)
+        return
+    starts_at, ends_at = booking_interval(record.status, record.start_date, record.due_date)
+    ItemBooking.objects.update_or_create(
+        record=record,
+        defaults={'item_id': record.request.item_id, 'starts_at': starts_at, 'ends_at': ends_at},
+    )
+    bookings_changed(record.request.item_id)
+
+
+@transaction.atomic
+def rebuild_bookings(batch_size=5000):
+    """Replace every booking with ones derived from the active records. Returns how many were created."""
+    # Items losing a booking as well as those gaining one
+    item_ids = set(ItemBooking.objects.values_list('item_id', flat=True))
+    ItemBooking.objects.all().delete()
+    rows = (
+        BorrowRecord.objects.filter(status__in=ACTIVE_STATUSES).order_by('pk')
+        .values_list('pk', 'request__item_id', 'status', 'start_date', 'due_date')
+        .iterator(chunk_size=batch_size)
+    )
+    created, batch = 0, []
+    for pk, item_id, status, start_date, due_date in rows:
+        starts_at, ends_at = booking_interval(status, start_date, due_date)
+        batch.append(ItemBooking(record_id=pk, item_id=item_id, starts_at=starts_at, ends_at=ends_at))
+        item_ids.add(item_id)
+        if len(batch) >= batch_size:
+            created += len(ItemBooking.objects.bulk_create(batch))
+            batch = []
+    created += len(ItemBooking.objects.bulk_create(batch))
+    bookings_changed(*item_ids)
+    return created
+
+
+# Signal receiver for records saved through the ORM (deleting a record cascades to its booking)
+
+def record_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_booking(instance)
+
+
+def connect_signals():
+    post_save.connect(record_saved, sender=BorrowRecord, dispatch_uid='item_booking_record_saved')
+
+
+def parse_bound(value, name, end_of_day=False):
+    """An ISO datetime, or a date (its start; the next day's start for an inclusive upper bound)."""
+    if not value:
+        return None
+    try:
+        # Dates first: parse_datetime() would also accept a bare date, as midnight
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    elif moment is None:
+        raise ValidationError({name: 'Use an ISO 8601 date or datetime.'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class ItemAvailabilityFilter(filters.BaseFilterBackend):
+    """
+    ``?available_from=&available_to=``: only items free for the whole range.
+    Dates are inclusive days; a missing ``available_from`` means now, a
+    missing ``available_to`` means open-ended.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        raw_start = request.query_params.get('available_from')
+        raw_end = request.query_params.get('available_to')
+        if not raw_start and not raw_end:
+            return queryset
+        start = parse_bound(raw_start, 'available_from') or timezone.now()
+        end = parse_bound(raw_end, 'available_to', end_of_day=True)
+        if end is not None and end <= start:
+            raise ValidationError({'available_to': 'Must be after available_from.'})
+        return available_between(queryset, start, end)
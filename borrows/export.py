@@ -0,0 +1,75 @@
+"""
+Streaming export of borrow history as CSV or NDJSON.
+
+Rows come from a flat ``values_list()`` projection read with
+``iterator(chunk_size=...)`` (a server-side cursor on PostgreSQL) and are
+encoded one at a time, so memory stays constant however long the history
+is. Used by ``GET /api/borrows/records/export/`` and
+``manage.py export_borrow_records``.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# (column, lookup on BorrowRecord)
+COLUMNS = [
+    ('id', 'pk'),
+    ('status', 'status'),
+    ('start_date', 'start_date'),
+    ('due_date', 'due_date'),
+    ('return_date', 'return_date'),
+    ('created_at', 'created_at'),
+    ('request_id', 'request_id'),
+    ('item_id', 'request__item_id'),
+    ('item_title', 'request__item__title'),
+    ('category', 'request__item__category__name'),
+    ('lender_id', 'lender_id'),
+    ('lender_username', 'lender__username'),
+    ('borrower_id', 'borrower_id'),
+    ('borrower_username', 'borrower__username'),
+]
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() hands the encoded line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream ``queryset`` as tuples in COLUMNS order, oldest first."""
+    return (
+        queryset.order_by('pk')
+        .values_list(*[lookup for _, lookup in COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([column for column, _ in COLUMNS])
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat() if hasattr(value, 'isoformat') else value for value in row
+        ])
+
+
+def ndjson_lines(rows):
+    columns = [column for column, _ in COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(queryset, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lines of text for ``queryset`` in ``export_format`` ('csv' or 'ndjson')."""
+    encode = csv_lines if export_format == 'csv' else ndjson_lines
+    return encode(export_rows(queryset, chunk_size))
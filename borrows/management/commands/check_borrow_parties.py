@@ -0,0 +1,31 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from borrows.parties import stale_records, stale_requests, sync_parties
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the denormalized lender/borrower columns of borrow requests and records '
+        'with their item and request. Use --fix to repair drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite rows that disagree with their sources.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            request_ids = list(stale_requests(apps).values_list('pk', flat=True))
+            record_ids = list(stale_records(apps).values_list('pk', flat=True))
+            for label, ids in (('request', request_ids), ('record', record_ids)):
+                for pk in ids:
+                    self.stdout.write(f'borrow {label} {pk}: stale parties')
+            if options['fix'] and (request_ids or record_ids):
+                sync_parties(apps, request_ids=request_ids, record_ids=record_ids)
+
+        mismatched = len(request_ids) + len(record_ids)
+        if mismatched and not options['fix']:
+            raise CommandError(f'{mismatched} borrow row(s) have stale parties; run with --fix to repair.')
+        verb = 'Repaired' if options['fix'] else 'Found'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {mismatched} mismatch(es).'))
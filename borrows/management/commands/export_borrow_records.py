@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from borrows.export import DEFAULT_CHUNK_SIZE, FORMATS, export_lines
+from borrows.models import BorrowRecord
+
+
+class Command(BaseCommand):
+    help = 'Stream borrow record history as CSV or NDJSON (all records, or those involving one user).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='export_format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--user', type=int, default=None, help='Only records where this user id lent or borrowed.')
+        parser.add_argument('--output', default='-', help='File to write to (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = BorrowRecord.objects.all()
+        if options['user'] is not None:
+            user = User.objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user with id {options['user']}.")
+            queryset = queryset.involving(user)
+
+        lines = export_lines(queryset, options['export_format'], options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(lines)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from borrows.availability import rebuild_bookings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the item availability calendar (ItemBooking) from the active borrow records.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        created = rebuild_bookings(options['batch_size'])
+        self.stdout.write(f'Rebuilt {created} item booking(s).')
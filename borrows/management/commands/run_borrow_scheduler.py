@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from borrows import scheduler
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = 'Mark overdue borrow records and send return reminders (once, or continuously with --loop).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Seconds between runs (default: BORROW_SCHEDULER['INTERVAL']).")
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or scheduler.get_config()['INTERVAL']
+        while True:
+            started = time.perf_counter()
+            result = scheduler.run(batch_size=options['batch_size'])
+            if outbox.get_config().get('DRIVER', 'thread') == 'thread':
+                # Don't leave this short-lived process's notifications to a daemon thread
+                outbox.drain_all()
+            self.stdout.write(
+                f"{result['overdue']} record(s) marked overdue, {result['reminded']} reminder(s) sent "
+                f"in {time.perf_counter() - started:.2f}s."
+            )
+            if not options['loop']:
+                break
+            time.sleep(interval)
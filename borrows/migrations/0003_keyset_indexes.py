@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrows', '0002_borrowrequest_end_date_borrowrequest_start_date'),
+        ('items', '0003_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['-created_at', '-id'], name='borrowrec_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(fields=['-request_date', '-id'], name='borrowreq_date_id_idx'),
+        ),
+    ]
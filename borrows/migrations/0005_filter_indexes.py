@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrows', '0004_image_variants'),
+        ('items', '0005_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['status', 'due_date'], name='borrowrec_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(condition=models.Q(('status', 'borrowed')), fields=['due_date'], name='borrowrec_active_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(fields=['item', 'status'], name='borrowreq_item_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(fields=['borrower', '-request_date'], name='borrowreq_borrower_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['item', '-request_date'], name='borrowreq_pending_item_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_bookings(apps, schema_editor):
+    BorrowRecord = apps.get_model('borrows', 'BorrowRecord')
+    ItemBooking = apps.get_model('borrows', 'ItemBooking')
+    rows = BorrowRecord.objects.filter(status__in=('borrowed', 'overdue')).values_list(
+        'pk', 'request__item_id', 'status', 'start_date', 'due_date'
+    )
+    ItemBooking.objects.bulk_create([
+        ItemBooking(
+            record_id=pk, item_id=item_id, starts_at=start_date,
+            ends_at=None if status == 'overdue' else due_date,
+        )
+        for pk, item_id, status, start_date, due_date in rows.iterator()
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('borrows', '0008_record_schedule_marks'),
+        ('items', '0005_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='items.item')),
+                ('record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='booking', to='borrows.borrowrecord')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'starts_at', 'ends_at'], name='booking_item_interval_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_bookings, migrations.RunPython.noop),
+    ]
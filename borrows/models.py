@@ -1,7 +1,38 @@
-from django.db import models
+from django.apps import apps
+from django.db import models, transaction
 from accounts.models import User
 from items.models import Item
 
+
+class PartyQuerySet(models.QuerySet):
+    def involving(self, user):
+        """
+        Rows where ``user`` is the borrower or the lender. Both parties are
+        columns on this table, so this is a same-table OR served by the
+        (borrower, ...) and (lender, ...) indexes instead of an OR across a join.
+        """
+        return self.filter(models.Q(borrower=user) | models.Q(lender=user))
+    
+    def update(self, **kwargs):
+        """Like QuerySet.update(), but resyncs the party columns when a column they derive from changes."""
+        if not PARTY_SOURCES[self.model._meta.label] & kwargs.keys():
+            return super().update(**kwargs)
+        from .parties import sync_parties
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            key = 'request_ids' if self.model is BorrowRequest else 'record_ids'
+            sync_parties(apps, **{key: pks})
+        return rows
+
+
+# Columns the denormalized parties are derived from (see borrows/parties.py)
+PARTY_SOURCES = {
+    'borrows.BorrowRequest': {'item', 'item_id', 'borrower', 'borrower_id'},
+    'borrows.BorrowRecord': {'request', 'request_id'},
+}
+
+
 class BorrowRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -17,6 +48,34 @@ class BorrowRequest(models.Model):
     message = models.TextField(blank=True)
     start_date = models.DateTimeField(null=True, blank=True)  # Requested start date
     end_date = models.DateTimeField(null=True, blank=True)  # Requested end date
+    # Denormalized item.owner, set on save (items never change owner)
+    lender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False, db_index=False)
+    
+    objects = PartyQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of the request list
+            models.Index(fields=['-request_date', '-id'], name='borrowreq_date_id_idx'),
+            # Requests for an item in a given state (e.g. pending ones when approving)
+            models.Index(fields=['item', 'status'], name='borrowreq_item_status_idx'),
+            # ?borrower=me, newest first
+            models.Index(fields=['borrower', '-request_date'], name='borrowreq_borrower_date_idx'),
+            # ?lender=me, and the lender half of involving()
+            models.Index(fields=['lender', '-request_date'], name='borrowreq_lender_date_idx'),
+            # Open requests waiting on the lender
+            models.Index(
+                fields=['item', '-request_date'],
+                name='borrowreq_pending_item_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+    
+    def save(self, *args, **kwargs):
+        # Keep the denormalized lender in step with the (possibly reassigned) item
+        if self.lender_id is None or BorrowRequest.item.is_cached(self):
+            self.lender_id = self.item.owner_id
+        super().save(*args, **kwargs)
 
 class BorrowRecord(models.Model):
     STATUS_CHOICES = [
@@ -32,6 +91,54 @@ class BorrowRecord(models.Model):
     return_date = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='borrowed')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized request.lender / request.borrower, set on save
+    lender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False, db_index=False)
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', editable=False, db_index=False)
+    # Set by the scheduler (borrows/scheduler.py); also what makes its runs idempotent
+    reminded_at = models.DateTimeField(null=True, blank=True, editable=False)
+    overdue_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = PartyQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of the record list
+            models.Index(fields=['-created_at', '-id'], name='borrowrec_created_id_idx'),
+            # Due/overdue scans by status
+            models.Index(fields=['status', 'due_date'], name='borrowrec_status_due_idx'),
+            # ?borrower= / ?owner=, and both halves of involving()
+            models.Index(fields=['borrower', '-created_at'], name='borrowrec_borrower_created_idx'),
+            models.Index(fields=['lender', '-created_at'], name='borrowrec_lender_created_idx'),
+            # Active loans only, ordered by due date (reminders)
+            models.Index(
+                fields=['due_date'],
+                name='borrowrec_active_due_idx',
+                condition=models.Q(status='borrowed'),
+            ),
+        ]
+    
+    def save(self, *args, **kwargs):
+        if self.lender_id is None or self.borrower_id is None or BorrowRecord.request.is_cached(self):
+            self.lender_id = self.request.lender_id
+            self.borrower_id = self.request.borrower_id
+        super().save(*args, **kwargs)
+
+class ItemBooking(models.Model):
+    """
+    Interval during which an item is lent out, one per active BorrowRecord.
+    Kept in sync by borrows/availability.py and backs the item availability
+    (date-range overlap) filter.
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='bookings')
+    record = models.OneToOneField(BorrowRecord, on_delete=models.CASCADE, related_name='booking')
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField(null=True, blank=True)  # None while overdue: booked until returned
+    
+    class Meta:
+        indexes = [
+            # Overlap probes per item: starts_at < to AND (ends_at > from OR ends_at IS NULL)
+            models.Index(fields=['item', 'starts_at', 'ends_at'], name='booking_item_interval_idx'),
+        ]
 
 class DamageReport(models.Model):
     STATUS_CHOICES = [
@@ -42,5 +149,6 @@ class DamageReport(models.Model):
     borrow_record = models.ForeignKey(BorrowRecord, on_delete=models.CASCADE, related_name='damage_reports')
     description = models.TextField()
     photo = models.ImageField(upload_to='damage_reports/', null=True, blank=True)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)  # Resized copies, see sharelib.images
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
     created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+The denormalized party columns: ``BorrowRequest.lender`` (the item's owner)
+and ``BorrowRecord.lender``/``borrower`` (the request's parties).
+
+``save()`` and ``PartyQuerySet.update()`` keep them in step, and the columns
+are NOT NULL, so a ``bulk_create`` without them fails. Anything else (raw
+SQL, an item changing owner) is caught by ``manage.py check_borrow_parties``,
+which compares them with the join-based definition below.
+
+Functions take an app registry so migrations can pass their historical one.
+"""
+from django.db.models import F, OuterRef, Q, Subquery
+
+
+def stale_requests(apps):
+    """Requests whose lender isn't their item's owner."""
+    BorrowRequest = apps.get_model('borrows', 'BorrowRequest')
+    return BorrowRequest.objects.exclude(lender=F('item__owner'))
+
+
+def stale_records(apps):
+    """Records whose parties aren't their request's item owner and borrower."""
+    BorrowRecord = apps.get_model('borrows', 'BorrowRecord')
+    return BorrowRecord.objects.filter(
+        ~Q(lender=F('request__item__owner')) | ~Q(borrower=F('request__borrower'))
+    )
+
+
+def sync_parties(apps, request_ids=None, record_ids=None):
+    """
+    Rewrite the party columns from their sources with one UPDATE per table:
+    every row by default, otherwise the given requests (and their records)
+    and records.
+    """
+    Item = apps.get_model('items', 'Item')
+    BorrowRequest = apps.get_model('borrows', 'BorrowRequest')
+    BorrowRecord = apps.get_model('borrows', 'BorrowRecord')
+
+    requests = BorrowRequest.objects.all()
+    records = BorrowRecord.objects.all()
+    if request_ids is not None or record_ids is not None:
+        requests = requests.filter(pk__in=request_ids or [])
+        records = records.filter(Q(request__in=request_ids or []) | Q(pk__in=record_ids or []))
+
+    requests.update(
+        lender=Subquery(Item.objects.filter(pk=OuterRef('item')).values('owner')[:1])
+    )
+    sources = BorrowRequest.objects.filter(pk=OuterRef('request'))
+    records.update(
+        lender=Subquery(sources.values('item__owner')[:1]),
+        borrower=Subquery(sources.values('borrower')[:1]),
+    )
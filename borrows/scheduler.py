@@ -0,0 +1,173 @@
+"""
+Due-date scheduler for borrow records.
+
+Each run makes two passes over active (``status='borrowed'``) records in
+``due_date`` order, served by the partial due-date index:
+
+- overdue: records past their ``due_date`` flip to ``overdue``, their items
+  stay booked until returned (invalidating cached item data) and both the
+  borrower and the lender are notified;
+- reminders: records due within the reminder window get one reminder.
+
+Work is done in batches. Each batch is claimed with one conditional UPDATE
+that stamps ``overdue_at``/``reminded_at`` with this run's timestamp, so a
+record is handled by exactly one run even when runs overlap or repeat.
+The batch's notifications are queued through the outbox with set-based
+INSERT ... SELECTs in the same transaction as the claim, so no per-record
+Python objects are built.
+
+Runs are triggered by ``manage.py run_borrow_scheduler`` (from cron, or with
+``--loop``), by the ``borrows.run_scheduler`` Celery task, or by the
+in-process runner when ``settings.BORROW_SCHEDULER['IN_PROCESS']`` is set.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, TextField, Value
+from django.db.models.functions import Concat, JSONObject
+from django.utils import timezone
+
+from accounts.stats import adjust_stats_many, record_counters
+from notifications import outbox
+
+from .availability import bookings_changed
+from .models import BorrowRecord, ItemBooking
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'IN_PROCESS': False,
+    'INTERVAL': 300,  # Seconds between in-process runs
+    'REMINDER_WINDOW_HOURS': 24,
+    'BATCH_SIZE': 5000,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'BORROW_SCHEDULER', {})}
+
+
+def claim_batch(candidates, stamp_field, run_at, batch_size, **changes):
+    """
+    Stamp the next ``batch_size`` candidates with ``run_at`` (plus any field
+    ``changes``). Returns how many this run claimed and a queryset of them,
+    or None once there are no candidates left.
+    """
+    # due_date alone matches the partial index order; adding a tiebreaker would force a sort
+    ids = list(candidates.order_by('due_date').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return None
+    claimed = BorrowRecord.objects.filter(pk__in=ids, **{f'{stamp_field}__isnull': True}).update(
+        **{stamp_field: run_at}, **changes
+    )
+    return claimed, BorrowRecord.objects.filter(pk__in=ids, **{stamp_field: run_at})
+
+
+def notification_columns(recipient, notification_type, title, *message):
+    """Outbox columns for one notification per claimed record (see outbox.enqueue_select)."""
+    return {
+        'user': F(recipient),
+        'type': Value(notification_type),
+        'title': Value(title),
+        'message': Concat(*message, output_field=TextField()),
+        'related_item': F('request__item'),
+        'related_request': F('request'),
+        'metadata': JSONObject(item_title=F('request__item__title'), due_date=F('due_date')),
+    }
+
+
+def mark_overdue(run_at, batch_size):
+    """Flip active records past their due date to ``overdue`` and notify both parties."""
+    candidates = BorrowRecord.objects.filter(status='borrowed', due_date__lt=run_at, overdue_at__isnull=True)
+    # What leaving 'borrowed' for 'overdue' does to the borrower's dashboard counters
+    before, after = record_counters('borrowed'), record_counters('overdue')
+    handled = 0
+    while True:
+        with transaction.atomic():
+            batch = claim_batch(candidates, 'overdue_at', run_at, batch_size, status='overdue')
+            if batch is None:
+                return handled
+            claimed, records = batch
+            if not claimed:
+                continue
+            # Overdue items stay booked until they come back
+            ItemBooking.objects.filter(record__in=records).update(ends_at=None)
+            bookings_changed(*records.values_list('request__item_id', flat=True))
+            outbox.enqueue_select(records, **notification_columns(
+                'borrower', 'overdue', 'Item Overdue',
+                F('request__item__title'), Value(' is overdue. Please return it as soon as possible.'),
+            ))
+            outbox.enqueue_select(records, **notification_columns(
+                'lender', 'overdue', 'Borrowed Item Overdue',
+                Value('Your '), F('request__item__title'), Value(' is overdue and has not been returned yet.'),
+            ))
+            per_borrower = records.order_by().values('borrower').annotate(count=Count('pk'))
+            adjust_stats_many({
+                row['borrower']: {field: row['count'] * (after[field] - before[field]) for field in before}
+                for row in per_borrower
+            })
+        handled += claimed
+
+
+def send_reminders(run_at, batch_size, window):
+    """Remind borrowers of active records due within ``window`` (once per record)."""
+    candidates = BorrowRecord.objects.filter(
+        status='borrowed', due_date__gte=run_at, due_date__lt=run_at + window, reminded_at__isnull=True
+    )
+    handled = 0
+    while True:
+        with transaction.atomic():
+            batch = claim_batch(candidates, 'reminded_at', run_at, batch_size)
+            if batch is None:
+                return handled
+            claimed, records = batch
+            if not claimed:
+                continue
+            outbox.enqueue_select(records, **notification_columns(
+                'borrower', 'reminder', 'Return Reminder',
+                F('request__item__title'), Value(' is due back soon. Please return it by the due date.'),
+            ))
+        handled += claimed
+
+
+def run(now=None, batch_size=None):
+    """One scheduler pass. Returns how many records became overdue and how many were reminded."""
+    config = get_config()
+    run_at = now or timezone.now()
+    batch_size = batch_size or config['BATCH_SIZE']
+    return {
+        'overdue': mark_overdue(run_at, batch_size),
+        'reminded': send_reminders(run_at, batch_size, timedelta(hours=config['REMINDER_WINDOW_HOURS'])),
+    }
+
+
+class PeriodicRunner:
+    """Runs the scheduler every ``INTERVAL`` seconds on a daemon thread, started at most once per process."""
+
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self, **kwargs):
+        # Also usable as a request_started receiver
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.loop, name='borrow-scheduler', daemon=True)
+                self.thread.start()
+
+    def loop(self):
+        while True:
+            try:
+                run()
+            except Exception:
+                logger.exception('Borrow scheduler run failed')
+            finally:
+                close_old_connections()
+            time.sleep(get_config()['INTERVAL'])
+
+
+runner = PeriodicRunner()
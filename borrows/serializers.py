@@ -1,13 +1,15 @@
 from rest_framework import serializers
 from .models import BorrowRequest, BorrowRecord, DamageReport
+from .services import BULK_LIMIT, BULK_STATUSES
 from items.models import Item
 from items.serializers import ItemSerializer
 from accounts.serializers import UserSerializer
+from sharelib.serializers import FlexFieldsMixin
 
-class BorrowRequestSerializer(serializers.ModelSerializer):
+class BorrowRequestSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     item = ItemSerializer(read_only=True)
     item_id = serializers.PrimaryKeyRelatedField(
-        queryset=Item.objects.all(),
+        queryset=Item.objects.select_related('owner'),  # Owner is needed for the request notification
         source='item',
         write_only=True
     )
@@ -18,23 +20,64 @@ class BorrowRequestSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = BorrowRequest
-        fields = '__all__'
+        exclude = ['lender']  # Internal denormalization of item.owner
         read_only_fields = ['request_date', 'requester', 'requested_at', 'created_at']
     
-    def get_borrower(self, obj):
+    expandable_fields = {
+        'item': ('item', ItemSerializer),
+        'borrower': ('borrower', UserSerializer),
+        'requester': ('borrower', UserSerializer),
+    }
+    
+    # Method fields rendering the borrower, by relation, on compact list pages (see sharelib/compact.py)
+    compact_relations = {
+        'borrower': 'borrower',
+        'requester': 'borrower',
+    }
+    
+    def get_borrower(self, obj, field_name='borrower'):
         """Return borrower with proper context for rating display."""
-        # Pass context to UserSerializer to show borrower_rating when viewing as lender
-        serializer = UserSerializer(obj.borrower, context={'rating_context': 'borrower'})
-        return serializer.data
+        return self.borrower_serializer(field_name, obj.borrower).data
     
     def get_requester(self, obj):
         """Return borrower as 'requester' for frontend compatibility."""
         # Same as borrower, just an alias
-        return self.get_borrower(obj)
+        return self.get_borrower(obj, 'requester')
+    
+    def borrower_serializer(self, field_name, instance=None):
+        # Pass context to UserSerializer to show borrower_rating when viewing as lender
+        serializer = UserSerializer(instance, context={'rating_context': 'borrower'})
+        serializer._flex_options = self.nested_options(field_name)
+        return serializer
+    
+    def compact_borrower(self):
+        return self.borrower_serializer('borrower')
+    
+    def compact_requester(self):
+        return self.borrower_serializer('requester')
 
-class BorrowRecordSerializer(serializers.ModelSerializer):
+class BorrowRecordSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     request = BorrowRequestSerializer(read_only=True)
     
     class Meta:
         model = BorrowRecord
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['lender', 'borrower']  # Internal denormalization of request parties
+    
+    expandable_fields = {
+        'request': ('request', BorrowRequestSerializer),
+    }
+
+class StatusChangeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=BULK_STATUSES)
+
+
+class BulkStatusChangeSerializer(serializers.Serializer):
+    """Body of POST /api/borrows/requests/bulk/: {"updates": [{"id": 1, "status": "approved"}, ...]}"""
+    updates = StatusChangeSerializer(many=True, allow_empty=False, max_length=BULK_LIMIT)
+    
+    def validate_updates(self, updates):
+        ids = [update['id'] for update in updates]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError('Each request may only appear once.')
+        return updates
@@ -0,0 +1,278 @@
+"""
+Borrow request state transitions.
+
+``approve_request()`` does everything an approval implies in one transaction:
+it locks the item row (``select_for_update``) so concurrent approvals for
+the same item queue up behind each other, approves the request, creates the
+BorrowRecord, marks the item borrowed, rejects every other pending request
+for the item with a single UPDATE and queues all resulting notifications
+with one outbox INSERT.
+
+Each write is also a conditional UPDATE (``pending`` -> ``approved``,
+``available`` -> ``borrowed``), so a lost race is detected and rolled back
+even on databases without row locks.
+
+``bulk_transition()`` applies the same transitions to many requests at once
+(``POST /api/borrows/requests/bulk/``) with a fixed number of queries.
+
+Both entry points share one permission rule (``transition_denied()``): only
+the item owner may approve or reject a request; either party may cancel it.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, PermissionDenied
+
+from accounts.stats import adjust_stats_many, record_counters
+from items.caching import items_changed
+from items.models import Item
+from notifications import outbox
+from notifications.models import NotificationOutbox
+
+from .models import BorrowRecord, BorrowRequest, ItemBooking
+
+# Loan length when the request didn't ask for an end date
+DEFAULT_LOAN_DAYS = 14
+
+# Item statuses that can still be lent out
+LENDABLE_STATUSES = ('available', 'requested')
+
+# Most transitions one bulk call may apply
+BULK_LIMIT = 500
+
+# Transitions bulk_transition() accepts; only the lender may approve or reject
+BULK_STATUSES = ('approved', 'rejected', 'cancelled')
+
+STATUS_NOTIFICATIONS = {
+    'approved': ('Request Approved', 'Your request to borrow {} has been approved'),
+    'rejected': ('Request Rejected', 'Your request to borrow {} has been rejected'),
+}
+
+
+class TransitionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The request can no longer be changed this way.'
+    default_code = 'conflict'
+
+
+def display_name(user):
+    return user.get_full_name() or user.email
+
+
+def status_notification(notification_type, borrower_id, item_id, request_id, item_title, **metadata):
+    """Outbox entry telling a borrower their request was approved or rejected."""
+    title, message = STATUS_NOTIFICATIONS[notification_type]
+    return NotificationOutbox(
+        user_id=borrower_id,
+        type=notification_type,
+        title=title,
+        message=message.format(item_title),
+        related_item_id=item_id,
+        related_request_id=request_id,
+        metadata={'item_title': item_title, **metadata},
+    )
+
+
+def loan_period(start_date, end_date, now):
+    start = start_date or now
+    return start, end_date or start + timedelta(days=DEFAULT_LOAN_DAYS)
+
+
+def check_lender(borrow_request, user):
+    if borrow_request.lender_id != user.pk:
+        raise PermissionDenied('Only the item owner can approve or reject requests.')
+
+
+def transition_denied(user, status, lender_id, borrower_id):
+    """Why ``user`` may not move a request to ``status``, or None if they may."""
+    if status == 'cancelled':
+        if user.pk not in (lender_id, borrower_id):
+            return 'Only the borrower or the item owner can cancel a request.'
+    elif user.pk != lender_id:
+        return 'Only the item owner can approve or reject requests.'
+    return None
+
+
+def check_transition(borrow_request, user, status):
+    detail = transition_denied(user, status, borrow_request.lender_id, borrow_request.borrower_id)
+    if detail is not None:
+        raise PermissionDenied(detail)
+
+
+@transaction.atomic
+def approve_request(borrow_request, lender):
+    """
+    Approve a pending request and lend the item. Returns the new BorrowRecord.
+    Raises TransitionConflict if the request is no longer pending or the
+    item has already been lent out (e.g. by a concurrent approval).
+    """
+    check_transition(borrow_request, lender, 'approved')
+    item = Item.objects.select_for_update().select_related('owner').get(pk=borrow_request.item_id)
+    borrow_request.item = item
+    if item.status not in LENDABLE_STATUSES:
+        raise TransitionConflict(f'{item.title} is not available to lend.')
+
+    now = timezone.now()
+    if not BorrowRequest.objects.filter(pk=borrow_request.pk, status='pending').update(status='approved'):
+        raise TransitionConflict('Only pending requests can be approved.')
+    if not Item.objects.filter(pk=item.pk, status__in=LENDABLE_STATUSES).update(status='borrowed', updated_at=now):
+        raise TransitionConflict(f'{item.title} is not available to lend.')
+    borrow_request.status = 'approved'
+    item.status = 'borrowed'
+    items_changed(item.pk)
+
+    start, due = loan_period(borrow_request.start_date, borrow_request.end_date, now)
+    record = BorrowRecord.objects.create(request=borrow_request, start_date=start, due_date=due)
+
+    # Everyone else waiting on this item is turned down in one statement
+    conflicting = reject_competing([borrow_request.pk], [item.pk])
+
+    notifications = [status_notification(
+        'approved', borrow_request.borrower_id, item.pk, borrow_request.pk, item.title,
+        item_owner=display_name(item.owner),
+    )]
+    notifications += [
+        status_notification('rejected', borrower_id, item.pk, pk, item.title)
+        for pk, _, borrower_id in conflicting
+    ]
+    outbox.enqueue_many(notifications)
+    return record
+
+
+def reject_competing(approved_ids, item_ids):
+    """
+    Reject every other pending request for the just-lent ``item_ids`` with
+    one UPDATE. Returns them as ``(pk, item_id, borrower_id)`` tuples.
+    """
+    competing = list(
+        BorrowRequest.objects.filter(item__in=item_ids, status='pending').exclude(pk__in=approved_ids)
+        .values_list('pk', 'item_id', 'borrower_id')
+    )
+    BorrowRequest.objects.filter(pk__in=[pk for pk, _, _ in competing], status='pending').update(status='rejected')
+    return competing
+
+
+@transaction.atomic
+def reject_request(borrow_request, lender):
+    """Reject a pending request and notify the borrower."""
+    check_transition(borrow_request, lender, 'rejected')
+    if not BorrowRequest.objects.filter(pk=borrow_request.pk, status='pending').update(status='rejected'):
+        raise TransitionConflict('Only pending requests can be rejected.')
+    borrow_request.status = 'rejected'
+    outbox.enqueue_many([status_notification(
+        'rejected', borrow_request.borrower_id, borrow_request.item_id, borrow_request.pk, borrow_request.item.title,
+    )])
+
+
+@transaction.atomic
+def cancel_request(borrow_request, user):
+    """Cancel a pending request (as its borrower or lender)."""
+    check_transition(borrow_request, user, 'cancelled')
+    if not BorrowRequest.objects.filter(pk=borrow_request.pk, status='pending').update(status='cancelled'):
+        raise TransitionConflict('Only pending requests can be cancelled.')
+    borrow_request.status = 'cancelled'
+
+
+def release_item(record):
+    """Make a returned item lendable again (only if this loan is what made it borrowed)."""
+    item_id = record.request.item_id
+    if Item.objects.filter(pk=item_id, status='borrowed').update(status='available', updated_at=timezone.now()):
+        items_changed(item_id)
+
+
+def transition_error(code, detail):
+    return {'error': code, 'detail': detail}
+
+
+@transaction.atomic
+def bulk_transition(user, changes):
+    """
+    Apply many status changes (``[(request_id, status), ...]`` with statuses
+    from BULK_STATUSES) on behalf of ``user``. Returns one result per change,
+    in order: ``{'id', 'status'}`` when applied, ``{'id', 'error', 'detail'}``
+    otherwise.
+
+    Approvals behave like approve_request(): the first approval per item
+    wins and the item's other pending requests are rejected. Everything is
+    done with set-based statements: one item lock, one read of the requests,
+    one UPDATE per target status, one bulk_create for the new records and
+    one for the notifications. Requests ``user`` isn't a party to are
+    reported as not found and their items are never locked.
+    """
+    ids = [pk for pk, _ in changes]
+    visible = BorrowRequest.objects.filter(pk__in=ids).involving(user)
+    items = {
+        pk: (status, title)
+        for pk, status, title in Item.objects.select_for_update()
+        .filter(pk__in=visible.values('item_id'))
+        .order_by('pk').values_list('pk', 'status', 'title')
+    }
+    rows = {
+        row['pk']: row
+        for row in visible.values('pk', 'status', 'item_id', 'lender_id', 'borrower_id', 'start_date', 'end_date')
+    }
+
+    results, winners, targets = {}, {}, {status: [] for status in BULK_STATUSES}
+    for pk, target in changes:
+        row = rows.get(pk)
+        denied = row and transition_denied(user, target, row['lender_id'], row['borrower_id'])
+        if row is None:
+            results[pk] = transition_error('not_found', 'No such request.')
+        elif denied:
+            results[pk] = transition_error('permission_denied', denied)
+        elif row['status'] != 'pending':
+            results[pk] = transition_error('invalid', f"The request is already {row['status']}.")
+        elif target == 'approved' and (row['item_id'] in winners or items[row['item_id']][0] not in LENDABLE_STATUSES):
+            results[pk] = transition_error('conflict', f"{items[row['item_id']][1]} is not available to lend.")
+        else:
+            if target == 'approved':
+                winners[row['item_id']] = row
+            targets[target].append(pk)
+            results[pk] = {'status': target}
+
+    now = timezone.now()
+    for target in ('rejected', 'cancelled', 'approved'):
+        BorrowRequest.objects.filter(pk__in=targets[target], status='pending').update(status=target)
+
+    notifications = [
+        status_notification('rejected', rows[pk]['borrower_id'], rows[pk]['item_id'], pk, items[rows[pk]['item_id']][1])
+        for pk in targets['rejected']
+    ]
+    if winners:
+        Item.objects.filter(pk__in=winners, status__in=LENDABLE_STATUSES).update(status='borrowed', updated_at=now)
+        items_changed(*winners)
+        records = []
+        for row in winners.values():
+            start, due = loan_period(row['start_date'], row['end_date'], now)
+            records.append(BorrowRecord(
+                request_id=row['pk'], lender_id=row['lender_id'], borrower_id=row['borrower_id'],
+                start_date=start, due_date=due,
+            ))
+        BorrowRecord.objects.bulk_create(records)
+        # bulk_create skips the booking and stats signals
+        ItemBooking.objects.bulk_create([
+            ItemBooking(record=record, item_id=item_id, starts_at=record.start_date, ends_at=record.due_date)
+            for item_id, record in zip(winners, records)
+        ])
+        loans = Counter(row['borrower_id'] for row in winners.values())
+        adjust_stats_many({
+            borrower_id: {field: count * delta for field, delta in record_counters('borrowed').items()}
+            for borrower_id, count in loans.items()
+        })
+
+        notifications += [
+            status_notification(
+                'approved', row['borrower_id'], item_id, row['pk'], items[item_id][1], item_owner=display_name(user),
+            )
+            for item_id, row in winners.items()
+        ]
+        notifications += [
+            status_notification('rejected', borrower_id, item_id, pk, items[item_id][1])
+            for pk, item_id, borrower_id in reject_competing(targets['approved'], list(winners))
+        ]
+    outbox.enqueue_many(notifications)
+
+    return [{'id': pk, **results[pk]} for pk in ids]
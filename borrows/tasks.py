@@ -0,0 +1,11 @@
+"""
+Celery tasks for borrows (schedule ``borrows.run_scheduler`` with celery beat).
+"""
+from celery import shared_task
+
+from . import scheduler
+
+
+@shared_task(name='borrows.run_scheduler', ignore_result=True)
+def run_borrow_scheduler():
+    return scheduler.run()
@@ -1,3 +1,620 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import threading
+import time
+from datetime import timedelta
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from accounts.models import UserStats
+from accounts.stats import get_stats
+from items.models import Category, Item
+from notifications.models import NotificationOutbox
+from . import scheduler
+from .parties import stale_records, stale_requests, sync_parties
+from .services import TransitionConflict, approve_request
+from .models import BorrowRecord, BorrowRequest
+
+
+class BorrowListQueryCountTests(APITestCase):
+    """Borrow request/record lists must not issue per-row queries."""
+
+    def setUp(self):
+        self.lender = User.objects.create(username='lender')
+        self.category = Category.objects.create(name='Tools')
+        self.client.force_authenticate(self.lender)
+
+    def create_borrows(self, count):
+        now = timezone.now()
+        for index in range(count):
+            borrower = User.objects.create(username=f'borrower{BorrowRequest.objects.count()}')
+            item = Item.objects.create(
+                owner=self.lender, category=self.category, title=f'Item {index}', description='desc'
+            )
+            borrow_request = BorrowRequest.objects.create(item=item, borrower=borrower, status='approved')
+            BorrowRecord.objects.create(request=borrow_request, start_date=now, due_date=now + timedelta(days=7))
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, url):
+        self.create_borrows(2)
+        small_page = self.count_list_queries(url)
+        self.create_borrows(10)
+        large_page = self.count_list_queries(url)
+        self.assertEqual(small_page, large_page)
+
+    def test_request_list_query_count_is_constant(self):
+        self.assert_constant_queries('/api/borrows/requests/')
+
+    def test_record_list_query_count_is_constant(self):
+        self.assert_constant_queries('/api/borrows/records/')
+
+
+    def test_sparse_request_list_query_count_is_constant(self):
+        self.assert_constant_queries('/api/borrows/requests/?fields=status,item.title&expand=item')
+
+
+class CompactListTests(APITestCase):
+    """The values()-based request list (sharelib/compact.py) renders what BorrowRequestSerializer does."""
+
+    def setUp(self):
+        self.lender = User.objects.create(username='lender', lender_rating='4.25', avatar='avatars/lender.png')
+        borrower = User.objects.create(
+            username='borrower', first_name='Grace', borrower_rating='2.5', lender_rating='5',
+            avatar='avatars/grace.jpg', avatar_variants={'source': 'avatars/other.jpg'},
+        )
+        category = Category.objects.create(name='Tools')
+        drill = Item.objects.create(
+            owner=self.lender, category=category, title='Drill', description='desc', photos='items/drill.jpg'
+        )
+        ladder = Item.objects.create(owner=self.lender, title='Ladder', description='desc')
+        now = timezone.now()
+        BorrowRequest.objects.create(
+            item=drill, borrower=borrower, message='Weekend  please', start_date=now, end_date=now + timedelta(days=2)
+        )
+        BorrowRequest.objects.create(item=ladder, borrower=borrower, status='rejected')
+        self.client.force_authenticate(self.lender)
+
+    def test_same_output_as_serializer(self):
+        for query in ['', '?expand=item', '?expand=borrower,item.owner', '?fields=borrower.full_name,requester.rating,item.title',
+                      '?pagination=cursor&page_size=1', '?lender=me', '?borrower=me']:
+            with self.subTest(query=query):
+                compact = self.client.get(f'/api/borrows/requests/{query}')
+                with override_settings(COMPACT_LISTS=False):
+                    full = self.client.get(f'/api/borrows/requests/{query}')
+                self.assertEqual(compact.status_code, 200)
+                self.assertEqual(compact.content, full.content)
+
+    def test_renders_from_values_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/borrows/requests/?pagination=cursor')
+        # A single values() query joining the item, its owner and category, and the borrower
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"borrower__first_name"', queries[0]['sql'])
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.lender = User.objects.create(username='lender')
+        self.borrower = User.objects.create(username='borrower')
+        category = Category.objects.create(name='Tools')
+        self.item = Item.objects.create(owner=self.lender, category=category, title='Drill', description='desc')
+        self.borrow_request = BorrowRequest.objects.create(item=self.item, borrower=self.borrower)
+        self.client.force_authenticate(self.lender)
+
+    def get_requests(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/borrows/requests/?{query}')
+        self.assertEqual(response.status_code, 200)
+        select = next(query['sql'] for query in queries if query['sql'].startswith('SELECT "borrows_borrowrequest"'))
+        return response.data['results'][0], select
+
+    def test_default_response_is_unchanged(self):
+        data, select = self.get_requests('')
+        self.assertEqual(data['item']['owner']['username'], 'lender')
+        self.assertEqual(data['borrower']['username'], 'borrower')
+        self.assertIn('"accounts_user"', select)
+
+    def test_unexpanded_relations_are_ids_and_not_joined(self):
+        data, select = self.get_requests('expand=')
+        self.assertEqual(data['item'], self.item.pk)
+        self.assertEqual(data['borrower'], self.borrower.pk)
+        self.assertEqual(data['requester'], self.borrower.pk)
+        self.assertNotIn('JOIN', select)
+
+    def test_fields_and_nested_expansion(self):
+        data, select = self.get_requests('fields=status,item.title,item.owner.username,borrower.username&expand=item.owner')
+        self.assertEqual(data, {
+            'id': self.borrow_request.pk,
+            'status': 'pending',
+            'item': {'id': self.item.pk, 'title': 'Drill', 'owner': {'id': self.lender.pk, 'username': 'lender'}},
+            'borrower': self.borrower.pk,  # Selected but not expanded
+        })
+        self.assertIn('"items_item"', select)
+        self.assertNotIn('"items_category"', select)
+
+    def test_record_request_can_be_collapsed(self):
+        now = timezone.now()
+        BorrowRecord.objects.create(request=self.borrow_request, start_date=now, due_date=now + timedelta(days=7))
+        response = self.client.get('/api/borrows/records/?fields=request,status&expand=')
+        self.assertEqual(response.data['results'][0]['request'], self.borrow_request.pk)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'request', 'status'})
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        self.lender = User.objects.create(username='lender')
+        self.borrower = User.objects.create(username='borrower')
+        self.now = timezone.now()
+
+    def create_record(self, due_in, status='borrowed'):
+        item = Item.objects.create(owner=self.lender, title='Drill', description='desc')
+        borrow_request = BorrowRequest.objects.create(item=item, borrower=self.borrower, status='approved')
+        return BorrowRecord.objects.create(
+            request=borrow_request, start_date=self.now - timedelta(days=7),
+            due_date=self.now + due_in, status=status,
+        )
+
+    def test_marks_overdue_and_reminds_once(self):
+        overdue = self.create_record(timedelta(days=-1))
+        due_soon = self.create_record(timedelta(hours=2))
+        later = self.create_record(timedelta(days=5))
+        returned = self.create_record(timedelta(days=-3), status='returned')
+        self.assertEqual(get_stats(self.borrower.pk)['active_loans'], 3)
+
+        self.assertEqual(scheduler.run(now=self.now, batch_size=1), {'overdue': 1, 'reminded': 1})
+        # Reruns (even later ones) don't repeat any work
+        self.assertEqual(scheduler.run(now=self.now), {'overdue': 0, 'reminded': 0})
+        self.assertEqual(scheduler.run(now=self.now + timedelta(minutes=5)), {'overdue': 0, 'reminded': 0})
+
+        statuses = dict(BorrowRecord.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[overdue.pk], 'overdue')
+        self.assertEqual(statuses[due_soon.pk], 'borrowed')
+        self.assertEqual(statuses[later.pk], 'borrowed')
+        self.assertEqual(statuses[returned.pk], 'returned')
+
+        entries = NotificationOutbox.objects.order_by('id')
+        self.assertEqual(
+            [(entry.user_id, entry.type, entry.related_request_id) for entry in entries],
+            [
+                (self.borrower.pk, 'overdue', overdue.request_id),
+                (self.lender.pk, 'overdue', overdue.request_id),
+                (self.borrower.pk, 'reminder', due_soon.request_id),
+            ],
+        )
+        # The bulk status flip is reflected in the materialized stats
+        self.assertEqual(UserStats.objects.get(pk=self.borrower.pk).active_loans, 2)
+
+
+class ApprovalTests(APITestCase):
+    def setUp(self):
+        self.lender = User.objects.create(username='lender')
+        self.item = Item.objects.create(owner=self.lender, title='Drill', description='desc')
+        self.requests = [
+            BorrowRequest.objects.create(item=self.item, borrower=User.objects.create(username=f'borrower{index}'))
+            for index in range(3)
+        ]
+        self.client.force_authenticate(self.lender)
+
+    def patch(self, borrow_request, status):
+        return self.client.patch(f'/api/borrows/requests/{borrow_request.pk}/', {'status': status}, format='json')
+
+    def test_approval_lends_item_and_rejects_other_requests(self):
+        chosen, *others = self.requests
+        response = self.patch(chosen, 'approved')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'approved')
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'borrowed')
+        record = BorrowRecord.objects.get()
+        self.assertEqual((record.request_id, record.borrower_id, record.status), (chosen.pk, chosen.borrower_id, 'borrowed'))
+        self.assertEqual(
+            dict(BorrowRequest.objects.values_list('pk', 'status')),
+            {chosen.pk: 'approved', **{other.pk: 'rejected' for other in others}},
+        )
+        self.assertEqual(
+            sorted(NotificationOutbox.objects.values_list('user_id', 'type')),
+            sorted([(chosen.borrower_id, 'approved')] + [(other.borrower_id, 'rejected') for other in others]),
+        )
+
+        # The item is gone, so approving a rejected request again is a conflict
+        self.assertEqual(self.patch(others[0], 'approved').status_code, 409)
+
+    def test_only_transitions_out_of_pending_are_allowed(self):
+        approved, rejected, cancelled = self.requests
+        self.assertEqual(self.patch(approved, 'approved').status_code, 200)
+        for borrow_request, status in [(approved, 'pending'), (approved, 'rejected'), (approved, 'cancelled')]:
+            with self.subTest(status=status):
+                self.assertEqual(self.patch(borrow_request, status).status_code, 409)
+        BorrowRequest.objects.filter(pk__in=[rejected.pk, cancelled.pk]).update(status='pending')
+        self.assertEqual(self.patch(cancelled, 'cancelled').status_code, 200)
+        self.assertEqual(self.patch(rejected, 'rejected').status_code, 200)
+        for borrow_request in (rejected, cancelled):
+            self.assertEqual(self.patch(borrow_request, 'pending').status_code, 409)
+            self.assertEqual(self.patch(borrow_request, 'approved').status_code, 409)
+        self.assertEqual(
+            dict(BorrowRequest.objects.values_list('pk', 'status')),
+            {approved.pk: 'approved', rejected.pk: 'rejected', cancelled.pk: 'cancelled'},
+        )
+        self.assertEqual(BorrowRecord.objects.get().request_id, approved.pk)
+        # Updates that keep the status are unaffected
+        response = self.client.patch(f'/api/borrows/requests/{approved.pk}/', {'message': 'See you at 5'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_only_lender_can_approve(self):
+        self.client.force_authenticate(self.requests[0].borrower)
+        self.assertEqual(self.patch(self.requests[0], 'approved').status_code, 403)
+        self.assertFalse(BorrowRecord.objects.exists())
+
+    def test_borrower_can_cancel_like_in_bulk(self):
+        borrow_request = self.requests[0]
+        self.client.force_authenticate(borrow_request.borrower)
+        self.assertEqual(self.patch(borrow_request, 'rejected').status_code, 403)
+        self.assertEqual(self.patch(borrow_request, 'cancelled').status_code, 200)
+        borrow_request.refresh_from_db()
+        self.assertEqual(borrow_request.status, 'cancelled')
+
+    def test_returning_makes_item_lendable_again(self):
+        self.patch(self.requests[0], 'approved')
+        record = BorrowRecord.objects.get()
+        response = self.client.patch(f'/api/borrows/records/{record.pk}/', {'status': 'returned'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'available')
+
+
+@override_settings(NOTIFICATION_OUTBOX={'DRIVER': 'worker'})  # Keep queued notifications in the outbox
+class ApprovalContentionTests(TransactionTestCase):
+    """Concurrent approvals for one item: exactly one wins, the rest conflict."""
+
+    threads = 8
+
+    def test_concurrent_approvals_lend_once(self):
+        lender = User.objects.create(username='lender')
+        item = Item.objects.create(owner=lender, title='Drill', description='desc')
+        requests = [
+            BorrowRequest.objects.create(item=item, borrower=User.objects.create(username=f'borrower{index}'))
+            for index in range(self.threads)
+        ]
+        barrier = threading.Barrier(self.threads)
+        outcomes = []
+
+        def approve(borrow_request):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        approve_request(borrow_request, lender)
+                        outcomes.append('approved')
+                    except TransitionConflict:
+                        outcomes.append('conflict')
+                    except DatabaseError:
+                        # SQLite has no row locks and fails a concurrent writer instead; retry like a client would
+                        time.sleep(0.001)
+                        continue
+                    return
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=approve, args=(request,)) for request in requests]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(outcomes), ['approved'] + ['conflict'] * (self.threads - 1))
+        self.assertEqual(BorrowRecord.objects.count(), 1)
+        self.assertEqual(BorrowRequest.objects.filter(status='approved').count(), 1)
+        self.assertEqual(BorrowRequest.objects.filter(status='rejected').count(), self.threads - 1)
+        self.assertEqual(Item.objects.get(pk=item.pk).status, 'borrowed')
+        self.assertEqual(NotificationOutbox.objects.filter(type='approved').count(), 1)
+
+
+class BulkTransitionTests(APITestCase):
+    def setUp(self):
+        self.lender = User.objects.create(username='lender')
+        self.borrowers = [User.objects.create(username=f'borrower{index}') for index in range(2)]
+        self.client.force_authenticate(self.lender)
+
+    def create_requests(self, items):
+        requests = []
+        for index in range(items):
+            item = Item.objects.create(owner=self.lender, title=f'Item {index}', description='desc')
+            requests += [BorrowRequest.objects.create(item=item, borrower=borrower) for borrower in self.borrowers]
+        return requests
+
+    def post(self, updates):
+        return self.client.post('/api/borrows/requests/bulk/', {'updates': updates}, format='json')
+
+    def test_applies_transitions_and_reports_each_id(self):
+        (first, competing, twice, also_twice, rejected, cancelled) = self.create_requests(3)
+        done = BorrowRequest.objects.create(item=first.item, borrower=self.borrowers[0], status='rejected')
+        other_lender = User.objects.create(username='other')
+        foreign = BorrowRequest.objects.create(
+            item=Item.objects.create(owner=other_lender, title='Saw', description='desc'), borrower=other_lender,
+        )
+        response = self.post([
+            {'id': first.pk, 'status': 'approved'},
+            {'id': twice.pk, 'status': 'approved'},
+            {'id': also_twice.pk, 'status': 'approved'},
+            {'id': rejected.pk, 'status': 'rejected'},
+            {'id': cancelled.pk, 'status': 'cancelled'},
+            {'id': done.pk, 'status': 'approved'},
+            {'id': foreign.pk, 'status': 'approved'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(result['id'], result.get('status') or result['error']) for result in response.data['results']],
+            [
+                (first.pk, 'approved'), (twice.pk, 'approved'), (also_twice.pk, 'conflict'),
+                (rejected.pk, 'rejected'), (cancelled.pk, 'cancelled'), (done.pk, 'invalid'), (foreign.pk, 'not_found'),
+            ],
+        )
+        self.assertEqual(response.data['updated_count'], 4)
+
+        statuses = dict(BorrowRequest.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[competing.pk], 'rejected')
+        self.assertEqual(statuses[also_twice.pk], 'rejected')
+        self.assertEqual(statuses[foreign.pk], 'pending')
+        self.assertEqual(
+            sorted(BorrowRecord.objects.values_list('request_id', 'lender_id', 'borrower_id')),
+            sorted([(first.pk, self.lender.pk, first.borrower_id), (twice.pk, self.lender.pk, twice.borrower_id)]),
+        )
+        self.assertEqual(
+            set(Item.objects.filter(status='borrowed').values_list('pk', flat=True)), {first.item_id, twice.item_id}
+        )
+        self.assertEqual(
+            sorted(NotificationOutbox.objects.values_list('related_request_id', 'type')),
+            sorted([
+                (first.pk, 'approved'), (twice.pk, 'approved'), (competing.pk, 'rejected'),
+                (also_twice.pk, 'rejected'), (rejected.pk, 'rejected'),
+            ]),
+        )
+        self.assertEqual(get_stats(first.borrower_id)['active_loans'], 2)
+
+    def test_only_lender_can_approve(self):
+        borrow_request, _ = self.create_requests(1)
+        self.client.force_authenticate(borrow_request.borrower)
+        response = self.post([{'id': borrow_request.pk, 'status': 'approved'}])
+        self.assertEqual(response.data['results'][0]['error'], 'permission_denied')
+        response = self.post([{'id': borrow_request.pk, 'status': 'cancelled'}])
+        self.assertEqual(response.data['results'][0]['status'], 'cancelled')
+
+    def test_locks_only_items_of_the_callers_requests(self):
+        own, _ = self.create_requests(1)
+        other_lender = User.objects.create(username='other')
+        foreign = BorrowRequest.objects.create(
+            item=Item.objects.create(owner=other_lender, title='Saw', description='desc'), borrower=other_lender,
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post([{'id': own.pk, 'status': 'rejected'}, {'id': foreign.pk, 'status': 'cancelled'}])
+        self.assertEqual([result.get('error') for result in response.data['results']], [None, 'not_found'])
+        # Re-run the locking read to see which item rows it covered
+        [lock] = [query['sql'] for query in queries if query['sql'].startswith('SELECT "items_item"."id"')]
+        with connection.cursor() as cursor:
+            cursor.execute(lock)
+            self.assertEqual([row[0] for row in cursor.fetchall()], [own.item_id])
+
+    def test_rejects_duplicate_ids(self):
+        borrow_request, _ = self.create_requests(1)
+        response = self.post([{'id': borrow_request.pk, 'status': 'approved'}] * 2)
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_is_constant(self):
+        def count_queries(requests):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post([{'id': request.pk, 'status': 'approved'} for request in requests[::2]])
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.assertEqual(count_queries(self.create_requests(2)), count_queries(self.create_requests(10)))
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.lender = User.objects.create(username='lender')
+        self.borrower = User.objects.create(username='borrower')
+        self.client.force_authenticate(self.lender)
+        now = timezone.now()
+        for index in range(3):
+            item = Item.objects.create(owner=self.lender, title=f'Item, "{index}"', description='desc')
+            borrow_request = BorrowRequest.objects.create(item=item, borrower=self.borrower, status='approved')
+            BorrowRecord.objects.create(request=borrow_request, start_date=now, due_date=now + timedelta(days=7))
+        # Not visible to the lender
+        stranger = User.objects.create(username='stranger')
+        item = Item.objects.create(owner=stranger, title='Hidden', description='desc')
+        borrow_request = BorrowRequest.objects.create(item=item, borrower=self.borrower, status='approved')
+        BorrowRecord.objects.create(request=borrow_request, start_date=now, due_date=now + timedelta(days=7))
+
+    def export(self, export_format):
+        response = self.client.get(f'/api/borrows/records/export/?export_format={export_format}')
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        response, body = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([row['item_title'] for row in rows], ['Item, "0"', 'Item, "1"', 'Item, "2"'])
+        self.assertEqual({row['borrower_username'] for row in rows}, {'borrower'})
+
+    def test_party_filters_are_limited_to_the_caller(self):
+        stranger = User.objects.get(username='stranger')
+        for url in ('/api/borrows/records/', '/api/borrows/records/export/', '/api/borrows/requests/'):
+            for params in [{'borrower': self.borrower.pk}, {'owner': stranger.pk}, {'owner': 'abc'}]:
+                with self.subTest(url=url, params=params):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(next(iter(params)), response.data)
+        for params in [{'owner': 'me'}, {'owner': self.lender.pk}]:
+            response = self.client.get('/api/borrows/records/export/', {'export_format': 'ndjson', **params})
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+            self.assertEqual({row['lender_id'] for row in rows}, {self.lender.pk})
+            self.assertEqual(len(rows), 3)
+        # The borrower sees both lenders' records, but only as the borrower
+        self.client.force_authenticate(self.borrower)
+        self.assertEqual(self.client.get('/api/borrows/records/', {'borrower': 'me'}).data['count'], 4)
+        self.assertEqual(self.client.get('/api/borrows/records/', {'owner': 'me'}).data['count'], 0)
+        self.assertEqual(self.client.get('/api/borrows/requests/', {'borrower': self.borrower.pk}).data['count'], 4)
+
+    def test_ndjson_export(self):
+        response, body = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['lender_id'], self.lender.pk)
+        self.assertEqual(rows[0]['status'], 'borrowed')
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/borrows/records/export/?export_format=xml')
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailabilityTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.lender = User.objects.create(username='lender')
+        self.borrower = User.objects.create(username='borrower')
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=10)
+        self.free = Item.objects.create(owner=self.lender, title='Free', description='desc')
+        self.booked = Item.objects.create(owner=self.lender, title='Booked', description='desc')
+        self.overdue = Item.objects.create(owner=self.lender, title='Overdue', description='desc')
+        self.record = self.lend(self.booked, self.start, self.start + timedelta(days=5))
+        self.lend(self.overdue, self.start - timedelta(days=30), self.start - timedelta(days=20), status='overdue')
+
+    def lend(self, item, start, due, status='borrowed'):
+        borrow_request = BorrowRequest.objects.create(item=item, borrower=self.borrower, status='approved')
+        return BorrowRecord.objects.create(request=borrow_request, start_date=start, due_date=due, status=status)
+
+    def available(self, start=None, end=None, cache_status=None):
+        params = {}
+        if start:
+            params['available_from'] = start.isoformat()
+        if end:
+            params['available_to'] = end.isoformat()
+        response = self.client.get('/api/items/', params)
+        self.assertEqual(response.status_code, 200)
+        if cache_status:
+            self.assertEqual(response['X-Cache'], cache_status)
+        return {item['title'] for item in response.data['results']}
+
+    def test_filters_overlapping_bookings(self):
+        self.assertEqual(self.available(self.start - timedelta(days=3), self.start), {'Free', 'Booked'})
+        self.assertEqual(self.available(self.start + timedelta(days=4), self.start + timedelta(days=6)), {'Free'})
+        self.assertEqual(self.available(self.start + timedelta(days=5)), {'Free', 'Booked'})
+        # Date bounds cover whole days
+        self.assertEqual(self.available(end=self.start.date()), {'Free'})
+
+    def test_bookings_follow_record_status(self):
+        self.record.status = 'returned'
+        self.record.save()
+        self.assertEqual(self.available(self.start, self.start + timedelta(days=1)), {'Free', 'Booked'})
+
+    def test_booking_writes_invalidate_cached_lists(self):
+        start, end = self.start, self.start + timedelta(days=1)
+        self.assertEqual(self.available(start, end, cache_status='MISS'), {'Free'})
+        self.assertEqual(self.available(start, end, cache_status='HIT'), {'Free'})
+        self.record.status = 'returned'
+        self.record.save()
+        self.assertEqual(self.available(start, end, cache_status='MISS'), {'Free', 'Booked'})
+
+    def test_scheduler_keeps_overdue_items_booked(self):
+        later = self.start + timedelta(days=30)
+        self.assertEqual(self.available(later, cache_status='MISS'), {'Free', 'Booked'})
+        scheduler.run(now=self.start + timedelta(days=6))
+        self.assertEqual(self.available(later, cache_status='MISS'), {'Free'})
+
+    def test_invalid_range(self):
+        response = self.client.get('/api/items/', {'available_from': '2026-05-02', 'available_to': '2026-05-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/items/', {'available_from': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PartyColumnTests(TestCase):
+    """The denormalized lender/borrower columns must agree with the item and request they come from."""
+
+    def setUp(self):
+        self.lender = User.objects.create(username='lender')
+        self.other_lender = User.objects.create(username='other-lender')
+        self.borrower = User.objects.create(username='borrower')
+        self.other_borrower = User.objects.create(username='other-borrower')
+        self.item = Item.objects.create(owner=self.lender, title='Drill', description='desc')
+        self.other_item = Item.objects.create(owner=self.other_lender, title='Saw', description='desc')
+        self.request = BorrowRequest.objects.create(item=self.item, borrower=self.borrower, status='approved')
+        BorrowRequest.objects.create(item=self.other_item, borrower=self.borrower)
+        BorrowRequest.objects.create(item=self.item, borrower=self.other_borrower)
+        now = timezone.now()
+        self.record = BorrowRecord.objects.create(request=self.request, start_date=now, due_date=now)
+
+    def assert_consistent(self):
+        self.assertFalse(stale_requests(apps).exists())
+        self.assertFalse(stale_records(apps).exists())
+        # involving() over the party columns matches the join-based definition
+        for user in User.objects.all():
+            self.assertQuerySetEqual(
+                BorrowRequest.objects.involving(user).order_by('pk'),
+                BorrowRequest.objects.filter(Q(borrower=user) | Q(item__owner=user)).order_by('pk'),
+            )
+            self.assertQuerySetEqual(
+                BorrowRecord.objects.involving(user).order_by('pk'),
+                BorrowRecord.objects.filter(
+                    Q(request__borrower=user) | Q(request__item__owner=user)
+                ).order_by('pk'),
+            )
+
+    def test_save_sets_parties(self):
+        self.assertEqual(self.request.lender, self.lender)
+        self.assertEqual((self.record.lender, self.record.borrower), (self.lender, self.borrower))
+        self.assert_consistent()
+
+    def test_update_of_a_source_column_resyncs_parties(self):
+        BorrowRequest.objects.filter(pk=self.request.pk).update(item=self.other_item, borrower=self.other_borrower)
+        self.record.refresh_from_db()
+        self.assertEqual(BorrowRequest.objects.get(pk=self.request.pk).lender, self.other_lender)
+        self.assertEqual((self.record.lender, self.record.borrower), (self.other_lender, self.other_borrower))
+        self.assert_consistent()
+
+        other_request = BorrowRequest.objects.exclude(pk=self.request.pk).first()
+        BorrowRecord.objects.filter(pk=self.record.pk).update(request=other_request)
+        self.record.refresh_from_db()
+        self.assertEqual((self.record.lender, self.record.borrower), (other_request.lender, other_request.borrower))
+        self.assert_consistent()
+
+    def test_bulk_create_without_parties_is_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BorrowRequest.objects.bulk_create([BorrowRequest(item=self.item, borrower=self.other_borrower)])
+
+    def test_backfill_matches_the_join(self):
+        BorrowRequest.objects.update(lender=self.borrower)
+        BorrowRecord.objects.update(lender=self.other_borrower, borrower=self.other_lender)
+        sync_parties(apps)
+        self.assert_consistent()
+
+    def test_check_command_reports_and_repairs_drift(self):
+        call_command('check_borrow_parties', stdout=io.StringIO())
+        Item.objects.filter(pk=self.item.pk).update(owner=self.other_lender)  # Items aren't meant to change owner
+        BorrowRecord.objects.update(borrower=self.lender)
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '3 borrow row(s) have stale parties'):
+            call_command('check_borrow_parties', stdout=out)
+        self.assertIn(f'borrow record {self.record.pk}: stale parties', out.getvalue())
+        call_command('check_borrow_parties', '--fix', stdout=io.StringIO())
+        self.assert_consistent()
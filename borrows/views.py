@@ -1,49 +1,62 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
 from .models import BorrowRequest, BorrowRecord
-from .serializers import BorrowRequestSerializer, BorrowRecordSerializer
+from .serializers import BorrowRequestSerializer, BorrowRecordSerializer, BulkStatusChangeSerializer
 from notifications.utils import create_notification
+from sharelib.compact import CompactListMixin
+from .export import FORMATS, export_lines
+from .services import (
+    BULK_STATUSES, TransitionConflict, approve_request, bulk_transition, cancel_request, check_lender,
+    check_transition, reject_request, release_item,
+)
 
 
-class BorrowRequestViewSet(viewsets.ModelViewSet):
+def party_filter(request, params):
+    """
+    Filter kwargs for the first of ``params`` (query parameter -> party column)
+    present in the request, or None. Users only see rows they are a party to,
+    so the only accepted value is ``me`` (or the user's own id).
+    """
+    for param, column in params.items():
+        value = request.query_params.get(param)
+        if value is None:
+            continue
+        if value not in ('me', str(request.user.pk)):
+            raise ValidationError({param: 'Only "me" (or your own user id) is supported.'})
+        return {column: request.user}
+    return None
+
+
+class BorrowRequestViewSet(CompactListMixin, viewsets.ModelViewSet):
     queryset = BorrowRequest.objects.none()  # For schema generation
     serializer_class = BorrowRequestSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-request_date', '-id')  # ?pagination=cursor
     
     def get_queryset(self):
         # Skip queryset evaluation during schema generation
         if getattr(self, 'swagger_fake_view', False):
             return BorrowRequest.objects.none()
         
-        user = self.request.user
-        queryset = BorrowRequest.objects.all()
+        # ?lender=me / ?owner=me: requests for the user's items; ?borrower=me: the user's own
+        # requests; default: both
+        party = party_filter(self.request, {'lender': 'lender', 'owner': 'lender', 'borrower': 'borrower'})
+        queryset = BorrowRequest.objects.filter(**party) if party else BorrowRequest.objects.involving(self.request.user)
         
-        # Filter by query parameters
-        lender = self.request.query_params.get('lender', None)
-        owner = self.request.query_params.get('owner', None)
-        borrower = self.request.query_params.get('borrower', None)
-        
-        # If specific filters are requested, apply them
-        if lender == 'me' or owner == 'me':
-            # Return only requests for items the user owns (as lender)
-            queryset = queryset.filter(item__owner=user)
-        elif borrower == 'me':
-            # Return only requests where the user is the borrower
-            queryset = queryset.filter(borrower=user)
-        else:
-            # Default: Users can see their own requests and requests for items they own
-            queryset = queryset.filter(
-                borrower=user
-            ) | queryset.filter(
-                item__owner=user
-            )
-        
-        return queryset
+        # Only join what the requested fields/expansions render
+        return BorrowRequestSerializer.select_related(queryset, self.request)
     
+    @transaction.atomic
     def perform_create(self, serializer):
         borrow_request = serializer.save(borrower=self.request.user)
         
         # Create notification for item owner when a new request is created
+        # (queued in the outbox within this transaction)
         item_owner = borrow_request.item.owner
         if item_owner != self.request.user:  # Don't notify if user is requesting their own item
             create_notification(
@@ -59,96 +72,80 @@ class BorrowRequestViewSet(viewsets.ModelViewSet):
                 }
             )
     
+    @transaction.atomic
     def perform_update(self, serializer):
         borrow_request = self.get_object()
         old_status = borrow_request.status
         
-        # Only allow item owner to approve/reject requests
-        if borrow_request.item.owner != self.request.user:
-            from rest_framework.exceptions import PermissionDenied
-            raise PermissionDenied("Only the item owner can approve or reject requests.")
-        
-        borrow_request = serializer.save()
-        new_status = borrow_request.status
-        
-        # Create notification when request is approved
-        if old_status != 'approved' and new_status == 'approved':
-            create_notification(
-                user=borrow_request.borrower,
-                notification_type='approved',
-                title='Request Approved',
-                message=f"Your request to borrow {borrow_request.item.title} has been approved",
-                related_item=borrow_request.item,
-                related_request=borrow_request,
-                metadata={
-                    'item_title': borrow_request.item.title,
-                    'item_owner': borrow_request.item.owner.get_full_name() or borrow_request.item.owner.email
-                }
-            )
+        new_status = serializer.validated_data.get('status', old_status)
+        if new_status == old_status:
+            # Only the item owner edits requests
+            check_lender(borrow_request, self.request.user)
+            serializer.save()
+            return
+        # Same rule as the bulk endpoint: the owner approves or rejects, either party cancels
+        check_transition(borrow_request, self.request.user, new_status)
+        # Requests only ever move out of pending; anything else (e.g. approved
+        # back to pending) would orphan the record and lent item
+        if old_status != 'pending' or new_status not in BULK_STATUSES:
+            raise TransitionConflict(f'A {old_status} request cannot become {new_status}.')
         
-        # Optional: Create notification when request is rejected
-        if old_status != 'rejected' and new_status == 'rejected':
-            create_notification(
-                user=borrow_request.borrower,
-                notification_type='rejected',
-                title='Request Rejected',
-                message=f"Your request to borrow {borrow_request.item.title} has been rejected",
-                related_item=borrow_request.item,
-                related_request=borrow_request,
-                metadata={
-                    'item_title': borrow_request.item.title
-                }
-            )
-
+        # Save any other changes first; the status transition itself (with its
+        # record, item status, conflicting rejections and notifications) is
+        # done by the approval service
+        borrow_request = serializer.save(status=old_status)
+        if new_status == 'approved':
+            approve_request(borrow_request, self.request.user)
+        elif new_status == 'rejected':
+            reject_request(borrow_request, self.request.user)
+        else:
+            cancel_request(borrow_request, self.request.user)
+    
+    @action(detail=False, methods=['post'], url_path='bulk', serializer_class=BulkStatusChangeSerializer)
+    def bulk(self, request):
+        """Approve, reject or cancel many requests at once; returns one result per id"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = bulk_transition(
+            request.user,
+            [(update['id'], update['status']) for update in serializer.validated_data['updates']],
+        )
+        return Response({
+            'results': results,
+            'updated_count': sum('error' not in result for result in results),
+        })
 
 class BorrowRecordViewSet(viewsets.ModelViewSet):
     queryset = BorrowRecord.objects.none()  # For schema generation
     serializer_class = BorrowRecordSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-created_at', '-id')  # ?pagination=cursor
     
     def get_queryset(self):
         # Skip queryset evaluation during schema generation
         if getattr(self, 'swagger_fake_view', False):
             return BorrowRecord.objects.none()
         
-        user = self.request.user
-        queryset = BorrowRecord.objects.all()
-        
-        # Filter by query parameters
-        owner = self.request.query_params.get('owner', None)
-        borrower = self.request.query_params.get('borrower', None)
+        # ?owner=me: records of the user's items; ?borrower=me: the user's loans; default: both
+        party = party_filter(self.request, {'owner': 'lender', 'borrower': 'borrower'})
+        queryset = BorrowRecord.objects.filter(**party) if party else BorrowRecord.objects.involving(self.request.user)
         
-        # If specific filters are requested, apply them
-        if owner:
-            # Filter by owner ID (can be 'me' or specific ID)
-            if owner == 'me':
-                queryset = queryset.filter(request__item__owner=user)
-            else:
-                try:
-                    owner_id = int(owner)
-                    queryset = queryset.filter(request__item__owner_id=owner_id)
-                except (ValueError, TypeError):
-                    pass  # Invalid owner ID, return empty queryset
-        elif borrower:
-            # Filter by borrower ID (can be 'me' or specific ID)
-            if borrower == 'me':
-                queryset = queryset.filter(request__borrower=user)
-            else:
-                try:
-                    borrower_id = int(borrower)
-                    queryset = queryset.filter(request__borrower_id=borrower_id)
-                except (ValueError, TypeError):
-                    pass  # Invalid borrower ID, return empty queryset
-        else:
-            # Default: Users can see records where they are borrower or owner
-            queryset = queryset.filter(
-                request__borrower=user
-            ) | queryset.filter(
-                request__item__owner=user
-            )
+        # Only join what the requested fields/expansions render
+        return BorrowRecordSerializer.select_related(queryset, self.request)
+    
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """Stream the visible records as CSV or NDJSON (?export_format=csv|ndjson)"""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in FORMATS:
+            raise ValidationError({'export_format': f"Choose one of: {', '.join(FORMATS)}."})
+        content_type, extension = FORMATS[export_format]
         
-        return queryset
+        response = StreamingHttpResponse(export_lines(self.get_queryset(), export_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="borrow-records.{extension}"'
+        return response
     
+    @transaction.atomic
     def perform_update(self, serializer):
         old_status = self.get_object().status
         borrow_record = serializer.save()
@@ -156,6 +153,7 @@ class BorrowRecordViewSet(viewsets.ModelViewSet):
         
         # Create notification when item is returned
         if old_status != 'returned' and new_status == 'returned':
+            release_item(borrow_record)
             item_owner = borrow_record.request.item.owner
             create_notification(
                 user=item_owner,
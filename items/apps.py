@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ItemsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'items'
+
+    def ready(self):
+        from sharelib import images
+        from .search import install_search_index
+        # Keep the search index wired up after table rebuilds in later migrations
+        post_migrate.connect(install_search_index, sender=self)
+        images.register(self.get_model('Item'), 'photos', 'photo_variants')
+
+        from .caching import connect_signals
+        connect_signals()
+        from sharelib import checks  # noqa: F401 (registers the shared cache check)
@@ -0,0 +1,126 @@
+"""
+Cache invalidation for item data (see sharelib.cache).
+
+Cached item data is tagged with versioned namespaces, and writes bump
+exactly the namespaces they affect:
+
+- ``items``: anything aggregated over or listing many items (facets, list
+  pages); bumped by every item write and category write.
+- ``item:<id>``, ``category:<id>``, ``user:<id>``: one item, or the category
+  or owner embedded in rendered items.
+- ``categories``: the category list.
+
+Item, Category and User save/delete signals, and the image pipeline's
+``variants_recorded``, are wired up by ``connect_signals()``. Set-based
+writes that skip signals (approval status flips, rating aggregates) call
+``items_changed()``/``users_changed()``.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+
+from accounts.models import User
+from accounts.serializers import UserSerializer
+from sharelib import images
+from sharelib.cache import bump, changed_at, get_versions
+from sharelib.conditional import Validators
+
+from .models import Category, Item
+
+ITEMS = 'items'
+CATEGORIES = 'categories'
+
+# User columns rendered for item owners; saves touching none of them (e.g. last_login) don't invalidate
+OWNER_FIELDS = frozenset(UserSerializer.Meta.fields)
+
+
+def item_namespace(pk):
+    return f'item:{pk}'
+
+
+def category_namespace(pk):
+    return f'category:{pk}'
+
+
+def user_namespace(pk):
+    return f'user:{pk}'
+
+
+def item_dependencies(data):
+    """Namespaces of the items (and their owners and categories) in rendered item data."""
+    items = data.get('results', data) if isinstance(data, dict) else data
+    if isinstance(items, dict):
+        items = [items]
+    namespaces = set()
+    for item in items:
+        namespaces.add(item_namespace(item['id']))
+        # Owners and categories collapsed to ids or left out embed nothing (see sharelib.serializers)
+        if isinstance(item.get('owner'), dict):
+            namespaces.add(user_namespace(item['owner']['id']))
+        if isinstance(item.get('category'), dict):
+            namespaces.add(category_namespace(item['category']['id']))
+    return namespaces
+
+
+def item_validators(pk):
+    """Conditional GET validators for one item's detail response, or None if it doesn't exist."""
+    try:
+        pk = Item._meta.pk.to_python(pk)
+    except ValidationError:
+        return None  # Not a valid id (e.g. /api/items/abc/); the view answers 404
+    row = Item.objects.filter(pk=pk).values_list('updated_at', 'owner_id', 'category_id').first()
+    if row is None:
+        return None
+    updated_at, owner_id, category_id = row
+    embedded = [user_namespace(owner_id)] + ([category_namespace(category_id)] if category_id else [])
+    versions = get_versions(embedded)
+    return Validators(
+        updated_at.isoformat(), sorted(versions.items()),
+        last_modified=max([updated_at] + [changed_at(version) for version in versions.values()]),
+    )
+
+
+def namespace_validators(namespace):
+    """Conditional GET validators for a response that only depends on ``namespace``."""
+    version = get_versions([namespace])[namespace]
+    return Validators(namespace, version, last_modified=changed_at(version))
+
+
+def items_changed(*item_ids):
+    bump(ITEMS, *[item_namespace(pk) for pk in item_ids])
+
+
+def users_changed(*user_ids):
+    bump(*[user_namespace(pk) for pk in user_ids])
+
+
+def item_saved(sender, instance, **kwargs):
+    items_changed(instance.pk)
+
+
+def category_saved(sender, instance, **kwargs):
+    # Facets show category names, so aggregates over items go too
+    bump(ITEMS, CATEGORIES, category_namespace(instance.pk))
+
+
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or OWNER_FIELDS.intersection(update_fields):
+        users_changed(instance.pk)
+
+
+def item_variants_recorded(sender, pk, **kwargs):
+    items_changed(pk)
+
+
+def user_variants_recorded(sender, pk, **kwargs):
+    users_changed(pk)
+
+
+def connect_signals():
+    post_save.connect(item_saved, sender=Item, dispatch_uid='item_cache_item_saved')
+    post_delete.connect(item_saved, sender=Item, dispatch_uid='item_cache_item_deleted')
+    post_save.connect(category_saved, sender=Category, dispatch_uid='item_cache_category_saved')
+    post_delete.connect(category_saved, sender=Category, dispatch_uid='item_cache_category_deleted')
+    post_save.connect(user_saved, sender=User, dispatch_uid='item_cache_user_saved')
+    post_delete.connect(user_saved, sender=User, dispatch_uid='item_cache_user_deleted')
+    images.variants_recorded.connect(item_variants_recorded, sender=Item, dispatch_uid='item_cache_item_variants')
+    images.variants_recorded.connect(user_variants_recorded, sender=User, dispatch_uid='item_cache_user_variants')
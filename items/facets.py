@@ -0,0 +1,72 @@
+"""
+Facet counts for item browsing (``/api/items/facets/``).
+
+All facets come from one grouped aggregate over the filtered item queryset
+(one row per category/status/condition combination present), summed per
+facet in Python. Results are cached per normalized filter string in the
+``items`` cache namespace, which item and category writes bump (see
+items/caching.py).
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from sharelib.cache import make_key, normalize_params
+
+from .caching import ITEMS
+from .models import Item
+
+# Query parameters that don't change which items match
+IGNORED_PARAMS = ('page', 'page_size', 'pagination', 'cursor', 'ordering', 'format')
+
+
+def get_cache_timeout():
+    return getattr(settings, 'ITEM_FACETS_CACHE_TIMEOUT', 300)
+
+
+def compute_facets(queryset):
+    rows = (
+        queryset.order_by()
+        .values('category', 'category__name', 'status', 'condition')
+        .annotate(count=Count('pk'))
+    )
+    categories, category_names, statuses, conditions = Counter(), {}, Counter(), Counter()
+    for row in rows:
+        categories[row['category']] += row['count']
+        category_names[row['category']] = row['category__name']
+        statuses[row['status']] += row['count']
+        conditions[row['condition']] += row['count']
+
+    def choices(field, counts):
+        return [
+            {'value': value, 'label': label, 'count': counts[value]}
+            for value, label in Item._meta.get_field(field).choices
+            if counts[value]
+        ]
+
+    return {
+        'total': sum(statuses.values()),
+        # Most items first, then by name, uncategorized last
+        'category': sorted(
+            (
+                {'id': category_id, 'name': category_names[category_id], 'count': count}
+                for category_id, count in categories.items()
+            ),
+            key=lambda facet: (-facet['count'], facet['name'] is None, facet['name'] or ''),
+        ),
+        'status': choices('status', statuses),
+        'condition': choices('condition', conditions),
+    }
+
+
+def get_facets(queryset, query_params):
+    """Facet counts for ``queryset`` (already filtered by ``query_params``), cached per filter."""
+    key = make_key(ITEMS, 'facets', normalize_params(query_params, IGNORED_PARAMS))
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, get_cache_timeout())
+    return facets
+
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from sharelib import images
+
+
+class Command(BaseCommand):
+    help = 'Backfill resized image variants for existing item photos, avatars and damage report photos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models',
+                            help='Only process this model label, e.g. items.Item (repeatable).')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate variants even if they are already up to date.')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for model_label, field_name, variants_field in images.registry:
+                if options['models'] and model_label not in options['models']:
+                    continue
+
+                model = apps.get_model(model_label)
+                queryset = (
+                    model.objects.exclude(**{field_name: ''})
+                    .exclude(**{f'{field_name}__isnull': True})
+                    .only('pk', field_name, variants_field)
+                    .order_by('pk')
+                )
+                pending = [
+                    instance.pk
+                    for instance in queryset.iterator(chunk_size=options['chunk_size'])
+                    if options['force'] or images.needs_variants(instance, field_name, variants_field)
+                ]
+                self.stdout.write(f'{model_label}.{field_name}: {len(pending)} image(s) to process')
+                list(executor.map(
+                    lambda pk: images.process_image(model_label, pk, field_name, variants_field),
+                    pending,
+                ))
+
+        self.stdout.write(self.style.SUCCESS('Image variants are up to date.'))
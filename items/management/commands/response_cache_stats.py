@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from sharelib.response_cache import get_metrics
+
+
+class Command(BaseCommand):
+    help = 'Report response cache hits and misses per cached view.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'view':<28}{'hits':>10}{'misses':>10}{'hit rate':>10}")
+        for view_name, counts in get_metrics().items():
+            total = counts['hits'] + counts['misses']
+            rate = f"{counts['hits'] / total:.0%}" if total else '-'
+            self.stdout.write(f"{view_name:<28}{counts['hits']:>10}{counts['misses']:>10}{rate:>10}")
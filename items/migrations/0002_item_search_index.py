@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# The SQL is inlined (not imported from items.search) so this migration
+# keeps doing what it did when it was written. items.search re-creates the
+# SQLite triggers after every migrate, as table rebuilds drop them.
+
+POSTGRES_INSTALL = [
+    "ALTER TABLE items_item ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS items_item_search_gin ON items_item USING GIN (search_vector)",
+]
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS items_item_search_gin",
+    "ALTER TABLE items_item DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_item_fts USING fts5("
+    "title, description, content='items_item', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS items_item_fts_ai AFTER INSERT ON items_item BEGIN "
+    "INSERT INTO items_item_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS items_item_fts_ad AFTER DELETE ON items_item BEGIN "
+    "INSERT INTO items_item_fts(items_item_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS items_item_fts_au AFTER UPDATE OF title, description ON items_item BEGIN "
+    "INSERT INTO items_item_fts(items_item_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO items_item_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "INSERT INTO items_item_fts(items_item_fts) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS items_item_fts_ai",
+    "DROP TRIGGER IF EXISTS items_item_fts_ad",
+    "DROP TRIGGER IF EXISTS items_item_fts_au",
+    "DROP TABLE IF EXISTS items_item_fts",
+]
+
+
+def statements(connection, install):
+    if connection.vendor == 'postgresql':
+        return POSTGRES_INSTALL if install else POSTGRES_UNINSTALL
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            if any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall()):
+                return SQLITE_INSTALL if install else SQLITE_UNINSTALL
+    # Other databases fall back to icontains search
+    return []
+
+
+def run(schema_editor, install):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements(schema_editor.connection, install):
+            cursor.execute(sql)
+
+
+def install_search_index(apps, schema_editor):
+    run(schema_editor, install=True)
+
+
+def uninstall_search_index(apps, schema_editor):
+    run(schema_editor, install=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -31,9 +31,26 @@ class Item(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     condition = models.CharField(max_length=20, choices=CONDITION_CHOICES, default='good')
     photos = models.ImageField(upload_to='items/', null=True, blank=True)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)  # Resized copies, see sharelib.images
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of the item list
+            models.Index(fields=['-created_at', '-id'], name='item_created_id_idx'),
+            # ?status=&category= filters, newest first
+            models.Index(fields=['status', 'category', '-created_at'], name='item_status_cat_created_idx'),
+            # ?owner= ("my items"), newest first
+            models.Index(fields=['owner', '-created_at'], name='item_owner_created_idx'),
+            # Browsing what can be borrowed right now, by category
+            models.Index(
+                fields=['category', '-created_at'],
+                name='item_available_cat_idx',
+                condition=models.Q(status='available'),
+            ),
+        ]
+    
     def __str__(self):
         return self.title
\ No newline at end of file
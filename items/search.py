@@ -0,0 +1,224 @@
+"""
+Full-text search for items.
+
+Each backend keeps an indexed search document per item inside the database
+(so it stays current on every insert/update, including bulk writes) and
+exposes ``search(queryset, query)``, which filters a queryset down to the
+matching items and annotates it with ``search_rank`` (higher is better),
+or returns None when DRF's ``icontains`` search should handle the query.
+
+- PostgreSQL: a generated ``tsvector`` column with a GIN index.
+- SQLite: an FTS5 external-content table kept in sync by triggers.
+- Anything else: falls back to DRF's ``icontains`` search.
+"""
+import re
+
+from django.db import connection as default_connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+# Cap the number of terms so a pasted paragraph can't build a huge query
+MAX_TERMS = 10
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split a raw search string into safe, bare word terms."""
+    return TERM_RE.findall(query or '')[:MAX_TERMS]
+
+
+class PostgresSearchBackend:
+    """tsvector + GIN index backend for PostgreSQL."""
+    config = 'english'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self, table='items_item'):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('{self.config}', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('{self.config}', coalesce(description, '')), 'B')"
+                f") STORED"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING GIN (search_vector)"
+            )
+
+    def uninstall(self, table='items_item'):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {table}_search_gin")
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset
+        table = queryset.model._meta.db_table
+        # Every term must match; ':*' allows prefix matches while typing
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        if not self.has_lexemes(tsquery):
+            # Only stopwords ('the', 'a', ...): the tsquery is empty and
+            # would match nothing, so let icontains search handle it
+            return None
+        return queryset.filter(
+            RawSQL(
+                f"{table}.search_vector @@ to_tsquery('{self.config}', %s)",
+                [tsquery],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank_cd({table}.search_vector, to_tsquery('{self.config}', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+    def has_lexemes(self, tsquery):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT numnode(to_tsquery('{self.config}', %s))", [tsquery])
+            return cursor.fetchone()[0] > 0
+
+
+class SQLiteSearchBackend:
+    """FTS5 backend used for local development on SQLite."""
+    # bm25 column weights for (title, description)
+    weights = (10.0, 5.0)
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self, table='items_item'):
+        fts = f'{table}_fts'
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+                [f'{fts}_ai'],
+            )
+            triggers_present = cursor.fetchone() is not None
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"title, description, content='{table}', content_rowid='id')"
+            )
+            # Table rebuilds during SQLite migrations drop triggers, so these
+            # are (re)created idempotently after every migrate.
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, title, description) "
+                f"VALUES (new.id, new.title, new.description); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, title, description) "
+                f"VALUES ('delete', old.id, old.title, old.description); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, description ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, title, description) "
+                f"VALUES ('delete', old.id, old.title, old.description); "
+                f"INSERT INTO {fts}(rowid, title, description) "
+                f"VALUES (new.id, new.title, new.description); END"
+            )
+            if not triggers_present:
+                # Writes may have happened while the triggers were missing
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def uninstall(self, table='items_item'):
+        fts = f'{table}_fts'
+        with self.connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+    def search(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset
+        table = queryset.model._meta.db_table
+        fts = f'{table}_fts'
+        # Quoted prefix terms, implicitly AND-ed by FTS5
+        match = ' '.join(f'"{term}"*' for term in terms)
+        title_weight, description_weight = self.weights
+        # Join the FTS table directly so ranking stays linear in the hit count;
+        # bm25() is lower-is-better, so negate it
+        return queryset.extra(
+            select={'search_rank': f'-bm25({fts}, {title_weight}, {description_weight})'},
+            tables=[fts],
+            where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+            params=[match],
+        )
+
+
+class FallbackSearchBackend:
+    """No indexed search available: keep DRF's icontains behaviour."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self, table='items_item'):
+        pass
+
+    def uninstall(self, table='items_item'):
+        pass
+
+    def search(self, queryset, query):
+        return None
+
+
+_fts5_support = {}
+
+
+def sqlite_has_fts5(connection):
+    """Check (once per database alias) whether SQLite was built with FTS5."""
+    if connection.alias not in _fts5_support:
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA compile_options")
+            _fts5_support[connection.alias] = any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+    return _fts5_support[connection.alias]
+
+
+def get_search_backend(connection=None):
+    """Return the search backend matching the database vendor."""
+    connection = connection or default_connection
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend(connection)
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        return SQLiteSearchBackend(connection)
+    return FallbackSearchBackend(connection)
+
+
+def install_search_index(sender=None, using='default', **kwargs):
+    """post_migrate hook: make sure the search index exists and is wired up."""
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+
+    connection = connections[using]
+    if ('items', '0002_item_search_index') not in MigrationRecorder(connection).applied_migrations():
+        return
+    get_search_backend(connection).install()
+
+
+class ItemSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for SearchFilter backed by the indexed search document.
+    Results are ordered by relevance unless the client asks for an explicit
+    ordering, in which case OrderingFilter takes over as before.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not tokenize(query):
+            return super().filter_queryset(request, queryset, view)
+
+        results = get_search_backend().search(queryset, query)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            results = results.order_by('-search_rank', '-id')
+        return results
@@ -1,13 +1,15 @@
 from rest_framework import serializers
 from .models import Item, Category
 from accounts.serializers import UserSerializer
+from sharelib.images import build_variant_urls, variant_urls
+from sharelib.serializers import FlexFieldsMixin
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(FlexFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
@@ -17,12 +19,25 @@ class ItemSerializer(serializers.ModelSerializer):
     )
     photos = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()  # Alias for photos (frontend compatibility)
+    photo_variants = serializers.SerializerMethodField()  # Resized copies keyed by size
     
     class Meta:
         model = Item
         fields = '__all__'
         read_only_fields = ['owner', 'created_at', 'updated_at']
     
+    expandable_fields = {
+        'owner': ('owner', UserSerializer),
+        'category': ('category', CategorySerializer),
+    }
+    
+    # Columns the method fields are computed from on compact list pages (see sharelib/compact.py)
+    compact_fields = {
+        'photos': ('photos',),
+        'images': ('photos',),
+        'photo_variants': ('photos', 'photo_variants'),
+    }
+    
     def get_photos(self, obj):
         """
         Return absolute URL(s) for the photos field.
@@ -38,6 +53,14 @@ class ItemSerializer(serializers.ModelSerializer):
         """
         return self._get_image_urls(obj)
     
+    def get_photo_variants(self, obj):
+        """
+        Return resized photo URLs keyed by size, e.g.
+        {'thumbnail': {'webp': url, 'jpeg': url}, 'card': {...}, 'full': {...}}.
+        Sizes still being generated point at the original photo.
+        """
+        return variant_urls(obj.photos, obj.photo_variants, self.context.get('request'))
+    
     def _get_image_urls(self, obj):
         """Helper method to get image URLs as array."""
         if obj.photos:
@@ -48,4 +71,12 @@ class ItemSerializer(serializers.ModelSerializer):
             else:
                 # Fallback to relative URL if no request context
                 return [obj.photos.url] if obj.photos else []
-        return []
\ No newline at end of file
+        return []
+    
+    def compact_photos(self, media, photos):
+        return [media.url(photos)] if photos else []
+    
+    compact_images = compact_photos
+    
+    def compact_photo_variants(self, media, photos, variants):
+        return build_variant_urls(photos, variants, media.url) if photos else {}
@@ -1,3 +1,287 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from ratings.utils import apply_rating_changes
+from sharelib.compact import CompactSerializer
+from sharelib.response_cache import get_metrics
+from .models import Category, Item
+from .search import FallbackSearchBackend, SQLiteSearchBackend, get_search_backend
+
+
+class ItemListQueryCountTests(APITestCase):
+    """Listing items must not issue per-row queries for owner/category."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Tools')
+
+    def create_items(self, count):
+        for index in range(count):
+            owner = User.objects.create(username=f'owner{Item.objects.count()}')
+            Item.objects.create(owner=owner, category=self.category, title=f'Item {index}', description='desc')
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/items/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_constant_in_page_size(self):
+        self.create_items(2)
+        small_page = self.count_list_queries()
+        self.create_items(10)
+        large_page = self.count_list_queries()
+        self.assertEqual(small_page, large_page)
+
+
+class ItemFacetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(username='owner')
+        self.tools = Category.objects.create(name='Tools')
+        self.books = Category.objects.create(name='Books')
+        for title, category, condition in [
+            ('Drill', self.tools, 'good'), ('Saw', self.tools, 'used'), ('Hammer drill', self.tools, 'new'),
+            ('Novel', self.books, 'good'), ('Misc', None, 'good'),
+        ]:
+            Item.objects.create(owner=self.owner, category=category, condition=condition, title=title, description='desc')
+
+    def facets(self, **params):
+        response = self.client.get('/api/items/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_counts_every_facet_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            facets = self.facets()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(facets['total'], 5)
+        self.assertEqual(facets['category'], [
+            {'id': self.tools.pk, 'name': 'Tools', 'count': 3},
+            {'id': self.books.pk, 'name': 'Books', 'count': 1},
+            {'id': None, 'name': None, 'count': 1},
+        ])
+        self.assertEqual(facets['status'], [{'value': 'available', 'label': 'Available', 'count': 5}])
+        self.assertEqual(
+            [(choice['value'], choice['count']) for choice in facets['condition']],
+            [('new', 1), ('good', 3), ('used', 1)],
+        )
+
+    def test_respects_filters_and_search(self):
+        self.assertEqual(self.facets(category=self.tools.pk)['total'], 3)
+        facets = self.facets(search='drill')
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual([(choice['value'], choice['count']) for choice in facets['condition']], [('new', 1), ('good', 1)])
+
+    def test_cached_until_items_change(self):
+        self.facets(condition='good', page=2)
+        with CaptureQueriesContext(connection) as queries:
+            # Same filter (pagination doesn't matter): served from the cache
+            self.assertEqual(self.facets(page=1, condition='good')['total'], 3)
+        self.assertEqual(len(queries), 0)
+
+        Item.objects.create(owner=self.owner, title='Lamp', description='desc', condition='good')
+        self.assertEqual(self.facets(condition='good')['total'], 4)
+        self.tools.delete()
+        self.assertEqual(self.facets(condition='good')['category'][0]['name'], None)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.owner = User.objects.create(username='owner')
+        self.category = Category.objects.create(name='Tools')
+        self.item = Item.objects.create(owner=self.owner, category=self.category, title='Drill', description='desc')
+        self.other = Item.objects.create(owner=User.objects.create(username='other'), title='Saw', description='desc')
+
+    def get(self, url, hit):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'HIT' if hit else 'MISS')
+        if hit:
+            # At most the conditional GET validator query (item detail)
+            self.assertLessEqual(len(queries), 1)
+        return response.data
+
+    def test_list_and_detail_are_cached(self):
+        self.get('/api/items/?status=available&page=1', hit=False)
+        self.get('/api/items/?page=1&status=available', hit=True)
+        self.get(f'/api/items/{self.item.pk}/', hit=False)
+        self.get(f'/api/items/{self.item.pk}/', hit=True)
+        self.get('/api/items/categories/', hit=False)
+        self.get('/api/items/categories/', hit=True)
+        self.assertEqual(get_metrics()['ItemViewSet.list'], {'hits': 1, 'misses': 1})
+
+    def test_writes_invalidate_exactly_what_shows_them(self):
+        detail, other_detail = f'/api/items/{self.item.pk}/', f'/api/items/{self.other.pk}/'
+        for url in ('/api/items/', detail, other_detail, '/api/items/categories/'):
+            self.get(url, hit=False)
+
+        self.item.title = 'Cordless drill'
+        self.item.save()
+        self.assertEqual(self.get(detail, hit=False)['title'], 'Cordless drill')
+        self.get(other_detail, hit=True)
+        self.get('/api/items/', hit=False)
+        self.get('/api/items/categories/', hit=True)
+
+        # Owner details are embedded; last_login alone isn't
+        self.owner.save(update_fields=['last_login'])
+        self.get(detail, hit=True)
+        self.owner.first_name = 'Ada'
+        self.owner.save()
+        self.assertEqual(self.get(detail, hit=False)['owner']['first_name'], 'Ada')
+        self.get(other_detail, hit=True)
+
+        # Rating aggregates are written with UPDATE, not save()
+        apply_rating_changes(added=[(self.owner.pk, 'lender', 4)])
+        self.assertEqual(self.get(detail, hit=False)['owner']['lender_rating'], '4.00')
+
+        self.category.name = 'Power tools'
+        self.category.save()
+        self.assertEqual(self.get(detail, hit=False)['category']['name'], 'Power tools')
+        self.get(other_detail, hit=True)
+        self.get('/api/items/categories/', hit=False)
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get('/api/items/')
+        self.assertNotIn('X-Cache', response)
+
+
+    def test_sparse_responses_track_only_embedded_objects(self):
+        url = f'/api/items/{self.item.pk}/?fields=title,owner.username,category&expand=owner'
+        data = self.get(url, hit=False)
+        self.assertEqual(data, {
+            'id': self.item.pk, 'title': 'Drill',
+            'owner': {'id': self.owner.pk, 'username': 'owner'}, 'category': self.category.pk,
+        })
+        # The collapsed category isn't a dependency; the expanded owner is
+        self.category.name = 'Hand tools'
+        self.category.save()
+        self.get(url, hit=True)
+        self.owner.username = 'lender'
+        self.owner.save()
+        self.assertEqual(self.get(url, hit=False)['owner']['username'], 'lender')
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(username='owner')
+        self.item = Item.objects.create(owner=self.owner, title='Drill', description='desc')
+        self.url = f'/api/items/{self.item.pk}/'
+
+    def test_etag_and_last_modified(self):
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # Both the item and its embedded owner change the validators
+        self.owner.bio = 'Lends tools'
+        self.owner.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.item.title = 'Cordless drill'
+        self.item.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_user_detail_and_categories(self):
+        for url in (f'/api/users/{self.owner.pk}/', '/api/items/categories/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Category.objects.create(name='Tools')
+        self.assertEqual(self.client.get('/api/items/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_item_is_not_conditional(self):
+        response = self.client.get('/api/items/999/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+        for pk in ('abc', '1.5', '99999999999999999999999'):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.client.get(f'/api/items/{pk}/', HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+
+class CompactListTests(APITestCase):
+    """The values()-based list pages (sharelib/compact.py) render what ItemSerializer does."""
+
+    def setUp(self):
+        owner = User.objects.create(
+            username='owner', first_name='Ada', last_name='Lovelace', avatar='avatars/ada lovelace.png',
+            lender_rating='4.5', borrower_rating='3.67',
+            avatar_variants={'source': 'avatars/ada lovelace.png', 'thumbnail': {'webp': 'avatars/ada lovelace.thumbnail.webp'}},
+        )
+        other = User.objects.create(username='other', bio='Ça va  ')
+        category = Category.objects.create(name='Tools')
+        Item.objects.create(
+            owner=owner, category=category, title='Cordless drill', description='desc', photos='items/drill.jpg',
+            photo_variants={'source': 'items/drill.jpg', 'card': {'webp': 'items/drill.card.webp', 'jpeg': 'items/drill.card.jpg'}},
+        )
+        Item.objects.create(owner=owner, title='Ladder', description='No category', photos='items/ünïcode ladder.jpg')
+        Item.objects.create(owner=other, category=category, title='Tent', description='desc')
+        self.client.force_authenticate(other)  # Authenticated lists skip the response cache
+
+    def assert_same_response(self, query):
+        with mock.patch.object(CompactSerializer, 'serialize', autospec=True, side_effect=CompactSerializer.serialize) as serialize:
+            compact = self.client.get(f'/api/items/{query}')
+        serialize.assert_called_once()
+        with override_settings(COMPACT_LISTS=False):
+            full = self.client.get(f'/api/items/{query}')
+        self.assertEqual(compact.status_code, 200)
+        self.assertEqual(compact.content, full.content)
+
+    def test_same_output_as_serializer(self):
+        for query in ['', '?fields=title,photos,owner.full_name', '?expand=owner', '?expand=', '?ordering=title',
+                      '?pagination=cursor&page_size=2', '?search=drill', '?status=available']:
+            with self.subTest(query=query):
+                self.assert_same_response(query)
+
+
+class ItemSearchTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='owner')
+        self.in_title = Item.objects.create(owner=self.owner, title='Cordless drill', description='Works well')
+        self.in_description = Item.objects.create(owner=self.owner, title='Toolbox', description='Has a drill bit')
+        Item.objects.create(owner=self.owner, title='Tent', description='Sleeps four')
+
+    def search(self, query, **params):
+        response = self.client.get('/api/items/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.data['results']]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search('dril'), ['Cordless drill', 'Toolbox'])
+
+    def test_explicit_ordering_replaces_rank(self):
+        self.assertEqual(self.search('drill', ordering='title'), ['Cordless drill', 'Toolbox'])
+        self.assertEqual(self.search('drill', ordering='-title'), ['Toolbox', 'Cordless drill'])
+
+    def test_index_follows_updates_and_deletes(self):
+        if not isinstance(get_search_backend(), SQLiteSearchBackend):
+            self.skipTest('SQLite without FTS5')
+        self.in_title.title = 'Ladder'
+        self.in_title.save()
+        self.assertEqual(self.search('drill'), ['Toolbox'])
+        self.assertEqual(self.search('ladder'), ['Ladder'])
+        self.in_description.delete()
+        self.assertEqual(self.search('drill'), [])
+
+    def test_quotes_and_operators_are_plain_terms(self):
+        self.assertEqual(self.search('"drill" OR NEAR(tent'), [])
+
+    def test_fallback_backend_uses_icontains(self):
+        with mock.patch('items.search.get_search_backend', return_value=FallbackSearchBackend(connection)):
+            self.assertEqual(sorted(self.search('drill')), ['Cordless drill', 'Toolbox'])
+            self.assertEqual(sorted(self.search('ril')), ['Cordless drill', 'Toolbox'])
@@ -2,24 +2,65 @@ from django.shortcuts import render
 
 # Create your views here.
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Item, Category
 from .serializers import ItemSerializer, CategorySerializer
+from sharelib.compact import CompactListMixin
+from sharelib.conditional import ConditionalGetMixin
+from sharelib.response_cache import CachedResponseMixin
+from .caching import CATEGORIES, ITEMS, item_dependencies, item_namespace, item_validators, namespace_validators
+from .facets import get_facets
+from .search import ItemSearchFilter
+from borrows.availability import ItemAvailabilityFilter
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    
+    def get_cache_namespaces(self):
+        return (CATEGORIES,)
+    
+    def get_validators(self, request, *args, **kwargs):
+        return namespace_validators(CATEGORIES)
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(ConditionalGetMixin, CachedResponseMixin, CompactListMixin, viewsets.ModelViewSet):
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ItemAvailabilityFilter, ItemSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'status', 'condition', 'owner']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'title']
+    keyset_ordering = ('-created_at', '-id')  # ?pagination=cursor
+    
+    def get_queryset(self):
+        # Only join the owner/category the requested fields/expansions render
+        return ItemSerializer.select_related(super().get_queryset(), self.request)
+    
+    def get_cache_namespaces(self):
+        # Any item write can change a list page; a detail page only depends on its item
+        if self.action == 'retrieve':
+            return (item_namespace(self.kwargs[self.lookup_field]),)
+        return (ITEMS,)
+    
+    def response_dependencies(self, data):
+        return item_dependencies(data)
+    
+    def get_validators(self, request, *args, **kwargs):
+        # List pages embed owners and categories that item columns can't vouch for
+        if self.action == 'retrieve':
+            return item_validators(kwargs[self.lookup_field])
+        return None
     
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
\ No newline at end of file
+        serializer.save(owner=self.request.user)
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Counts per category, status and condition for the current search/filters"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(get_facets(queryset, request.query_params))
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Maintenance of the denormalized User.unread_notification_count counter.
+"""
+from collections import defaultdict
+
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from accounts.models import User
+
+
+def adjust_unread_count(user_id, delta):
+    """
+    Atomically add ``delta`` to a user's unread notification counter.
+    Call this inside the same transaction as the notification write.
+    """
+    if delta:
+        User.objects.filter(pk=user_id).update(
+            unread_notification_count=Greatest(F('unread_notification_count') + delta, 0)
+        )
+
+
+def adjust_unread_counts(deltas):
+    """
+    Apply many counter changes at once (``{user_id: delta}``), with one
+    UPDATE per distinct delta rather than one per user.
+    """
+    users_by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            users_by_delta[delta].append(user_id)
+    for delta, user_ids in users_by_delta.items():
+        User.objects.filter(pk__in=user_ids).update(
+            unread_notification_count=Greatest(F('unread_notification_count') + delta, 0)
+        )
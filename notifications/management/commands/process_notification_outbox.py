@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending notifications from the outbox (once, or continuously with --loop).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new entries.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls when idle.')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        while True:
+            delivered = outbox.drain_all(options['batch_size'])
+            if delivered:
+                self.stdout.write(f'Delivered {delivered} notification(s).')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
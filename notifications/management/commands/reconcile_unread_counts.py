@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from accounts.models import User
+from notifications.models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in User.unread_notification_count by recounting unread notifications in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = repaired = 0
+
+        while True:
+            with transaction.atomic():
+                # Locking the batch makes concurrent counter updates wait for (or
+                # precede) our recount, so the absolute value we write is exact.
+                users = list(
+                    User.objects.select_for_update()
+                    .filter(pk__gt=last_id)
+                    .order_by('pk')
+                    .only('pk', 'unread_notification_count')[:batch_size]
+                )
+                if not users:
+                    break
+                last_id = users[-1].pk
+
+                actual = dict(
+                    Notification.objects.filter(user__in=users, read=False)
+                    .order_by()
+                    .values('user')
+                    .annotate(total=Count('pk'))
+                    .values_list('user', 'total')
+                )
+                drifted = []
+                for user in users:
+                    expected = actual.get(user.pk, 0)
+                    if user.unread_notification_count != expected:
+                        user.unread_notification_count = expected
+                        drifted.append(user)
+
+                if drifted and not options['dry_run']:
+                    User.objects.bulk_update(drifted, ['unread_notification_count'])
+                checked += len(users)
+                repaired += len(drifted)
+
+        verb = 'would be repaired' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} user(s); {repaired} counter(s) {verb}.'))
@@ -1,6 +1,7 @@
 
 # Create your models here.
 from django.db import models
+from django.utils import timezone
 from accounts.models import User
 
 class Notification(models.Model):
@@ -35,7 +36,45 @@ class Notification(models.Model):
         blank=True
     )
     metadata = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: notifications delivered through the outbox keep the time they were queued
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's list, newest first
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # ?filter=unread|read and mark-all-read
+            models.Index(fields=['user', 'read', '-created_at'], name='notif_user_read_created_idx'),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """
+    A notification waiting to be delivered. Rows are written in the same
+    transaction as the change that triggers them and drained into
+    Notification in batches by notifications.outbox.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    title = models.CharField(max_length=255, default='')
+    message = models.TextField()
+    related_item = models.ForeignKey(
+        'items.Item',
+        on_delete=models.CASCADE,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    related_request = models.ForeignKey(
+        'borrows.BorrowRequest',
+        on_delete=models.CASCADE,
+        related_name='+',
+        null=True,
+        blank=True
+    )
+    metadata = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
@@ -0,0 +1,179 @@
+"""
+Transactional outbox for notifications.
+
+Write paths call ``enqueue()``, ``enqueue_many()`` or ``enqueue_select()``
+inside their own transaction, so a notification is recorded if and only if
+the change that caused it commits. ``drain()`` later moves pending rows into Notification
+with one ``bulk_create`` per batch, bumps the unread counters and pushes the
+new rows to connected streams.
+
+When draining happens is controlled by ``settings.NOTIFICATION_OUTBOX['DRIVER']``:
+
+- ``thread`` (default): a background thread in this process drains right
+  after commit. Rows left behind by a crash are picked up by the next drain
+  or by ``manage.py process_notification_outbox``.
+- ``celery``: after commit, queue the ``notifications.drain_outbox`` task.
+- ``worker``: nothing happens in-process; run
+  ``manage.py process_notification_outbox --loop`` as a separate worker.
+- ``sync``: drain inline after commit (handy for tests and scripts).
+"""
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import DateTimeField, JSONField, Value
+from django.utils import timezone
+
+from .counters import adjust_unread_counts
+from .models import Notification, NotificationOutbox
+from .pubsub import publish_notification
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def get_config():
+    return getattr(settings, 'NOTIFICATION_OUTBOX', {})
+
+
+def get_batch_size():
+    return get_config().get('BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def enqueue(user, notification_type, title, message, related_item=None, related_request=None, metadata=None):
+    """Record one pending notification in the caller's transaction."""
+    entry = NotificationOutbox.objects.create(
+        user=user,
+        type=notification_type,
+        title=title,
+        message=message,
+        related_item=related_item,
+        related_request=related_request,
+        metadata=metadata or {},
+    )
+    schedule_drain()
+    return entry
+
+
+def enqueue_many(entries):
+    """Record many pending notifications with a single INSERT (unsaved NotificationOutbox objects)."""
+    entries = NotificationOutbox.objects.bulk_create(entries, batch_size=get_batch_size())
+    if entries:
+        schedule_drain()
+    return entries
+
+
+def enqueue_select(queryset, **columns):
+    """
+    Record one pending notification per row of ``queryset`` with a single
+    INSERT ... SELECT, for set-based producers where building model
+    instances would dominate. ``columns`` maps NotificationOutbox fields
+    (``user``, ``type``, ``title``, ``message`` and optionally
+    ``related_item``, ``related_request``, ``metadata``) to expressions over
+    the queryset's model. Returns how many notifications were queued.
+    """
+    columns.setdefault('metadata', Value({}, output_field=JSONField()))
+    columns.setdefault('created_at', Value(timezone.now(), output_field=DateTimeField()))
+    fields = [NotificationOutbox._meta.get_field(name) for name in columns]
+    select = queryset.order_by().values(**{f'outbox_{name}': expression for name, expression in columns.items()})
+    sql, params = select.query.get_compiler(using=select.db).as_sql()
+
+    db = connections[select.db]
+    quote = db.ops.quote_name
+    column_list = ', '.join(quote(field.column) for field in fields)
+    with db.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(NotificationOutbox._meta.db_table)} ({column_list}) {sql}', params)
+        queued = cursor.rowcount
+    if queued:
+        schedule_drain()
+    return queued
+
+
+def drain(batch_size=None):
+    """
+    Deliver one batch of pending notifications. Returns how many were delivered.
+    Concurrent drainers skip each other's rows where the database supports it.
+    """
+    batch_size = batch_size or get_batch_size()
+    with transaction.atomic():
+        pending = NotificationOutbox.objects.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        entries = list(pending[:batch_size])
+        if not entries:
+            return 0
+
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=entry.user_id,
+                type=entry.type,
+                title=entry.title,
+                message=entry.message,
+                related_item_id=entry.related_item_id,
+                related_request_id=entry.related_request_id,
+                metadata=entry.metadata,
+                created_at=entry.created_at,
+            )
+            for entry in entries
+        ])
+        adjust_unread_counts(Counter(entry.user_id for entry in entries))
+        NotificationOutbox.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+
+        transaction.on_commit(lambda: [publish_notification(n) for n in notifications])
+    return len(entries)
+
+
+def drain_all(batch_size=None):
+    """Drain until the outbox is empty. Returns the total delivered."""
+    total = 0
+    while True:
+        delivered = drain(batch_size)
+        if not delivered:
+            return total
+        total += delivered
+
+
+class DrainThread:
+    """Single background thread that drains whenever it's kicked; kicks coalesce."""
+
+    def __init__(self):
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def kick(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='notification-outbox', daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                drain_all()
+            except Exception:
+                logger.exception('Draining the notification outbox failed')
+            finally:
+                close_old_connections()
+
+
+drain_thread = DrainThread()
+
+
+def schedule_drain():
+    """Arrange for the outbox to be drained once the current transaction commits."""
+    driver = get_config().get('DRIVER', 'thread')
+    if driver == 'thread':
+        transaction.on_commit(drain_thread.kick)
+    elif driver == 'celery':
+        from .tasks import drain_notification_outbox
+        transaction.on_commit(drain_notification_outbox.delay)
+    elif driver == 'sync':
+        transaction.on_commit(drain_all)
+    # 'worker': a separate process_notification_outbox worker polls the table
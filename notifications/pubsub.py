@@ -0,0 +1,176 @@
+"""
+Publish/subscribe fan-out for real-time notifications.
+
+``publish_notification()`` is called (after commit) whenever a notification
+is created; every open stream for that user receives it. Subscribers are
+asyncio-based, so one process can hold thousands of idle connections.
+
+The broker is pluggable via ``settings.NOTIFICATION_BROKER``:
+
+- ``InProcessBroker`` (default) delivers to subscribers in this process only.
+- ``RedisBroker`` publishes through a Redis channel so that every worker
+  process receives the event and delivers it to its own subscribers.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def notification_payload(notification):
+    """Flat, cheap representation pushed to streams (ids instead of nested objects)."""
+    return {
+        'id': notification.pk,
+        'type': notification.type,
+        'title': notification.title,
+        'message': notification.message,
+        'is_read': notification.read,
+        'created_at': notification.created_at,
+        'related_item': notification.related_item_id,
+        'related_request': notification.related_request_id,
+        'metadata': notification.metadata,
+    }
+
+
+def encode_payload(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+class Subscription:
+    """
+    One connected client. ``push()`` may be called from any thread; messages
+    are handed to the subscriber's event loop. If a slow client falls
+    ``max_queue_size`` messages behind, the oldest ones are dropped.
+    """
+
+    def __init__(self, broker, user_id, max_queue_size):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+
+    def push(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Wait for the next message; returns None if ``timeout`` elapses first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Delivers to subscribers connected to this process."""
+
+    def __init__(self, max_queue_size=100, **options):
+        self.max_queue_size = max_queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Must be called from the subscriber's running event loop."""
+        subscription = Subscription(self, user_id, self.max_queue_size)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, user_id, message):
+        self.deliver(user_id, message)
+
+    def deliver(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.push(message)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Fans out through a Redis pub/sub channel so every worker process sees
+    every event. A listener thread per process forwards messages to the
+    local subscribers.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', channel='sharelib:notifications', **options):
+        super().__init__(**options)
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._listener = None
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, message):
+        self.client.publish(self.channel, json.dumps({'user_id': user_id, 'message': message}))
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name='notification-broker', daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for event in pubsub.listen():
+            try:
+                data = json.loads(event['data'])
+                self.deliver(data['user_id'], data['message'])
+            except Exception:
+                logger.exception('Dropping malformed notification broker message')
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = getattr(settings, 'NOTIFICATION_BROKER', {})
+            broker_class = import_string(config.get('BACKEND', 'notifications.pubsub.InProcessBroker'))
+            _broker = broker_class(**config.get('OPTIONS', {}))
+    return _broker
+
+
+def publish_notification(notification):
+    """Push a freshly committed notification to the recipient's open streams."""
+    try:
+        get_broker().publish(notification.user_id, encode_payload(notification_payload(notification)))
+    except Exception:
+        # Real-time delivery is best effort; the row is already stored
+        logger.exception('Failed to publish notification %s', notification.pk)
@@ -0,0 +1,181 @@
+"""
+Real-time notification streams (served by the ASGI application).
+
+- Server-Sent Events: ``GET /api/notifications/stream/``
+- WebSocket: ``ws://<host>/ws/notifications/`` (routed in sharelib/asgi.py)
+
+Browsers can't set headers on EventSource/WebSocket connections. Rather than
+putting the access token in the URL (where proxies and access logs keep it),
+they ``POST /api/notifications/stream-ticket/`` with their usual
+``Authorization: Bearer <token>`` header and connect with the returned
+``?ticket=``: a signed user id that is only accepted here and expires after
+``NOTIFICATION_STREAM_TICKET_MAX_AGE`` seconds. Other clients can send the
+``Authorization`` header on the stream request itself.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from accounts.models import User
+from .models import Notification
+from .pubsub import encode_payload, get_broker, notification_payload
+
+# Missed notifications replayed when a client reconnects with Last-Event-ID
+REPLAY_LIMIT = 50
+
+
+TICKET_SALT = 'notifications.stream-ticket'
+
+
+def get_heartbeat_interval():
+    return getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 20)
+
+
+def get_ticket_max_age():
+    return getattr(settings, 'NOTIFICATION_STREAM_TICKET_MAX_AGE', 30)
+
+
+def issue_ticket(user):
+    """A short-lived credential that only opens notification streams for ``user``."""
+    return signing.dumps(user.pk, salt=TICKET_SALT)
+
+
+def authenticate_token(raw_token):
+    """Return the user for a raw JWT access token, or None."""
+    if not raw_token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        user = authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError):
+        return None
+    finally:
+        close_old_connections()
+    return user if user.is_active else None
+
+
+def authenticate_ticket(ticket):
+    """Return the user a stream ticket was issued to, or None if it's invalid or expired."""
+    if not ticket:
+        return None
+    try:
+        user_id = signing.loads(ticket, salt=TICKET_SALT, max_age=get_ticket_max_age())
+        return User.objects.filter(pk=user_id, is_active=True).first()
+    except signing.BadSignature:
+        return None
+    finally:
+        close_old_connections()
+
+
+def authenticate(authorization, ticket):
+    """The user for an ``Authorization: Bearer`` header value or a stream ticket."""
+    if authorization.startswith('Bearer '):
+        return authenticate_token(authorization[7:])
+    return authenticate_ticket(ticket)
+
+
+def replay_missed(user_id, last_event_id):
+    try:
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        return []
+    try:
+        notifications = Notification.objects.filter(
+            user_id=user_id, pk__gt=last_event_id
+        ).order_by('pk')[:REPLAY_LIMIT]
+        return [encode_payload(notification_payload(n)) for n in notifications]
+    finally:
+        close_old_connections()
+
+
+def format_event(message):
+    event_id = json.loads(message)['id']
+    return f'id: {event_id}\nevent: notification\ndata: {message}\n\n'
+
+
+async def notification_stream(request):
+    """
+    GET /api/notifications/stream/
+    Push the current user's new notifications as Server-Sent Events.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': 'Notification streaming requires the ASGI server (sharelib.asgi).'},
+            status=501,
+        )
+
+    user = await sync_to_async(authenticate)(request.headers.get('Authorization', ''), request.GET.get('ticket'))
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+    # Subscribe before replaying so nothing falls between the two
+    subscription = get_broker().subscribe(user.pk)
+    missed = await sync_to_async(replay_missed)(user.pk, request.headers.get('Last-Event-ID'))
+    heartbeat = get_heartbeat_interval()
+
+    async def events():
+        try:
+            yield f'retry: {heartbeat * 1000}\n\n'
+            for message in missed:
+                yield format_event(message)
+            while True:
+                message = await subscription.get(timeout=heartbeat)
+                if message is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield format_event(message)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+async def websocket_application(scope, receive, send):
+    """Raw ASGI WebSocket endpoint pushing the same events as the SSE stream."""
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    headers = dict(scope.get('headers', ()))
+    authorization = headers.get(b'authorization', b'').decode('latin-1')
+    user = await sync_to_async(authenticate)(authorization, query.get('ticket', [None])[0])
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+
+    subscription = get_broker().subscribe(user.pk)
+    await send({'type': 'websocket.accept'})
+
+    async def wait_for_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        while not disconnected.done():
+            next_message = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {next_message, disconnected}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_message in done:
+                await send({'type': 'websocket.send', 'text': next_message.result()})
+            else:
+                next_message.cancel()
+    finally:
+        disconnected.cancel()
+        subscription.close()
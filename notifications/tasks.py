@@ -0,0 +1,11 @@
+"""
+Celery tasks for the notification outbox (used when NOTIFICATION_OUTBOX['DRIVER'] is 'celery').
+"""
+from celery import shared_task
+
+from . import outbox
+
+
+@shared_task(name='notifications.drain_outbox', ignore_result=True)
+def drain_notification_outbox():
+    return outbox.drain_all()
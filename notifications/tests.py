@@ -1,3 +1,293 @@
-from django.test import TestCase
+import asyncio
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from borrows.models import BorrowRequest
+from items.models import Category, Item
+from sharelib.asgi import application
+from . import outbox
+from .models import Notification, NotificationOutbox
+from .pubsub import InProcessBroker
+from .streams import authenticate_ticket
+from .utils import create_notification
+
+
+class NotificationListQueryCountTests(APITestCase):
+    """Notifications embed items and borrow requests; listing must stay O(1) in queries."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='lender')
+        self.category = Category.objects.create(name='Tools')
+        self.client.force_authenticate(self.user)
+
+    def create_notifications(self, count):
+        for index in range(count):
+            borrower = User.objects.create(username=f'borrower{Notification.objects.count()}')
+            item = Item.objects.create(
+                owner=self.user, category=self.category, title=f'Item {index}', description='desc'
+            )
+            borrow_request = BorrowRequest.objects.create(item=item, borrower=borrower)
+            Notification.objects.create(
+                user=self.user,
+                type='request',
+                title='New Borrow Request',
+                message='Someone wants to borrow your item',
+                related_item=item,
+                related_request=borrow_request,
+            )
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notifications/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_constant_in_page_size(self):
+        self.create_notifications(2)
+        small_page = self.count_list_queries()
+        self.create_notifications(10)
+        large_page = self.count_list_queries()
+        self.assertEqual(small_page, large_page)
+
+    def test_list_supports_conditional_get(self):
+        self.create_notifications(2)
+        # Created directly, so bring the denormalized counter in line by hand
+        User.objects.filter(pk=self.user.pk).update(unread_notification_count=2)
+        self.user.refresh_from_db()
+        url = '/api/notifications/?expand='
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A different filter is a different response
+        self.assertEqual(self.client.get(url + '&filter=unread', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        notification = Notification.objects.first()
+        self.client.patch(f'/api/notifications/{notification.pk}/read/')
+        self.user.refresh_from_db()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_lists_embedding_items_or_requests_are_not_conditional(self):
+        self.create_notifications(1)
+        # An approval changes the embedded item and request but no notification column
+        for url in ['/api/notifications/', '/api/notifications/?expand=related_request',
+                    '/api/notifications/?fields=id,related_item']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('ETag'))
+        self.assertTrue(self.client.get('/api/notifications/?fields=id,title').has_header('ETag'))
+
+
+class UnreadCounterTests(APITestCase):
+    """User.unread_notification_count follows every write path (see notifications/counters.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='lender')
+        self.client.force_authenticate(self.user)
+        for index in range(3):
+            response = self.client.post('/api/notifications/', {'type': 'message', 'title': f'#{index}', 'message': 'Hi'})
+            self.assertEqual(response.status_code, 201)
+        self.notifications = list(Notification.objects.order_by('pk'))
+
+    def assert_unread(self, expected):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, expected)
+        self.assertEqual(Notification.objects.filter(user=self.user, read=False).count(), expected)
+        self.assertEqual(self.client.get('/api/notifications/unread-count/').data['unread_count'], expected)
+
+    def test_create_increments(self):
+        self.assert_unread(3)
+
+    def test_mark_read_decrements_once(self):
+        url = f'/api/notifications/{self.notifications[0].pk}/read/'
+        self.assertEqual(self.client.patch(url).status_code, 200)
+        self.assertEqual(self.client.patch(url).status_code, 200)
+        self.assert_unread(2)
+
+    def test_mark_all_read(self):
+        self.client.patch(f'/api/notifications/{self.notifications[0].pk}/read/')
+        response = self.client.post('/api/notifications/mark-all-read/')
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assert_unread(0)
+        self.assertEqual(self.client.post('/api/notifications/mark-all-read/').data['updated_count'], 0)
+        self.assert_unread(0)
+
+    def test_deleting_unread_decrements_and_read_does_not(self):
+        read, unread = self.notifications[0], self.notifications[1]
+        self.client.patch(f'/api/notifications/{read.pk}/read/')
+        self.assertEqual(self.client.delete(f'/api/notifications/{read.pk}/').status_code, 204)
+        self.assert_unread(2)
+        self.assertEqual(self.client.delete(f'/api/notifications/{unread.pk}/').status_code, 204)
+        self.assert_unread(1)
+
+    def test_other_users_notifications_are_untouched(self):
+        other = User.objects.create(username='other')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.patch(f'/api/notifications/{self.notifications[0].pk}/read/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/notifications/{self.notifications[0].pk}/').status_code, 404)
+        self.client.force_authenticate(self.user)
+        self.assert_unread(3)
+
+    def test_reconcile_repairs_drift(self):
+        other = User.objects.create(username='other', unread_notification_count=7)
+        User.objects.filter(pk=self.user.pk).update(unread_notification_count=0)
+        out = io.StringIO()
+        call_command('reconcile_unread_counts', '--dry-run', stdout=out)
+        self.assertIn('2 counter(s) would be repaired', out.getvalue())
+        self.assertEqual(User.objects.get(pk=self.user.pk).unread_notification_count, 0)
+
+        call_command('reconcile_unread_counts', '--batch-size=1', stdout=io.StringIO())
+        self.assert_unread(3)
+        other.refresh_from_db()
+        self.assertEqual(other.unread_notification_count, 0)
+
+
+class NotificationStreamTests(TransactionTestCase):
+    """SSE and WebSocket push (notifications/streams.py) with stream-ticket authentication."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='lender')
+        self.other = User.objects.create(username='other')
+        patcher = mock.patch('notifications.pubsub._broker', InProcessBroker())
+        self.broker = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ticket(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/notifications/stream-ticket/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['ticket']
+
+    def test_tickets_expire_and_are_not_api_tokens(self):
+        ticket = self.ticket(self.user)
+        self.assertEqual(authenticate_ticket(ticket), self.user)
+        self.assertIsNone(authenticate_ticket(ticket + 'x'))
+        self.assertIsNone(authenticate_ticket(signing.dumps(self.user.pk)))  # Signed for something else
+        with override_settings(NOTIFICATION_STREAM_TICKET_MAX_AGE=-1):
+            self.assertIsNone(authenticate_ticket(ticket))
+        # Nor is a stream ticket accepted by the API
+        response = APIClient().get('/api/notifications/', HTTP_AUTHORIZATION=f'Bearer {ticket}')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_sse_requires_a_ticket_or_bearer_token(self):
+        for params in [{}, {'ticket': 'forged'}, {'token': str(AccessToken.for_user(self.user))}]:
+            response = await self.async_client.get('/api/notifications/stream/', params)
+            self.assertEqual(response.status_code, 401)
+
+    async def test_sse_delivers_only_the_users_notifications(self):
+        ticket = await sync_to_async(self.ticket)(self.user)
+        response = await self.async_client.get('/api/notifications/stream/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b'retry:'))
+
+        self.broker.publish(self.other.pk, '{"id": 1}')
+        self.broker.publish(self.user.pk, '{"id": 2}')
+        self.assertEqual(await anext(events), b'id: 2\nevent: notification\ndata: {"id": 2}\n\n')
+        self.assertEqual(self.broker.subscriber_count(), 1)
+        await self.disconnect(events)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    async def disconnect(self, events):
+        # A client disconnect cancels the task waiting for the next event
+        waiting = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+
+    async def test_sse_accepts_bearer_header(self):
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.user)))()
+        response = await self.async_client.get('/api/notifications/stream/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b'retry:'))
+        await self.disconnect(events)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    async def connect(self, query=b'', headers=()):
+        received, sent = asyncio.Queue(), asyncio.Queue()
+        scope = {'type': 'websocket', 'path': '/ws/notifications/', 'query_string': query, 'headers': list(headers)}
+        await received.put({'type': 'websocket.connect'})
+        task = asyncio.ensure_future(application(scope, received.get, sent.put))
+        return received, sent, task
+
+    async def test_websocket_rejects_missing_or_bad_credentials(self):
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.user)))()
+        for query in [b'', b'ticket=forged', f'token={token}'.encode()]:
+            _, sent, task = await self.connect(query)
+            self.assertEqual(await asyncio.wait_for(sent.get(), 5), {'type': 'websocket.close', 'code': 4401})
+            await task
+
+    async def test_websocket_fan_out_and_disconnect_cleanup(self):
+        ticket = await sync_to_async(self.ticket)(self.user)
+        token = await sync_to_async(lambda: str(AccessToken.for_user(self.user)))()
+        mine = await self.connect(f'ticket={ticket}'.encode())
+        also_mine = await self.connect(headers=[(b'authorization', f'Bearer {token}'.encode())])
+        other = await self.connect(f'ticket={await sync_to_async(self.ticket)(self.other)}'.encode())
+        for _, sent, _ in (mine, also_mine, other):
+            self.assertEqual(await asyncio.wait_for(sent.get(), 5), {'type': 'websocket.accept'})
+        self.assertEqual(self.broker.subscriber_count(), 3)
+
+        self.broker.publish(self.user.pk, '{"id": 3}')
+        for _, sent, _ in (mine, also_mine):
+            self.assertEqual(await asyncio.wait_for(sent.get(), 5), {'type': 'websocket.send', 'text': '{"id": 3}'})
+        self.assertTrue(other[1].empty())
+
+        for received, _, task in (mine, also_mine, other):
+            await received.put({'type': 'websocket.disconnect', 'code': 1000})
+            await asyncio.wait_for(task, 5)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+
+@override_settings(NOTIFICATION_OUTBOX={'DRIVER': 'worker'})  # Drained explicitly below
+class OutboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='lender')
+        self.item = Item.objects.create(owner=self.user, title='Drill', description='desc')
+
+    def test_enqueue_drain_counts_and_publishes(self):
+        queued_at = timezone.now() - timedelta(minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = create_notification(self.user, 'message', 'Hello', 'First', related_item=self.item, metadata={'n': 1})
+            outbox.enqueue_many([
+                NotificationOutbox(user=self.user, type='message', title='Bulk', message=f'#{index}') for index in range(2)
+            ])
+        NotificationOutbox.objects.filter(pk=entry.pk).update(created_at=queued_at)
+        self.assertFalse(Notification.objects.exists())
+
+        with mock.patch('notifications.outbox.publish_notification') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(outbox.drain(batch_size=2), 2)
+            self.assertEqual(publish.call_count, 2)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(outbox.drain_all(), 1)
+            self.assertEqual(publish.call_count, 3)
+
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, 3)
+        first = Notification.objects.get(title='Hello')
+        # The event time, not the drain time
+        self.assertEqual(first.created_at, queued_at)
+        self.assertEqual((first.related_item, first.metadata, first.read), (self.item, {'n': 1}, False))
+        self.assertEqual(Notification.objects.filter(user=self.user).order_by('created_at').first(), first)
+
+    def test_rolled_back_writes_queue_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            create_notification(self.user, 'message', 'Hello', 'Lost')
+            raise RuntimeError
+        self.assertEqual(outbox.drain_all(), 0)
+        self.assertFalse(Notification.objects.exists())
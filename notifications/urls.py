@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import NotificationViewSet
+from .streams import notification_stream
 
 router = DefaultRouter()
 router.register(r'', NotificationViewSet, basename='notification')
 
 urlpatterns = [
+    # Must come before the router so 'stream' isn't taken as a notification id
+    path('stream/', notification_stream, name='notification-stream'),
     path('', include(router.urls)),
 ]
 
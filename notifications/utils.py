@@ -1,13 +1,17 @@
 """
 Utility functions for creating notifications
 """
-from .models import Notification
+from . import outbox
 
 
 def create_notification(user, notification_type, title, message, related_item=None, related_request=None, metadata=None):
     """
     Helper function to create a notification
     
+    The notification is written to the outbox in the caller's transaction and
+    delivered (inserted, counted and pushed to streams) by the outbox worker
+    once that transaction commits. See notifications/outbox.py.
+    
     Args:
         user: User instance to receive the notification
         notification_type: Type of notification (e.g., 'request', 'approved', 'returned', 'rating', 'reminder', 'message')
@@ -18,16 +22,14 @@ def create_notification(user, notification_type, title, message, related_item=No
         metadata: Optional dict with additional data
     
     Returns:
-        Created Notification instance
+        Pending NotificationOutbox entry
     """
-    notification = Notification.objects.create(
+    return outbox.enqueue(
         user=user,
-        type=notification_type,
+        notification_type=notification_type,
         title=title,
         message=message,
         related_item=related_item,
         related_request=related_request,
-        metadata=metadata or {}
+        metadata=metadata
     )
-    return notification
-
@@ -3,13 +3,20 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
+from django.db import transaction
+from django.db.models import Count, Max
 from .models import Notification
+from .counters import adjust_unread_count
+from .pubsub import publish_notification
+from .streams import get_ticket_max_age, issue_ticket
 from rest_framework import serializers
 from items.serializers import ItemSerializer
 from borrows.serializers import BorrowRequestSerializer
+from sharelib.conditional import ConditionalGetMixin, Validators
+from sharelib.serializers import FlexFieldsMixin, renders_nested
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     is_read = serializers.BooleanField(source='read', read_only=True)
     related_item = ItemSerializer(read_only=True)
     related_request = BorrowRequestSerializer(read_only=True)
@@ -21,6 +28,11 @@ class NotificationSerializer(serializers.ModelSerializer):
             'created_at', 'related_item', 'related_request', 'metadata'
         ]
         read_only_fields = ['created_at', 'is_read']
+    
+    expandable_fields = {
+        'related_item': ('related_item', ItemSerializer),
+        'related_request': ('related_request', BorrowRequestSerializer),
+    }
 
 
 class NotificationPagination(PageNumberPagination):
@@ -29,7 +41,7 @@ class NotificationPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.none()  # For schema generation
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
@@ -51,17 +63,31 @@ class NotificationViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(read=True)
         # 'all' or any other value shows all notifications
         
-        return queryset
+        # Only join what the requested fields/expansions render
+        return NotificationSerializer.select_related(queryset, self.request)
+    
+    def get_validators(self, request, *args, **kwargs):
+        if self.action != 'list':
+            return None
+        # Embedded items and requests change without touching notification rows (an approval
+        # flips both), so only lists that collapse or leave them out (?expand=, ?fields=) qualify
+        if any(renders_nested(request, name) for name in NotificationSerializer.expandable_fields):
+            return None
+        # New or deleted notifications change the count/latest; read-state changes change
+        # the unread counter. No Last-Modified: marking read leaves no timestamp behind.
+        summary = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            count=Count('pk'), latest=Max('created_at')
+        )
+        return Validators(
+            request.user.pk, summary['count'], summary['latest'], request.user.unread_notification_count
+        )
     
     def list(self, request, *args, **kwargs):
         """Override list to include unread_count in response"""
         queryset = self.filter_queryset(self.get_queryset())
         
-        # Calculate unread count for the user
-        unread_count = Notification.objects.filter(
-            user=request.user, 
-            read=False
-        ).count()
+        # Served from the denormalized counter instead of a COUNT(*)
+        unread_count = request.user.unread_notification_count
         
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -79,7 +105,21 @@ class NotificationViewSet(viewsets.ModelViewSet):
         })
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            notification = serializer.save(user=self.request.user)
+            if not notification.read:
+                adjust_unread_count(self.request.user.pk, 1)
+            transaction.on_commit(lambda: publish_notification(notification))
+    
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """Return just the unread notification count (cheap endpoint for polling)"""
+        return Response({'unread_count': request.user.unread_notification_count})
+    
+    @action(detail=False, methods=['post'], url_path='stream-ticket')
+    def stream_ticket(self, request):
+        """Short-lived ?ticket= for opening the SSE/WebSocket streams (see notifications/streams.py)"""
+        return Response({'ticket': issue_ticket(request.user), 'expires_in': get_ticket_max_age()})
     
     @action(detail=True, methods=['patch'], url_path='read')
     def mark_read(self, request, pk=None):
@@ -91,18 +131,23 @@ class NotificationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        with transaction.atomic():
+            # Only the request that actually flips the flag decrements the counter
+            updated = Notification.objects.filter(pk=notification.pk, read=False).update(read=True)
+            adjust_unread_count(request.user.pk, -updated)
         notification.read = True
-        notification.save()
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'], url_path='mark-all-read')
     def mark_all_read(self, request):
         """Mark all notifications as read for the current user"""
-        updated_count = Notification.objects.filter(
-            user=request.user,
-            read=False
-        ).update(read=True)
+        with transaction.atomic():
+            updated_count = Notification.objects.filter(
+                user=request.user,
+                read=False
+            ).update(read=True)
+            adjust_unread_count(request.user.pk, -updated_count)
         
         return Response({
             'message': f'Successfully marked {updated_count} notification(s) as read.',
@@ -117,5 +162,12 @@ class NotificationViewSet(viewsets.ModelViewSet):
                 {'detail': 'You do not have permission to perform this action.'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        self.perform_destroy(instance)
+        with transaction.atomic():
+            # Lock the row so a concurrent mark_read can't double-decrement
+            was_unread = Notification.objects.select_for_update().filter(
+                pk=instance.pk, read=False
+            ).exists()
+            self.perform_destroy(instance)
+            if was_unread:
+                adjust_unread_count(request.user.pk, -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import User
+from ratings.models import Rating
+from ratings.utils import AGGREGATE_FIELDS, aggregate_values, rating_totals
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user lender/borrower rating sums, counts and averages from the Rating table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        last_id = 0
+        updated = 0
+        while True:
+            with transaction.atomic():
+                users = list(
+                    User.objects.select_for_update()
+                    .filter(pk__gt=last_id)
+                    .order_by('pk')
+                    .only('pk', *AGGREGATE_FIELDS)[:options['batch_size']]
+                )
+                if not users:
+                    break
+                last_id = users[-1].pk
+
+                totals = {
+                    row['to_user']: row
+                    for row in rating_totals(Rating.objects.filter(to_user__in=users))
+                }
+                for user in users:
+                    for field, value in aggregate_values(totals.get(user.pk, {})).items():
+                        setattr(user, field, value)
+                User.objects.bulk_update(users, AGGREGATE_FIELDS)
+                updated += len(users)
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed rating aggregates for {updated} user(s).'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0005_filter_indexes'),
+        ('ratings', '0002_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['item', '-created_at'], name='rating_item_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['to_user', '-created_at'], name='rating_to_user_created_idx'),
+        ),
+    ]
@@ -4,6 +4,13 @@ from django.db import models
 from accounts.models import User
 from items.models import Item
 
+
+class RatingQuerySet(models.QuerySet):
+    def involving(self, user):
+        """Ratings ``user`` gave or received (same-table OR over the from_user/to_user indexes)."""
+        return self.filter(models.Q(from_user=user) | models.Q(to_user=user))
+
+
 class Rating(models.Model):
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ratings_given')
     to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ratings_received')
@@ -12,5 +19,15 @@ class Rating(models.Model):
     message = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = RatingQuerySet.as_manager()
+    
     class Meta:
-        unique_together = ['from_user', 'to_user', 'item']
\ No newline at end of file
+        unique_together = ['from_user', 'to_user', 'item']
+        indexes = [
+            # Backs keyset pagination of the rating list
+            models.Index(fields=['-created_at', '-id'], name='rating_created_id_idx'),
+            # /api/ratings/item/<id>/, newest first
+            models.Index(fields=['item', '-created_at'], name='rating_item_created_idx'),
+            # Ratings received (from_user is covered by unique_together)
+            models.Index(fields=['to_user', '-created_at'], name='rating_to_user_created_idx'),
+        ]
\ No newline at end of file
@@ -1,3 +1,136 @@
-from django.test import TestCase
+import io
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from items.models import Item
+from .models import Rating
+from .utils import AGGREGATE_FIELDS, apply_rating_changes, contribution
+
+
+class RatingListQueryCountTests(APITestCase):
+    """Rating lists must not load users or items per row."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='lender')
+        self.item = Item.objects.create(owner=self.user, title='Drill', description='desc')
+        self.client.force_authenticate(self.user)
+
+    def create_ratings(self, count):
+        for _ in range(count):
+            rater = User.objects.create(username=f'rater{Rating.objects.count()}')
+            Rating.objects.create(from_user=rater, to_user=self.user, item=self.item, stars=4)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_constant_queries(self, url):
+        self.create_ratings(2)
+        small_page = self.count_queries(url)
+        self.create_ratings(10)
+        large_page = self.count_queries(url)
+        self.assertEqual(small_page, large_page)
+
+    def test_list_query_count_is_constant(self):
+        self.assert_constant_queries('/api/ratings/')
+
+    def test_by_item_query_count_is_constant(self):
+        self.assert_constant_queries(f'/api/ratings/item/{self.item.id}/')
+
+
+class RatingAggregateTests(APITestCase):
+    """The running sums/counts on User must always equal a fresh recompute."""
+
+    def setUp(self):
+        self.lender = User.objects.create(username='lender')
+        self.borrower = User.objects.create(username='borrower')
+        self.other = User.objects.create(username='other')
+        self.item = Item.objects.create(owner=self.lender, title='Drill', description='desc')
+        self.other_item = Item.objects.create(owner=self.other, title='Saw', description='desc')
+        self.client.force_authenticate(self.borrower)
+
+    def aggregates(self):
+        return {
+            user.pk: {field: getattr(user, field) for field in AGGREGATE_FIELDS}
+            for user in User.objects.order_by('pk')
+        }
+
+    def assert_matches_recompute(self):
+        maintained = self.aggregates()
+        call_command('recompute_rating_aggregates', stdout=io.StringIO())
+        self.assertEqual(maintained, self.aggregates())
+
+    def rate(self, from_user, to_user, item, stars):
+        with transaction.atomic():
+            rating = Rating.objects.create(from_user=from_user, to_user=to_user, item=item, stars=stars)
+            apply_rating_changes(added=[contribution(rating)])
+        return rating
+
+    def test_create_adds_to_the_role_the_rating_belongs_to(self):
+        self.rate(self.borrower, self.lender, self.item, 4)
+        self.rate(self.other, self.lender, self.item, 5)
+        self.rate(self.lender, self.borrower, self.item, 3)
+        self.lender.refresh_from_db()
+        self.borrower.refresh_from_db()
+        self.assertEqual((self.lender.lender_rating_sum, self.lender.lender_rating_count), (9, 2))
+        self.assertEqual(self.lender.lender_rating, Decimal('4.50'))
+        self.assertEqual((self.borrower.borrower_rating_sum, self.borrower.borrower_rating_count), (3, 1))
+        self.assertEqual(self.borrower.lender_rating_count, 0)
+        self.assert_matches_recompute()
+
+    def test_changing_the_score_applies_the_difference(self):
+        rating = self.rate(self.borrower, self.lender, self.item, 2)
+        self.rate(self.other, self.lender, self.item, 5)
+        response = self.client.patch(f'/api/ratings/{rating.pk}/', {'stars': 4})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.lender.refresh_from_db()
+        self.assertEqual((self.lender.lender_rating_sum, self.lender.lender_rating_count), (9, 2))
+        self.assert_matches_recompute()
+
+    def test_changing_the_item_moves_the_rating_between_roles(self):
+        rating = self.rate(self.borrower, self.lender, self.item, 4)
+        response = self.client.patch(f'/api/ratings/{rating.pk}/', {'item': self.other_item.pk})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.lender.refresh_from_db()
+        self.assertEqual((self.lender.lender_rating_count, self.lender.borrower_rating_count), (0, 1))
+        self.assertEqual(self.lender.borrower_rating, Decimal('4.00'))
+        self.assert_matches_recompute()
+
+    def test_changing_the_rated_user_moves_the_rating(self):
+        rating = self.rate(self.borrower, self.lender, self.item, 4)
+        old = contribution(rating)
+        rating.to_user = self.other
+        rating.save()
+        apply_rating_changes(removed=[old], added=[contribution(rating)])
+        self.lender.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.lender.lender_rating_count, 0)
+        self.assertEqual(self.lender.lender_rating, Decimal('0.00'))
+        self.assertEqual((self.other.borrower_rating_sum, self.other.borrower_rating_count), (4, 1))
+        self.assert_matches_recompute()
+
+    def test_delete_removes_the_contribution(self):
+        rating = self.rate(self.borrower, self.lender, self.item, 1)
+        self.rate(self.other, self.lender, self.item, 4)
+        self.assertEqual(self.client.delete(f'/api/ratings/{rating.pk}/').status_code, 204)
+        self.lender.refresh_from_db()
+        self.assertEqual((self.lender.lender_rating_sum, self.lender.lender_rating_count), (4, 1))
+        self.assertEqual(self.lender.lender_rating, Decimal('4.00'))
+        self.assert_matches_recompute()
+
+    def test_recompute_repairs_drift(self):
+        self.rate(self.borrower, self.lender, self.item, 3)
+        self.rate(self.lender, self.borrower, self.item, 5)
+        expected = self.aggregates()
+        User.objects.update(lender_rating_sum=99, lender_rating_count=7, borrower_rating=Decimal('1.00'))
+        out = io.StringIO()
+        call_command('recompute_rating_aggregates', '--batch-size=1', stdout=out)
+        self.assertIn('3 user(s)', out.getvalue())
+        self.assertEqual(self.aggregates(), expected)
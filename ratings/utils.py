@@ -0,0 +1,105 @@
+"""
+Incremental maintenance of the rating aggregates stored on User.
+
+Each user keeps running sums and counts of the stars they received as a
+lender (rated on an item they own) and as a borrower, plus the derived
+averages in ``lender_rating``/``borrower_rating``. Every rating write
+applies its delta here, so reads never need an Avg() aggregate.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from accounts.models import User
+from items.caching import users_changed
+
+TWO_PLACES = Decimal('0.01')
+
+AGGREGATE_FIELDS = [
+    'lender_rating_sum', 'lender_rating_count', 'lender_rating',
+    'borrower_rating_sum', 'borrower_rating_count', 'borrower_rating',
+]
+
+
+def rating_role(rating):
+    """'lender' if the rated user owns the item, otherwise 'borrower'."""
+    return 'lender' if rating.item.owner_id == rating.to_user_id else 'borrower'
+
+
+def average(total, count):
+    if not count:
+        return Decimal('0.00')
+    return (Decimal(total) / count).quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+def contribution(rating):
+    """The (user id, role, stars) a rating adds to the aggregates."""
+    return rating.to_user_id, rating_role(rating), rating.stars
+
+
+def apply_rating_changes(removed=(), added=()):
+    """
+    Atomically remove and add rating contributions. Affected users are
+    locked in id order so concurrent writers can't deadlock or lose updates.
+    """
+    deltas = {}
+    for sign, contributions in ((-1, removed), (1, added)):
+        for user_id, role, stars in contributions:
+            key = (user_id, role)
+            total, count = deltas.get(key, (0, 0))
+            deltas[key] = (total + sign * stars, count + sign)
+
+    with transaction.atomic():
+        user_ids = sorted({user_id for user_id, _ in deltas})
+        users = {
+            user.pk: user
+            for user in User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk')
+        }
+        for (user_id, role), (total_delta, count_delta) in deltas.items():
+            user = users.get(user_id)
+            if user is None or not (total_delta or count_delta):
+                continue
+            total = max(getattr(user, f'{role}_rating_sum') + total_delta, 0)
+            count = max(getattr(user, f'{role}_rating_count') + count_delta, 0)
+            setattr(user, f'{role}_rating_sum', total)
+            setattr(user, f'{role}_rating_count', count)
+            setattr(user, f'{role}_rating', average(total, count))
+            User.objects.filter(pk=user_id).update(**{
+                f'{role}_rating_sum': total,
+                f'{role}_rating_count': count,
+                f'{role}_rating': getattr(user, f'{role}_rating'),
+            })
+        # Ratings are rendered wherever the user appears as an item owner
+        users_changed(*users)
+
+
+def rating_totals(ratings):
+    """
+    Per recipient lender/borrower sums and counts, in one grouped query.
+    Only uses fields that exist since ratings.0001, so migrations can pass
+    historical models.
+    """
+    as_lender = Q(item__owner=F('to_user'))
+    return (
+        ratings.order_by()
+        .values('to_user')
+        .annotate(
+            lender_sum=Sum('stars', filter=as_lender),
+            lender_count=Count('pk', filter=as_lender),
+            borrower_sum=Sum('stars', filter=~as_lender),
+            borrower_count=Count('pk', filter=~as_lender),
+        )
+    )
+
+
+def aggregate_values(row):
+    """The User aggregate field values for one ``rating_totals()`` row ({} for a user nobody rated)."""
+    values = {}
+    for role in ('lender', 'borrower'):
+        total = row.get(f'{role}_sum') or 0
+        count = row.get(f'{role}_count') or 0
+        values[f'{role}_rating_sum'] = total
+        values[f'{role}_rating_count'] = count
+        values[f'{role}_rating'] = average(total, count)
+    return values
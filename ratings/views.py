@@ -1,4 +1,5 @@
 from rest_framework import viewsets
+from django.db import transaction
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -6,8 +7,10 @@ from .models import Rating
 from items.models import Item
 from rest_framework import serializers
 from notifications.utils import create_notification
+from .utils import apply_rating_changes, contribution
+from sharelib.serializers import FlexFieldsMixin
 
-class RatingSerializer(serializers.ModelSerializer):
+class RatingSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     from_user = serializers.StringRelatedField(read_only=True)
     to_user = serializers.StringRelatedField(read_only=True)
     rating_type = serializers.SerializerMethodField()
@@ -17,13 +20,19 @@ class RatingSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['from_user', 'created_at', 'rating_type']
     
+    expandable_fields = {
+        'from_user': ('from_user', None),
+        'to_user': ('to_user', None),
+    }
+    related_fields = {'rating_type': 'item'}
+    
     def get_rating_type(self, obj):
         """
         Derive rating_type from item ownership.
         If to_user owns the item, it's a lender rating.
         Otherwise, it's a borrower rating.
         """
-        if obj.item.owner == obj.to_user:
+        if obj.item.owner_id == obj.to_user_id:
             return 'lender'
         return 'borrower'
 
@@ -31,6 +40,7 @@ class RatingViewSet(viewsets.ModelViewSet):
     queryset = Rating.objects.none()  # For schema generation
     serializer_class = RatingSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-created_at', '-id')  # ?pagination=cursor
     
     def get_queryset(self):
         # Skip queryset evaluation during schema generation
@@ -39,14 +49,13 @@ class RatingViewSet(viewsets.ModelViewSet):
         
         # Users can see ratings they gave and ratings they received
         user = self.request.user
-        return Rating.objects.filter(
-            from_user=user
-        ) | Rating.objects.filter(
-            to_user=user
-        )
+        queryset = Rating.objects.involving(user)
+        return RatingSerializer.select_related(queryset, self.request)
     
+    @transaction.atomic
     def perform_create(self, serializer):
         rating = serializer.save(from_user=self.request.user)
+        apply_rating_changes(added=[contribution(rating)])
         
         # Create notification for the user who received the rating
         if rating.to_user != self.request.user:  # Don't notify if rating yourself
@@ -64,6 +73,20 @@ class RatingViewSet(viewsets.ModelViewSet):
                 }
             )
     
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old = contribution(serializer.instance)
+        rating = serializer.save()
+        new = contribution(rating)
+        if new != old:
+            apply_rating_changes(removed=[old], added=[new])
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        removed = contribution(instance)
+        instance.delete()
+        apply_rating_changes(removed=[removed])
+    
     @action(detail=False, methods=['get'], url_path='item/(?P<item_id>[^/.]+)', permission_classes=[AllowAny])
     def by_item(self, request, item_id=None):
         """
@@ -78,6 +101,8 @@ class RatingViewSet(viewsets.ModelViewSet):
                 status=404
             )
         
-        ratings = Rating.objects.filter(item=item).order_by('-created_at')
+        ratings = Rating.objects.filter(item=item).select_related(
+            'from_user', 'to_user', 'item'
+        ).order_by('-created_at')
         serializer = self.get_serializer(ratings, many=True)
         return Response(serializer.data)
@@ -0,0 +1,7 @@
+try:
+    # Celery is optional; only needed for the 'celery' outbox driver
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
+
+__all__ = ('celery_app',)
@@ -2,6 +2,8 @@
 ASGI config for sharelib project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP (including the notification SSE stream) is handled by Django; the
+notification WebSocket endpoint is routed here directly.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sharelib.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from notifications.streams import websocket_application  # noqa: E402
+
+WEBSOCKET_ROUTES = {
+    '/ws/notifications/': websocket_application,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        handler = WEBSOCKET_ROUTES.get(scope['path'])
+        if handler is None:
+            await receive()  # websocket.connect
+            await send({'type': 'websocket.close', 'code': 4404})
+            return
+        return await handler(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,82 @@
+"""
+Versioned cache namespaces.
+
+Cached values derived from many rows (facet counts, rendered responses)
+are stored under keys that embed their namespace's current version. Writes
+call ``bump()`` to move the namespace to a new version, which orphans every
+entry built from the old data at once; the orphans simply expire.
+
+Versions are nanosecond timestamps of the namespace's last change (or of
+when it was first used), always moving forward: a version key lost to
+eviction comes back larger than any version still embedded in live entries,
+and ``changed_at()`` can turn versions into Last-Modified times.
+
+Versions live in the default cache, which must be shared by every worker
+(e.g. Redis) for a bump in one process to be seen by the others; see the
+sharelib.W001 system check.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version_key(namespace):
+    return f'cache-version:{namespace}'
+
+
+def get_version(namespace):
+    key = version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(namespaces):
+    """Current versions of many namespaces, as {namespace: version}, in one round trip when all are set."""
+    keys = {version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for namespace in set(keys.values()) - set(versions):
+        versions[namespace] = get_version(namespace)
+    return versions
+
+
+def changed_at(version):
+    """When a namespace last changed (at the latest), from its version."""
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def _bump(namespaces):
+    now = time.time_ns()
+    keys = [version_key(namespace) for namespace in namespaces]
+    current = cache.get_many(keys)
+    # Concurrent bumps may both write, but either value is past the one they read
+    cache.set_many({key: max(now, current.get(key, 0) + 1) for key in keys}, timeout=None)
+
+
+def bump(*namespaces):
+    """Invalidate everything cached in ``namespaces``, now and again once the current transaction commits."""
+    _bump(namespaces)
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def normalize_params(query_params, ignore=()):
+    """Stable string for a QueryDict: sorted keys and values, ``ignore``d keys and blanks dropped."""
+    return '&'.join(
+        f'{key}={value}'
+        for key in sorted(query_params)
+        if key not in ignore
+        for value in sorted(query_params.getlist(key))
+        if value != ''
+    )
+
+
+def make_key(namespace, *parts):
+    """Cache key for ``parts`` under the current version of ``namespace``."""
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'{namespace}:{get_version(namespace)}:{digest}'
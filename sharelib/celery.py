@@ -0,0 +1,14 @@
+"""
+Celery application for optional background processing.
+
+Start a worker with: celery -A sharelib worker
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sharelib.settings')
+
+app = Celery('sharelib')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
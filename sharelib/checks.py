@@ -0,0 +1,29 @@
+"""
+System checks for the sharelib plumbing (registered by items.apps).
+"""
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries only the current process can see
+PROCESS_LOCAL_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Cache namespace versions (sharelib.cache) live in the default cache:
+    ETags, the response cache and facet/stats invalidations are only
+    correct if every worker sees the same versions.
+    """
+    if settings.DEBUG:
+        return []
+    backend = settings.CACHES.get(DEFAULT_CACHE_ALIAS, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'The default cache is local to each process, so writes handled by one worker '
+        'do not invalidate ETags or cached responses in the others.',
+        hint='Set CACHE_BACKEND to a shared cache, e.g. django.core.cache.backends.redis.RedisCache.',
+        id='sharelib.W001',
+    )]
@@ -0,0 +1,200 @@
+"""
+Compact serialization of list pages straight from ``values()`` rows.
+
+List endpoints normally load full model instances (plus the joined owners,
+categories, ...) and run every serializer field on every one of them. For
+GET lists ``CompactListMixin`` instead compiles the view's serializer, as
+``?fields=``/``?expand=`` have pruned it, into a single ``values()`` query
+over the columns and joins it renders, and builds the same dicts from the
+rows in one pass. File URLs are made by appending storage names to the
+media base URL, made absolute once per request.
+
+Compilation walks the serializer's readable fields:
+
+- model fields read their column; plain values (strings, numbers, booleans,
+  JSON) are used as they come, anything else (datetimes, decimals) goes
+  through the field's own ``to_representation()``;
+- file and image fields become (absolute) storage URLs;
+- nested serializers, and the ids of collapsed ``?expand=`` fields, read
+  through the relation's join;
+- method fields need a hook on the serializer: ``compact_fields`` maps one
+  to the columns ``compact_<name>(media, *values)`` computes it from, and
+  ``compact_relations`` maps one that renders a hand-built serializer to its
+  relation, with ``compact_<name>()`` returning that serializer.
+
+Anything else (method fields without hooks, dotted sources, ``many=True``)
+raises ``Unsupported`` and the view renders the page with the serializer as
+before. The output is the serializer's, byte for byte.
+"""
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+
+# Fields whose to_representation() returns database values unchanged
+PLAIN_FIELDS = {
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.EmailField,
+    serializers.IntegerField, serializers.ReadOnlyField, serializers.SlugField, serializers.URLField,
+}
+
+
+class Unsupported(Exception):
+    """The serializer has a field compact serialization can't render."""
+
+
+class MediaURLs:
+    """
+    ``storage.url(name)``, made absolute when there's a request, as file
+    fields render. For file system storage the base URL is resolved once
+    and names are appended to it.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.prefixes = {}
+
+    def url(self, name, storage=default_storage):
+        try:
+            prefix = self.prefixes[storage]
+        except KeyError:
+            prefix = self.prefixes[storage] = self.get_prefix(storage)
+        path = filepath_to_uri(name).lstrip('/')
+        # urljoin() would resolve './' and '../' segments
+        if prefix is None or '/.' in f'/{path}':
+            url = storage.url(name)
+            return self.request.build_absolute_uri(url) if self.request else url
+        return prefix + path
+
+    def get_prefix(self, storage):
+        if not isinstance(storage, FileSystemStorage):
+            return None
+        return self.request.build_absolute_uri(storage.base_url) if self.request else storage.base_url
+
+
+class CompactSerializer:
+    """
+    A serializer compiled to the ``values()`` columns it reads and a row
+    builder; ``serialize(rows)`` returns what ``serializer.data`` would for
+    the matching instances.
+    """
+
+    def __init__(self, serializer):
+        self.columns = {}
+        self.media = {}
+        self.build = self.compile(serializer, '')
+
+    def values(self, queryset, *extra):
+        """``queryset.values()`` with the compiled columns plus ``extra`` ones."""
+        query = queryset.query
+        # Keep extra selects and annotations (e.g. search_rank) the ordering may use
+        names = [*self.columns, *extra, *query.extra, *query.annotations]
+        return queryset.values(*dict.fromkeys(names))
+
+    def serialize(self, rows):
+        # Reported in Server-Timing and /metrics like serializer output
+        with timed('serialize'):
+            build = self.build
+            return [build(row) for row in rows]
+
+    def column(self, path):
+        self.columns[path] = None
+        return path
+
+    def get_media(self, serializer):
+        request = serializer.context.get('request')
+        if id(request) not in self.media:
+            self.media[id(request)] = MediaURLs(request)
+        return self.media[id(request)]
+
+    def compile(self, serializer, prefix):
+        if not isinstance(serializer, serializers.ModelSerializer):
+            raise Unsupported(type(serializer).__name__)
+        model = serializer.Meta.model
+        getters = [
+            (name, self.compile_field(serializer, model, name, field, prefix))
+            for name, field in serializer.fields.items()
+            if not field.write_only
+        ]
+
+        def build(row):
+            return {name: get(row) for name, get in getters}
+        return build
+
+    def compile_relation(self, serializer, path):
+        key = self.column(path)  # The foreign key, None without a related row
+        build = self.compile(serializer, f'{path}__')
+        return lambda row: None if row[key] is None else build(row)
+
+    def compile_field(self, serializer, model, name, field, prefix):
+        if isinstance(field, serializers.SerializerMethodField):
+            relations = getattr(serializer, 'compact_relations', {})
+            hooks = getattr(serializer, 'compact_fields', {})
+            if name in relations:
+                nested = getattr(serializer, f'compact_{name}')()
+                return self.compile_relation(nested, f'{prefix}{relations[name]}')
+            if name in hooks:
+                hook = getattr(serializer, f'compact_{name}')
+                media = self.get_media(serializer)
+                keys = [self.column(f'{prefix}{column}') for column in hooks[name]]
+                return lambda row: hook(media, *[row[key] for key in keys])
+            raise Unsupported(name)
+        if len(field.source_attrs) != 1:
+            raise Unsupported(name)
+        if isinstance(field, serializers.BaseSerializer):
+            if isinstance(field, serializers.ListSerializer):
+                raise Unsupported(name)
+            return self.compile_relation(field, f'{prefix}{field.source}')
+
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise Unsupported(name)
+        if not model_field.concrete or model_field.many_to_many:
+            raise Unsupported(name)
+        key = self.column(f'{prefix}{field.source}')
+        if model_field.is_relation:
+            # values() gives the related pk, which is what the field renders
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                return itemgetter(key)
+            raise Unsupported(name)
+        if type(field) in PLAIN_FIELDS or (type(field) is serializers.JSONField and not field.binary):
+            return itemgetter(key)
+        if isinstance(field, serializers.FileField):
+            if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                return lambda row: row[key] or None
+            media, storage = self.get_media(serializer), model_field.storage
+            return lambda row: media.url(row[key], storage) if row[key] else None
+        if isinstance(field, (serializers.ModelField, serializers.RelatedField, serializers.HiddenField)):
+            raise Unsupported(name)
+        convert = field.to_representation
+        return lambda row: None if row[key] is None else convert(row[key])
+
+
+class CompactListMixin:
+    """
+    Render ``list`` with ``CompactSerializer`` when the view's serializer
+    compiles (see the module docstring) and ``COMPACT_LISTS`` is on.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.COMPACT_LISTS:
+            return super().list(request, *args, **kwargs)
+        try:
+            compact = CompactSerializer(self.get_serializer())
+        except Unsupported:
+            return super().list(request, *args, **kwargs)
+
+        # Keyset pagination reads its cursor position from the rows
+        ordering = [name.lstrip('-') for name in getattr(self, 'keyset_ordering', ())]
+        rows = compact.values(self.filter_queryset(self.get_queryset()), *ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compact.serialize(page))
+        return Response(compact.serialize(rows))
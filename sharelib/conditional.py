@@ -0,0 +1,77 @@
+"""
+Conditional GET support (ETag / Last-Modified) for API views.
+
+Views using ``ConditionalGetMixin`` implement ``get_validators()``, which
+returns what the response depends on -- a row's ``updated_at``, a
+``Max('created_at')`` aggregate, cache namespace versions (sharelib.cache)
+-- without loading or serializing the objects themselves. After
+authentication and content negotiation the mixin derives an ETag (and
+optionally a Last-Modified time) from them and answers ``If-None-Match`` /
+``If-Modified-Since`` with 304 Not Modified before the handler runs.
+"""
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import normalize_params
+
+
+class Validators:
+    """
+    ``parts`` determine the ETag (with the query string and format mixed in);
+    ``last_modified`` is an aware datetime, or None when no single timestamp
+    covers every change to the response.
+    """
+
+    def __init__(self, *parts, last_modified=None):
+        self.parts = parts
+        self.last_modified = last_modified
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    conditional_validators = None
+
+    def get_validators(self, request, *args, **kwargs):
+        """Validators for this GET, or None to always send the full response (e.g. when it will 404)."""
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_validators = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return
+        digest = hashlib.sha256(repr((
+            validators.parts, normalize_params(request.query_params), request.accepted_renderer.format,
+        )).encode()).hexdigest()
+        self.conditional_validators = (
+            quote_etag(digest[:32]),
+            timegm(validators.last_modified.utctimetuple()) if validators.last_modified else None,
+        )
+        etag, last_modified = self.conditional_validators
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.conditional_validators and response.status_code in (200, 304):
+            etag, last_modified = self.conditional_validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
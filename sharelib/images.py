@@ -0,0 +1,228 @@
+"""
+Image derivative pipeline.
+
+Uploads are stored at full resolution as before. Once the upload's
+transaction commits, a local worker thread renders resized WebP and JPEG
+variants next to the original (``items/drill.jpg`` ->
+``items/drill.card.webp``, ``items/drill.card.jpg``) and records their
+storage names on a JSON column of the model (e.g. ``Item.photo_variants``).
+
+Serializers call ``variant_urls()`` to expose a size-keyed URL map; until the
+variants exist it points every size at the original file.
+
+Recording variants is a queryset ``update()``, so it also refreshes the
+model's ``auto_now`` fields and sends ``variants_recorded`` (sender: the
+model, ``pk``) for cache invalidation, as no ``post_save`` fires.
+
+Variants belong to the image they were rendered from: replacing or clearing
+the image, or deleting the instance, deletes them from storage once the
+transaction commits, and variants rendered for an image that was replaced
+mid-render are deleted instead of recorded.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {'thumbnail': 200, 'card': 600, 'full': 1600}
+
+# format key -> (file extension, Pillow format, save options)
+FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# (model label, image field, variants field) triples handled by the pipeline
+registry = []
+
+# Sent with ``sender=<model>, pk=<pk>`` once an instance's variants are recorded
+variants_recorded = Signal()
+
+_executor = None
+
+
+def get_sizes():
+    return getattr(settings, 'IMAGE_VARIANT_SIZES', DEFAULT_SIZES)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def variant_name(name, size, fmt):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{size}.{FORMATS[fmt][0]}'
+
+
+def render_variants(field_file):
+    """Render every size/format of an image file and return the stored names."""
+    from PIL import Image, ImageOps
+
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    variants = {'source': field_file.name}
+    for size, max_px in get_sizes().items():
+        resized = image.copy()
+        resized.thumbnail((max_px, max_px), Image.LANCZOS)  # never upscales
+        variants[size] = {}
+        for fmt, (_, pil_format, options) in FORMATS.items():
+            frame = resized
+            if pil_format == 'JPEG' and frame.mode not in ('RGB', 'L'):
+                frame = frame.convert('RGB')
+            buffer = BytesIO()
+            frame.save(buffer, pil_format, **options)
+            name = variant_name(field_file.name, size, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            variants[size][fmt] = storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def process_image(model_label, pk, field_name, variants_field):
+    """Worker entry point: render variants for one instance and record them."""
+    model = apps.get_model(model_label)
+    try:
+        instance = model.objects.get(pk=pk)
+        field_file = getattr(instance, field_name)
+        if not field_file:
+            return
+        variants = render_variants(field_file)
+        now = timezone.now()
+        touched = {field.name: now for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)}
+        # Only record them if the image wasn't replaced while we were working
+        recorded = model.objects.filter(pk=pk, **{field_name: field_file.name}).update(
+            **{variants_field: variants}, **touched
+        )
+        if recorded:
+            variants_recorded.send(sender=model, pk=pk)
+        else:
+            delete_files(field_file.storage, variant_files(variants))
+    except model.DoesNotExist:
+        pass
+    except Exception:
+        logger.exception('Failed to generate image variants for %s #%s', model_label, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule(instance, field_name, variants_field):
+    """Queue variant generation for after the current transaction commits."""
+    args = (instance._meta.label, instance.pk, field_name, variants_field)
+
+    def submit():
+        if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+            get_executor().submit(process_image, *args)
+        else:
+            process_image(*args)
+
+    transaction.on_commit(submit)
+
+
+def needs_variants(instance, field_name, variants_field):
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    return bool(field_file) and variants.get('source') != field_file.name
+
+
+def variant_files(variants):
+    """Storage names of the rendered files recorded in a variants dict."""
+    return [
+        name
+        for size, names in (variants or {}).items() if size != 'source'
+        for name in names.values()
+    ]
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception('Failed to delete image variant %s', name)
+
+
+def delete_stale_variants(instance, field_name, variants_field):
+    """Once the transaction commits, delete variants that weren't rendered from the current image."""
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    if variants.get('source') == (field_file.name if field_file else None):
+        return
+    stale = variant_files(variants)
+    if stale:
+        storage = field_file.storage
+        transaction.on_commit(lambda: delete_files(storage, stale))
+    if variants:
+        setattr(instance, variants_field, {})
+        type(instance).objects.filter(pk=instance.pk).update(**{variants_field: {}})
+
+
+def register(model, field_name, variants_field):
+    """Generate variants whenever ``model.<field_name>`` gets a new image."""
+    entry = (model._meta.label, field_name, variants_field)
+    if entry not in registry:
+        registry.append(entry)
+
+    def queue_variants(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        delete_stale_variants(instance, field_name, variants_field)
+        if needs_variants(instance, field_name, variants_field):
+            schedule(instance, field_name, variants_field)
+
+    def delete_variants(sender, instance, **kwargs):
+        stale = variant_files(getattr(instance, variants_field))
+        if stale:
+            storage = getattr(instance, field_name).storage
+            transaction.on_commit(lambda: delete_files(storage, stale))
+
+    dispatch_uid = f'image-variants-{model._meta.label}-{field_name}'
+    post_save.connect(queue_variants, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    post_delete.connect(delete_variants, sender=model, weak=False, dispatch_uid=dispatch_uid)
+
+
+def variant_urls(field_file, variants, request=None):
+    """
+    Return ``{size: {'webp': url, 'jpeg': url}}`` for an image field.
+    Sizes that haven't been generated yet fall back to the original URL.
+    """
+    if not field_file:
+        return {}
+
+    storage = field_file.storage
+
+    def url(name):
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+    return build_variant_urls(field_file.name, variants, url)
+
+
+def build_variant_urls(name, variants, url):
+    """``variant_urls()`` for a stored file ``name``, with ``url(name)`` making its URLs."""
+    variants = variants or {}
+    ready = variants.get('source') == name
+    original = url(name)
+    urls = {}
+    for size in get_sizes():
+        names = variants.get(size, {}) if ready else {}
+        urls[size] = {fmt: url(names[fmt]) if fmt in names else original for fmt in FORMATS}
+    return urls
@@ -0,0 +1,296 @@
+"""
+Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` wraps every database connection's cursor
+(``connection.execute_wrapper``) for the duration of a request and records
+the query count, time spent in SQL, time spent serializing
+(``timed('serialize')``, called by ``FlexFieldsMixin``) and total time. It
+reports them to the client in a ``Server-Timing`` header:
+
+    Server-Timing: db;dur=12.4;desc="7 queries", serialize;dur=3.1, total;dur=21.9
+
+and aggregates them into per-route histograms, labelled with the URL name
+and method. ``GET /metrics`` serves the histograms, request and slow-query
+counters and the response cache hit/miss counts (sharelib.response_cache)
+in the Prometheus text format. Histograms are kept per process, as with any
+Prometheus client; scrape every worker. ``/metrics`` is only served with
+``INSTRUMENTATION['METRICS_TOKEN']`` as a bearer token, or to anyone while
+DEBUG is on and no token is set.
+
+Queries slower than ``INSTRUMENTATION['SLOW_QUERY_MS']`` are logged to the
+``sharelib.instrumentation`` logger with the view name and SQL.
+
+The middleware is sync and async capable, so under ASGI async views (the
+notification SSE stream) are not adapted onto a thread. For streaming
+responses the timings cover the view up to the first byte.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SLOW_QUERY_MS': 200,
+    # Upper bounds in seconds (durations) and queries per request
+    'DURATION_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'QUERY_BUCKETS': (0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+    # /metrics requires "Authorization: Bearer <token>"; without a token it's only served in DEBUG
+    'METRICS_TOKEN': '',
+}
+
+# (metric name, help, bucket setting)
+HISTOGRAMS = [
+    ('sharelib_request_duration_seconds', 'Total time spent handling the request.', 'DURATION_BUCKETS'),
+    ('sharelib_request_db_seconds', 'Time spent executing SQL per request.', 'DURATION_BUCKETS'),
+    ('sharelib_request_serialize_seconds', 'Time spent in API serializers per request.', 'DURATION_BUCKETS'),
+    ('sharelib_request_queries', 'SQL queries executed per request.', 'QUERY_BUCKETS'),
+]
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'INSTRUMENTATION', {})}
+
+
+class RequestMetrics:
+    def __init__(self, slow_query_ms):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.view_name = None
+        self.queries = 0
+        self.slow_queries = 0
+        self.db = 0.0
+        self.timings = {'serialize': 0.0}
+        self.active = set()
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db += elapsed
+            if elapsed >= self.slow_query_seconds:
+                self.slow_queries += 1
+                logger.warning(
+                    'Slow query (%.1f ms) in %s: %s', elapsed * 1000, self.view_name or 'unknown view', sql
+                )
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name`` timing (outermost block only)."""
+    metrics = _current.get()
+    if metrics is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] = metrics.timings.get(name, 0.0) + time.perf_counter() - start
+        metrics.active.discard(name)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Process-wide histograms keyed by (route, method), plus counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.histograms = {}
+        self.requests = {}
+        self.slow_queries = {}
+
+    def observe(self, route, method, status, metrics, total):
+        config = get_config()
+        values = {
+            'sharelib_request_duration_seconds': total,
+            'sharelib_request_db_seconds': metrics.db,
+            'sharelib_request_serialize_seconds': metrics.timings['serialize'],
+            'sharelib_request_queries': metrics.queries,
+        }
+        with self.lock:
+            for name, _, bucket_setting in HISTOGRAMS:
+                key = (name, route, method)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(config[bucket_setting])
+                self.histograms[key].observe(values[name])
+            request_key = (route, method, str(status))
+            self.requests[request_key] = self.requests.get(request_key, 0) + 1
+            if metrics.slow_queries:
+                self.slow_queries[route] = self.slow_queries.get(route, 0) + metrics.slow_queries
+
+    def snapshot(self):
+        with self.lock:
+            return (
+                {key: (histogram.buckets, list(histogram.counts), histogram.sum)
+                 for key, histogram in self.histograms.items()},
+                dict(self.requests),
+                dict(self.slow_queries),
+            )
+
+
+registry = Registry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+def server_timing(metrics, total):
+    entries = [f'db;dur={metrics.db * 1000:.1f};desc="{metrics.queries} queries"']
+    entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in metrics.timings.items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+@contextmanager
+def measure(metrics):
+    """Record the queries and timings of the block in ``metrics``."""
+    token = _current.set(metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.execute))
+            yield
+    finally:
+        _current.reset(token)
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        metrics = RequestMetrics(config['SLOW_QUERY_MS'])
+        start = time.perf_counter()
+        with measure(metrics):
+            response = self.get_response(request)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics(config['SLOW_QUERY_MS'])
+        start = time.perf_counter()
+        with measure(metrics):
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics, start)
+
+    def finish(self, request, response, metrics, start):
+        total = time.perf_counter() - start
+        response['Server-Timing'] = server_timing(metrics, total)
+        registry.observe(route_name(request), request.method, response.status_code, metrics, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_name = route_name(request)
+
+
+def format_labels(**labels):
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    from .response_cache import get_metrics as get_response_cache_metrics
+
+    histograms, requests, slow_queries = registry.snapshot()
+    lines = []
+    for name, help_text, _ in HISTOGRAMS:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (metric, route, method), (buckets, counts, total) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), counts):
+                cumulative += count
+                le = bound if bound == '+Inf' else format_number(bound)
+                lines.append(f'{name}_bucket{format_labels(route=route, method=method, le=le)} {cumulative}')
+            labels = format_labels(route=route, method=method)
+            lines.append(f'{name}_sum{labels} {format_number(total)}')
+            lines.append(f'{name}_count{labels} {cumulative}')
+
+    lines += ['# HELP sharelib_requests_total Requests handled.', '# TYPE sharelib_requests_total counter']
+    for (route, method, status), count in sorted(requests.items()):
+        lines.append(f'sharelib_requests_total{format_labels(route=route, method=method, status=status)} {count}')
+
+    lines += [
+        '# HELP sharelib_slow_queries_total Queries slower than the slow query threshold.',
+        '# TYPE sharelib_slow_queries_total counter',
+    ]
+    for route, count in sorted(slow_queries.items()):
+        lines.append(f'sharelib_slow_queries_total{format_labels(route=route)} {count}')
+
+    lines += [
+        '# HELP sharelib_response_cache_total Response cache lookups by outcome.',
+        '# TYPE sharelib_response_cache_total counter',
+    ]
+    for view_name, counts in get_response_cache_metrics().items():
+        for outcome, count in counts.items():
+            lines.append(f'sharelib_response_cache_total{format_labels(view=view_name, outcome=outcome)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """GET /metrics (Prometheus scrape target)."""
+    expected = get_config()['METRICS_TOKEN']
+    if expected:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {expected}'):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        # Routes, traffic and slow query counts aren't for the public
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,214 @@
+"""
+Pagination classes shared by the API.
+
+StandardPagination keeps the existing page-number behaviour, but views that
+declare a ``keyset_ordering`` (e.g. ``('-created_at', '-id')``) can opt in
+to keyset pagination per request with ``?pagination=cursor`` or by passing
+a ``?cursor=`` token. Keyset pages seek straight to the cursor position via
+the composite index instead of using OFFSET, and skip the COUNT(*) query.
+
+Keyset pages always follow ``keyset_ordering``, so combining them with
+``?ordering=`` or a relevance-ranked ``?search=`` is rejected with a 400
+rather than silently reordering the results. Malformed cursors are a 400 too.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite, unique ordering such as (created_at, id).
+    The ordering is taken from the view's ``keyset_ordering`` attribute.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.check_ordering(request, view)
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = [
+            (name.lstrip('-'), name.startswith('-')) for name in view.keyset_ordering
+        ]
+        self.fields = [queryset.model._meta.get_field(name) for name, _ in self.ordering]
+
+        position, reverse = self.decode_cursor(request)
+
+        # Walking backwards: flip the ordering, then restore it on the page
+        order_by = [
+            ('-' if descending != reverse else '') + name
+            for name, descending in self.ordering
+        ]
+        queryset = queryset.order_by(*order_by)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return rows
+
+    def check_ordering(self, request, view):
+        """Refuse parameters that would reorder the page away from ``keyset_ordering``."""
+        conflicts = []
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, filters.OrderingFilter):
+                conflicts.append(backend.ordering_param)
+            elif issubclass(backend, filters.SearchFilter):
+                conflicts.append(backend.search_param)
+        given = [param for param in conflicts if request.query_params.get(param)]
+        if given:
+            ordering = ','.join(view.keyset_ordering)
+            raise ValidationError({
+                param: f'Not supported with keyset pagination, which is ordered by {ordering}.'
+                for param in given
+            })
+
+    def seek_filter(self, position, reverse):
+        """(a, b) > (x, y) expanded as: a > x OR (a = x AND b > y), honouring direction."""
+        condition = Q()
+        for index, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            clause = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_index in range(index):
+                clause &= Q(**{self.ordering[prev_index][0]: position[prev_index]})
+            condition |= clause
+        return condition
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_position(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self.ordering]
+        return [getattr(row, field.attname) for field in self.fields]
+
+    def encode_cursor(self, row, reverse):
+        # isoformat() keeps full microsecond precision for datetimes
+        position = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in self.get_position(row)
+        ]
+        token = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(token.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            token = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position = [field.to_python(value) for field, value in zip(self.fields, token['p'])]
+            # None can't be compared against in the seek filter
+            if len(position) != len(self.fields) or None in position:
+                raise ValueError
+            return position, bool(token.get('r'))
+        except Exception:
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class StandardPagination(PageNumberPagination):
+    """
+    Default page-number pagination with opt-in keyset pagination for views
+    that declare ``keyset_ordering``.
+    """
+    keyset_class = KeysetPagination
+    keyset = None
+    mode_query_param = 'pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if getattr(view, 'keyset_ordering', None) and self.wants_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def wants_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_previous_link()
+        return super().get_previous_link()
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        if getattr(view, 'keyset_ordering', None):
+            parameters += [
+                {
+                    'name': self.mode_query_param,
+                    'required': False,
+                    'in': 'query',
+                    'description': "Set to 'cursor' to use keyset pagination (no total count).",
+                    'schema': {'type': 'string', 'enum': ['cursor']},
+                },
+                {
+                    'name': self.keyset_class.cursor_query_param,
+                    'required': False,
+                    'in': 'query',
+                    'description': 'Cursor token from a previous next/previous link.',
+                    'schema': {'type': 'string'},
+                },
+            ]
+        return parameters
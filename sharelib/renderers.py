@@ -0,0 +1,115 @@
+"""
+Fast JSON renderer and parser for DRF, backed by orjson when it's installed.
+
+``FastJSONRenderer`` produces the same bytes as DRF's ``JSONRenderer`` for
+API data (compact separators, UTF-8, ``Z`` for UTC datetimes, Decimals as
+numbers, U+2028/U+2029 escaped); orjson encodes dicts, lists, strings,
+numbers, datetimes and UUIDs natively and hands everything else (Decimal,
+lazy strings, querysets, ...) to DRF's ``JSONEncoder``. It falls back to
+``JSONRenderer`` for indented output (``Accept: application/json;
+indent=4``, the browsable API), non-default ``UNICODE_JSON`` /
+``COMPACT_JSON`` settings, values orjson can't encode (integers beyond
+64 bits, non-finite numbers from the encoder such as ``Decimal('NaN')``),
+and when orjson is missing. ``FastJSONParser`` likewise falls back to
+``JSONParser`` for non-UTF-8 bodies or without orjson.
+
+Non-finite numbers the encoder turns into floats therefore fail under
+``STRICT_JSON`` as they do with ``JSONRenderer``. Float values already in
+the data are written by orjson, which spells NaN and Infinity as null
+rather than raising. API data can't hold them (both parsers reject them,
+JSON columns can't store them and computed floats such as ratings come
+from DecimalFields), so responses are only walked for them with DEBUG on.
+A view that starts producing them then fails in development as it would
+with ``JSONRenderer``.
+
+Known difference: floats in exponent form are spelled ``1e16`` rather than
+``1e+16``.
+"""
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # Optional accelerator
+    orjson = None
+
+# Escaped by JSONRenderer so output stays a strict JavaScript subset
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+encode = encoders.JSONEncoder().default
+
+
+def default(obj):
+    """DRF's encoding for types orjson doesn't know, raising for non-finite results such as Decimal('NaN')."""
+    # Decimals (ratings, prices) are the commonest; DRF's encoder checks them after six other types
+    value = float(obj) if isinstance(obj, Decimal) else encode(obj)
+    if isinstance(value, float) and not math.isfinite(value):
+        raise TypeError('Out of range float values are not JSON compliant')
+    return value
+
+
+def has_non_finite(data):
+    """Whether ``data`` holds a NaN or infinite float anywhere."""
+    pending = [data]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, float) and not math.isfinite(value):
+            return True
+    return False
+
+
+def dumps(data):
+    """Compact UTF-8 JSON for ``data``, as JSONRenderer would render it; raises TypeError if it can't."""
+    if orjson is None:
+        return renderers.JSONRenderer().render(data)
+    try:
+        content = orjson.dumps(data, default=default, option=OPTIONS)
+    except orjson.JSONEncodeError as exc:
+        raise TypeError(str(exc)) from exc
+    if settings.DEBUG and has_non_finite(data):
+        raise TypeError('Out of range float values are not JSON compliant')
+    for raw, escaped in LINE_SEPARATORS:
+        if raw in content:
+            content = content.replace(raw, escaped)
+    return content
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = get_encoding(parser_context or {})
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,126 @@
+"""
+Response cache for anonymous, read-only API views.
+
+``CachedResponseMixin`` caches the serialized data of anonymous GET list
+and retrieve responses, keyed on the URL (scheme, host, path and
+normalized query parameters) and the negotiated format. Each entry records
+the versions of the cache namespaces it was built from (see sharelib.cache):
+the view's own ``get_cache_namespaces()`` plus whatever the data embeds,
+from ``response_dependencies()``. An entry is only served while all of them
+are unchanged, so a write invalidates exactly the entries that show it.
+
+Entries live in the cache alias named by ``settings.RESPONSE_CACHE['ALIAS']``
+(local memory, file or Redis, chosen with RESPONSE_CACHE_BACKEND). Hits and
+misses are counted per view in the default cache (``get_metrics()``,
+``manage.py response_cache_stats``) and flagged with an ``X-Cache`` header.
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+from rest_framework.response import Response
+
+from .cache import get_versions, make_key, normalize_params
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+NAMESPACE = 'responses'
+
+# Names of every view using the mixin, for reporting
+cached_views = set()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def get_store():
+    return caches[get_config()['ALIAS']]
+
+
+def metric_key(view_name, outcome):
+    return f'response-cache:{outcome}:{view_name}'
+
+
+def record(view_name, outcome):
+    key = metric_key(view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_metrics():
+    """{view name: {'hits': n, 'misses': n}} since the counters were last cleared."""
+    keys = {
+        metric_key(view_name, outcome): (view_name, outcome)
+        for view_name in cached_views
+        for outcome in ('hits', 'misses')
+    }
+    counts = cache.get_many(keys)
+    metrics = {view_name: {'hits': 0, 'misses': 0} for view_name in sorted(cached_views)}
+    for key, count in counts.items():
+        view_name, outcome = keys[key]
+        metrics[view_name][outcome] = count
+    return metrics
+
+
+def response_key(request):
+    return make_key(
+        NAMESPACE,
+        request.scheme,
+        request.get_host(),
+        request.path,
+        normalize_params(request.query_params),
+        request.accepted_renderer.format,
+    )
+
+
+class CachedResponseMixin:
+    """Serve anonymous GET list/retrieve responses from the response cache."""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cached_views.update(f'{cls.__name__}.{action}' for action in ('list', 'retrieve'))
+
+    def get_cache_namespaces(self):
+        """Namespaces every response of the current action depends on."""
+        return ()
+
+    def response_dependencies(self, data):
+        """Namespaces of the objects embedded in ``data``."""
+        return ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, render, request, *args, **kwargs):
+        config = get_config()
+        if not config['ENABLED'] or request.method != 'GET' or request.user.is_authenticated:
+            return render(request, *args, **kwargs)
+
+        view_name = f'{type(self).__name__}.{self.action}'
+        store = get_store()
+        key = response_key(request)
+        entry = store.get(key)
+        if entry is not None and get_versions(entry['versions']) == entry['versions']:
+            record(view_name, 'hits')
+            response = Response(entry['data'])
+            response['X-Cache'] = 'HIT'
+            return response
+
+        record(view_name, 'misses')
+        # Taken before rendering, so a write that races the render leaves an entry that won't validate
+        versions = get_versions(self.get_cache_namespaces())
+        response = render(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        if response.status_code == 200:
+            versions = {**get_versions(self.response_dependencies(response.data)), **versions}
+            store.set(key, {'data': response.data, 'versions': versions}, config['TIMEOUT'])
+        return response
@@ -0,0 +1,125 @@
+"""
+Sparse fieldsets and expansion for API serializers.
+
+Serializers using ``FlexFieldsMixin`` honour two query parameters on reads:
+
+- ``?fields=title,owner.username`` keeps only the listed fields (dotted
+  paths select fields of nested objects), plus ``id`` at every level so
+  clients and cache invalidation can still tell objects apart;
+- ``?expand=item,item.owner`` renders only the listed nested objects in
+  full; every other expandable field is rendered as the related id. Without
+  ``?expand=`` nested objects render in full, as they always have.
+
+``select_related()`` turns the same parameters into the joins a view's
+queryset needs, so collapsed or omitted relations aren't joined at all.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from .instrumentation import timed
+
+
+def parse_paths(value):
+    """'a,b.c,b.d' -> {'a': {}, 'b': {'c': {}, 'd': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def request_options(request):
+    """The (fields, expand) trees a read request asks for; None where a parameter is absent."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = request.query_params
+    fields = parse_paths(params['fields']) if params.get('fields') else None
+    expand = parse_paths(params['expand']) if 'expand' in params else None
+    return fields, expand
+
+
+def renders_nested(request, name):
+    """Whether a read request renders the top-level expandable field ``name`` as a full object."""
+    fields, expand = request_options(request)
+    return (fields is None or name in fields) and (expand is None or name in expand)
+
+
+def child_options(fields, expand, name):
+    sub_fields = fields.get(name) or None if fields is not None else None
+    sub_expand = expand.get(name, {}) if expand is not None else None
+    return sub_fields, sub_expand
+
+
+class FlexFieldsMixin:
+    """
+    ``expandable_fields`` maps each nested field to ``(source, serializer
+    class)``: the relation rendered as an id when collapsed, and the
+    serializer (or None for a plain related field) that renders it in full.
+    ``related_fields`` maps other fields that read a relation (method
+    fields, string renderings) to the ``select_related()`` path they need.
+    """
+    expandable_fields = {}
+    related_fields = {}
+    always_included = ('id',)
+
+    def get_flex_options(self):
+        if hasattr(self, '_flex_options'):
+            return self._flex_options
+        return request_options(self.context.get('request'))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self.get_flex_options()
+        if only is not None:
+            fields = {
+                name: field for name, field in fields.items()
+                if name in only or name in self.always_included or field.write_only
+            }
+        for name, (source, _) in self.expandable_fields.items():
+            if name not in fields:
+                continue
+            if expand is not None and name not in expand:
+                kwargs = {'source': source} if source != name else {}
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **kwargs)
+            elif isinstance(fields[name], FlexFieldsMixin):
+                fields[name]._flex_options = child_options(only, expand, name)
+        return fields
+
+    def to_representation(self, instance):
+        # Reported in Server-Timing and /metrics (see sharelib.instrumentation)
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+    def nested_options(self, name):
+        """Options for a nested serializer built by hand, e.g. in a ``SerializerMethodField``."""
+        return child_options(*self.get_flex_options(), name)
+
+    @classmethod
+    def related_paths(cls, request=None, options=None, prefix=''):
+        """``select_related()`` paths for the relations a request will render in full."""
+        only, expand = options if options is not None else request_options(request)
+        paths = [
+            f'{prefix}{path}' for name, path in cls.related_fields.items() if only is None or name in only
+        ]
+        for name, (source, serializer_class) in cls.expandable_fields.items():
+            if only is not None and name not in only:
+                continue
+            if expand is not None and name not in expand:
+                continue
+            path = f'{prefix}{source}'
+            nested = []
+            if serializer_class is not None and issubclass(serializer_class, FlexFieldsMixin):
+                nested = serializer_class.related_paths(
+                    options=child_options(only, expand, name), prefix=f'{path}__'
+                )
+            paths.extend(nested or [path])
+        # Aliases (e.g. borrower/requester) share a relation
+        return list(dict.fromkeys(paths))
+
+    @classmethod
+    def select_related(cls, queryset, request):
+        """``queryset`` joined to exactly the relations ``request`` renders."""
+        paths = cls.related_paths(request)
+        # select_related() with no arguments would follow every non-null foreign key
+        return queryset.select_related(*paths) if paths else queryset
@@ -52,9 +52,11 @@ INSTALLED_APPS = [
     'borrows',
     'notifications',
     'ratings',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'sharelib.instrumentation.InstrumentationMiddleware',  # First, so total time covers the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -161,7 +163,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # orjson-backed JSON (see sharelib/renderers.py); same output, stdlib fallback
+    'DEFAULT_RENDERER_CLASSES': [
+        'sharelib.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'sharelib.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'sharelib.pagination.StandardPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -215,3 +227,93 @@ SPECTACULAR_SETTINGS = {
         'DamageReportStatusEnum': 'borrows.models.DamageReport.STATUS_CHOICES',
     },
 }
+
+# Image derivatives (see sharelib/images.py): max edge in pixels per size
+IMAGE_VARIANT_SIZES = {
+    'thumbnail': 200,
+    'card': 600,
+    'full': 1600,
+}
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
+# Render variants on a background thread after commit (False = inline, e.g. for tests)
+IMAGE_VARIANTS_ASYNC = config('IMAGE_VARIANTS_ASYNC', default=True, cast=bool)
+
+# Real-time notification fan-out (see notifications/pubsub.py).
+# Use 'notifications.pubsub.RedisBroker' with OPTIONS {'url': REDIS_URL}
+# when running more than one ASGI worker process.
+NOTIFICATION_BROKER = {
+    'BACKEND': config('NOTIFICATION_BROKER_BACKEND', default='notifications.pubsub.InProcessBroker'),
+    'OPTIONS': {},
+}
+if NOTIFICATION_BROKER['BACKEND'].endswith('RedisBroker'):
+    NOTIFICATION_BROKER['OPTIONS'] = {'url': config('REDIS_URL', default='redis://localhost:6379/0')}
+# Seconds between keepalive comments on idle notification streams
+NOTIFICATION_STREAM_HEARTBEAT = 20
+# Seconds a stream ticket (POST /api/notifications/stream-ticket/) stays valid
+NOTIFICATION_STREAM_TICKET_MAX_AGE = 30
+
+# Notification outbox (see notifications/outbox.py). DRIVER is one of
+# 'thread' (drain in-process after commit), 'celery', 'worker' (separate
+# process_notification_outbox --loop) or 'sync'.
+NOTIFICATION_OUTBOX = {
+    'DRIVER': config('NOTIFICATION_OUTBOX_DRIVER', default='thread'),
+    'BATCH_SIZE': 500,
+}
+
+# Celery (optional, used by the 'celery' outbox driver)
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_TASK_IGNORE_RESULT = True
+
+# Cache. The default in-process cache is fine for a single worker; point
+# CACHE_BACKEND at a shared cache (e.g. django.core.cache.backends.redis.RedisCache
+# with CACHE_LOCATION=redis://...) so invalidations reach every process.
+# Conditional GET and the response cache depend on it: their cache namespace
+# versions live here, and `manage.py check` warns (sharelib.W001) about a
+# process-local default cache when DEBUG is off.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='sharelib'),
+    },
+    # Rendered API responses (see sharelib/response_cache.py); may be local
+    # memory, file (django.core.cache.backends.filebased.FileBasedCache with a
+    # directory as location) or Redis
+    'responses': {
+        'BACKEND': config('RESPONSE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('RESPONSE_CACHE_LOCATION', default='sharelib-responses'),
+        'OPTIONS': {'MAX_ENTRIES': config('RESPONSE_CACHE_MAX_ENTRIES', default=5000, cast=int)},
+    },
+}
+# Seconds a user's /api/users/me/stats/ counters stay cached (writes invalidate them sooner)
+USER_STATS_CACHE_TIMEOUT = 300
+# Seconds /api/items/facets/ counts stay cached per filter (item/category writes invalidate them sooner)
+ITEM_FACETS_CACHE_TIMEOUT = 300
+# Anonymous GETs of items and categories (see sharelib/response_cache.py)
+RESPONSE_CACHE = {
+    'ENABLED': config('RESPONSE_CACHE_ENABLED', default=True, cast=bool),
+    'ALIAS': 'responses',
+    'TIMEOUT': 300,
+}
+
+# Overdue/reminder scheduler for borrow records (see borrows/scheduler.py).
+# Run it with `manage.py run_borrow_scheduler` (cron or --loop), the
+# 'borrows.run_scheduler' Celery task, or in-process by setting IN_PROCESS.
+BORROW_SCHEDULER = {
+    'IN_PROCESS': config('BORROW_SCHEDULER_IN_PROCESS', default=False, cast=bool),
+    'INTERVAL': 300,
+    'REMINDER_WINDOW_HOURS': 24,
+    'BATCH_SIZE': 5000,
+}
+
+# Per-request instrumentation (see sharelib/instrumentation.py): Server-Timing
+# headers, per-route histograms served at /metrics, and a slow query log.
+# Outside DEBUG, /metrics needs METRICS_TOKEN (sent as a bearer token) to be set.
+INSTRUMENTATION = {
+    'ENABLED': config('INSTRUMENTATION_ENABLED', default=True, cast=bool),
+    'SLOW_QUERY_MS': config('SLOW_QUERY_MS', default=200, cast=int),
+    'METRICS_TOKEN': config('METRICS_TOKEN', default=''),
+}
+
+# Render item and borrow request list pages from values() rows instead of
+# model instances (see sharelib/compact.py); the JSON is the same either way
+COMPACT_LISTS = config('COMPACT_LISTS', default=True, cast=bool)
@@ -0,0 +1,335 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.core.checks import run_checks
+from django.db import connection
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from borrows.models import BorrowRequest
+from items.caching import item_namespace, user_namespace
+from items.models import Item
+from notifications.models import Notification
+from . import checks, images
+from .instrumentation import InstrumentationMiddleware, registry, render_metrics
+from .renderers import FastJSONRenderer
+from .cache import get_versions
+
+
+def cursor(token):
+    return base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        owner = User.objects.create(username='owner')
+        self.client.force_authenticate(owner)  # Authenticated lists skip the response cache
+        now = timezone.now()
+        # Items 2 and 3 share a timestamp, so their order comes from the id
+        for index, hours_ago in enumerate([0, 1, 2, 2, 5]):
+            item = Item.objects.create(owner=owner, title=f'Item {index}', description='desc')
+            Item.objects.filter(pk=item.pk).update(created_at=now - timedelta(hours=hours_ago))
+        self.expected = list(Item.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_next_links_walk_every_item_once(self):
+        page = self.get('/api/items/', pagination='cursor', page_size=2)
+        self.assertNotIn('count', page)
+        self.assertIsNone(page['previous'])
+        seen = [item['id'] for item in page['results']]
+        while page['next']:
+            page = self.get(page['next'])
+            seen += [item['id'] for item in page['results']]
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.get('/api/items/', pagination='cursor', page_size=2)
+        second = self.get(first['next'])
+        back = self.get(second['previous'])
+        self.assertEqual([item['id'] for item in back['results']], self.expected[:2])
+        self.assertIsNone(back['previous'])
+
+    def test_ties_on_created_at_break_on_id(self):
+        ids = []
+        url, params = '/api/items/', {'pagination': 'cursor', 'page_size': 1}
+        while url:
+            page = self.get(url, **params)
+            ids += [item['id'] for item in page['results']]
+            url, params = page['next'], {}
+        self.assertEqual(ids, self.expected)
+
+    def test_bad_cursors_are_rejected(self):
+        now = timezone.now().isoformat()
+        for token in ['not-base64!', base64.urlsafe_b64encode(b'{').decode(), cursor([1, 2]),
+                      cursor({'p': [now]}), cursor({'p': [None, None]}), cursor({'p': ['yesterday', 1]}),
+                      cursor({'p': [now, 'x']})]:
+            with self.subTest(token=token):
+                response = self.client.get('/api/items/', {'cursor': token})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.data)
+
+    def test_reordering_parameters_are_rejected(self):
+        for params in [{'ordering': 'title'}, {'search': 'item'}]:
+            with self.subTest(params=params):
+                response = self.client.get('/api/items/', {'pagination': 'cursor', **params})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.data)
+        # Page-number pagination keeps supporting both
+        self.assertEqual(self.client.get('/api/items/', {'ordering': 'title', 'search': 'item'}).status_code, 200)
+
+
+def png(name, size=(400, 300)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_user(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(username='owner', avatar=png('face.png'))
+        user.refresh_from_db()
+        return user
+
+    def test_variants_are_rendered_and_recorded(self):
+        user = self.create_user()
+        self.assertEqual(user.avatar_variants['source'], user.avatar.name)
+        self.assertEqual(set(user.avatar_variants) - {'source'}, set(images.get_sizes()))
+        for name in images.variant_files(user.avatar_variants):
+            self.assertTrue(default_storage.exists(name), name)
+        urls = images.variant_urls(user.avatar, user.avatar_variants)
+        self.assertEqual(urls['thumbnail']['webp'], default_storage.url(user.avatar_variants['thumbnail']['webp']))
+
+    def test_recording_variants_invalidates_cached_responses(self):
+        with mock.patch('sharelib.images.schedule'), self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(username='owner', avatar=png('face.png'))
+            item = Item.objects.create(owner=user, title='Drill', description='desc', photos=png('drill.png'))
+        before = get_versions([user_namespace(user.pk), item_namespace(item.pk)])
+        with self.captureOnCommitCallbacks(execute=True):
+            images.process_image('accounts.User', user.pk, 'avatar', 'avatar_variants')
+            images.process_image('items.Item', item.pk, 'photos', 'photo_variants')
+        updated_at = item.updated_at
+        item.refresh_from_db()
+        self.assertEqual(item.photo_variants['source'], item.photos.name)
+        self.assertGreater(item.updated_at, updated_at)
+        after = get_versions(before)
+        for namespace in before:
+            self.assertGreater(after[namespace], before[namespace], namespace)
+
+    def test_replacing_the_image_deletes_old_variants(self):
+        user = self.create_user()
+        old = images.variant_files(user.avatar_variants)
+        user.avatar = png('new-face.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.avatar_variants['source'], user.avatar.name)
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+        self.assertTrue(all(default_storage.exists(name) for name in images.variant_files(user.avatar_variants)))
+
+    def test_clearing_the_image_deletes_variants(self):
+        user = self.create_user()
+        old = images.variant_files(user.avatar_variants)
+        user.avatar = None
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.avatar_variants, {})
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+
+    def test_deleting_the_instance_deletes_variants(self):
+        user = self.create_user()
+        old = images.variant_files(user.avatar_variants)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+
+    def test_variants_of_an_image_replaced_while_rendering_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            user = User.objects.create(username='owner', avatar=png('face.png'))
+        render, rendered = images.render_variants, []
+
+        def render_then_replace(field_file):
+            variants = render(field_file)
+            rendered.extend(images.variant_files(variants))
+            User.objects.filter(pk=user.pk).update(avatar='avatars/replaced.png')
+            return variants
+
+        with mock.patch('sharelib.images.render_variants', side_effect=render_then_replace):
+            images.process_image('accounts.User', user.pk, 'avatar', 'avatar_variants')
+        user.refresh_from_db()
+        self.assertEqual(user.avatar_variants, {})
+        self.assertTrue(rendered)
+        self.assertFalse(any(default_storage.exists(name) for name in rendered))
+
+
+class SharedCacheCheckTests(TestCase):
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+
+    def test_process_local_default_cache_is_flagged_outside_debug(self):
+        with override_settings(DEBUG=False, CACHES=self.LOCMEM):
+            self.assertEqual([error.id for error in checks.check_shared_cache(None)], ['sharelib.W001'])
+        for debug, caches in [(True, self.LOCMEM), (False, self.REDIS)]:
+            with self.subTest(debug=debug, caches=caches), override_settings(DEBUG=debug, CACHES=caches):
+                self.assertEqual(checks.check_shared_cache(None), [])
+
+    def test_registered_with_manage_py_check(self):
+        with override_settings(DEBUG=False, CACHES=self.LOCMEM):
+            self.assertIn('sharelib.W001', [error.id for error in run_checks(tags=['caches'])])
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        registry.clear()
+        Item.objects.create(owner=User.objects.create(username='owner'), title='Drill', description='desc')
+
+    def metrics(self):
+        with override_settings(DEBUG=True):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_server_timing_and_metrics(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/items/')
+        timing = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'serialize', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+
+        metrics = self.metrics()
+        self.assertIn(
+            f'sharelib_request_queries_bucket{{route="item-list",method="GET",le="+Inf"}} 1', metrics
+        )
+        self.assertIn('sharelib_request_serialize_seconds_count{route="item-list",method="GET"} 1', metrics)
+        self.assertIn('sharelib_requests_total{route="item-list",method="GET",status="200"} 1', metrics)
+
+    @override_settings(INSTRUMENTATION={'SLOW_QUERY_MS': 0})
+    def test_slow_queries_are_logged_with_the_view(self):
+        with self.assertLogs('sharelib.instrumentation', 'WARNING') as logs:
+            self.client.get('/api/items/')
+        self.assertIn('in item-list: SELECT', logs.output[0])
+        self.assertIn('sharelib_slow_queries_total{route="item-list"}', self.metrics())
+
+    async def test_async_requests_are_not_adapted_to_sync(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertFalse(iscoroutinefunction(InstrumentationMiddleware(lambda request: HttpResponse())))
+        response = await middleware(AsyncRequestFactory().get('/api/items/'))
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('sharelib_requests_total{route="unmatched",method="GET",status="200"} 1', render_metrics())
+
+    def test_metrics_need_a_token_outside_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(INSTRUMENTATION={'METRICS_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+            # The token is required even in DEBUG once it's set
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+
+class FastJSONTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='lender', bio='Prête des outils \u2028 ✓', lender_rating=Decimal('4.50'))
+        item = Item.objects.create(owner=self.user, title='Perceuse sans fil', description='desc')
+        borrow_request = BorrowRequest.objects.create(item=item, borrower=User.objects.create(username='borrower'))
+        Notification.objects.create(
+            user=self.user, type='request', title='Nouvelle demande', message='Quelqu\'un veut emprunter ✓',
+            related_item=item, related_request=borrow_request,
+            metadata={'stars': 4.5, 'tags': ['a', None, True], 'nested': {'count': 3}},
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_responses_match_the_stdlib_renderer(self):
+        response = self.client.get('/api/notifications/')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        self.assertIn(b'\\u2028', response.content)
+
+    def test_python_values(self):
+        data = {
+            'decimal': Decimal('4.50'),
+            'utc': datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'offset': datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone(timedelta(hours=2))),
+            'date': date(2026, 1, 2),
+            'uuid': uuid.UUID(int=1),
+            'lazy': gettext_lazy('Item Returned'),
+            'keys': {1: 'one', None: 'none'},
+            'tuple': (1, 2.5, 'é'),
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_falls_back_to_the_stdlib_renderer(self):
+        renderer = FastJSONRenderer()
+        huge = {'value': 2 ** 70}
+        self.assertEqual(renderer.render(huge), JSONRenderer().render(huge))
+        indented = self.client.get('/api/notifications/', HTTP_ACCEPT='application/json; indent=2')
+        self.assertIn(b'\n  ', indented.content)
+        with mock.patch('sharelib.renderers.orjson', None):
+            response = self.client.get('/api/notifications/')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_non_finite_numbers_are_rejected_like_the_stdlib_renderer(self):
+        for value in (Decimal('NaN'), Decimal('Infinity'), Decimal('-Infinity')):
+            data = {'results': [{'score': value, 'missing': None}]}
+            with self.subTest(value=value):
+                with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                    JSONRenderer().render(data)
+                with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                    FastJSONRenderer().render(data)
+                # Without STRICT_JSON both spell them NaN/Infinity
+                lenient, stdlib = FastJSONRenderer(), JSONRenderer()
+                lenient.strict = stdlib.strict = False
+                self.assertEqual(lenient.render(data), stdlib.render(data))
+
+    @override_settings(DEBUG=True)
+    def test_non_finite_floats_are_caught_in_debug(self):
+        for value in (float('nan'), float('inf'), -float('inf')):
+            with self.subTest(value=value):
+                with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                    FastJSONRenderer().render({'results': [{'score': value, 'missing': None}]})
+
+    def test_parser(self):
+        notification = Notification.objects.get()
+        response = self.client.patch(
+            f'/api/notifications/{notification.pk}/', '{"title": "Lu ✓"}', content_type='application/json'
+        )
+        self.assertEqual(response.data['title'], 'Lu ✓')
+        response = self.client.patch(
+            f'/api/notifications/{notification.pk}/', '{"title": ', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(str(response.data['detail']).startswith('JSON parse error'))
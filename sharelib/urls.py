@@ -25,9 +25,11 @@ from drf_spectacular.views import (
     SpectacularRedocView
 )
 from accounts.views import UserDetailView, UserStatsView
+from sharelib.instrumentation import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     
     # API Documentation
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),